@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Caché persistente de consultas de afiliación a ADRES.
+
+Cada consulta al scraper abre Chrome y requiere resolver un captcha; el mismo
+documento suele consultarse varias veces en poco tiempo (varios profesionales
+del equipo atienden al mismo paciente). Los resultados normalizados se guardan
+en SQLite con clave (tipo_documento, numero_documento) y se reutilizan mientras
+no superen su vigencia:
+
+  - success:   ADRES_CACHE_TTL_HOURS (por defecto 24 h)
+  - not_found: ADRES_CACHE_NOT_FOUND_TTL_HOURS (por defecto 1 h; el paciente
+               puede quedar afiliado en cualquier momento)
+
+Los errores (captcha incorrecto, fallas del navegador) no se guardan.
+
+Uso:
+  python adres_cache.py stats [--db RUTA]
+  python adres_cache.py clear [--db RUTA]
+  python adres_cache.py purge [--db RUTA]     # elimina solo las vencidas
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+CACHE_DB_PATH = Path(os.environ.get('ADRES_CACHE_DB') or SCRIPT_DIR / 'adres_cache.db')
+CACHE_TTL_SECONDS = float(os.environ.get('ADRES_CACHE_TTL_HOURS', '24')) * 3600
+NOT_FOUND_TTL_SECONDS = float(os.environ.get('ADRES_CACHE_NOT_FOUND_TTL_HOURS', '1')) * 3600
+
+CACHEABLE_STATUSES = ('success', 'not_found')
+
+def normalize_document(doc_type, doc_number):
+    """Clave del documento: tipo en mayúsculas y número sin puntos, espacios ni guiones."""
+    doc_type = (doc_type or 'CC').strip().upper()
+    doc_number = ''.join(ch for ch in str(doc_number) if ch not in ' .-,').upper()
+    return doc_type, doc_number
+
+def normalize_result(result):
+    """Resultado con textos sin espacios sobrantes y sin campos vacíos."""
+    normalized = {}
+    for key, value in result.items():
+        if isinstance(value, str):
+            value = ' '.join(value.split())
+        if value in (None, ''):
+            continue
+        normalized[key] = value
+    return normalized
+
+class AdresCache:
+    """
+    Caché de resultados de ADRES en SQLite.
+
+    Args:
+        db_path: ruta de la base SQLite
+        ttl_seconds: vigencia de los resultados 'success'
+        not_found_ttl_seconds: vigencia de los resultados 'not_found'
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, ttl_seconds=CACHE_TTL_SECONDS,
+                 not_found_ttl_seconds=NOT_FOUND_TTL_SECONDS):
+        self.db_path = str(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.not_found_ttl_seconds = not_found_ttl_seconds
+        self._db = sqlite3.connect(self.db_path, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS Cache_Afiliacion (
+                    tipo_documento TEXT NOT NULL,
+                    numero_documento TEXT NOT NULL,
+                    estado_consulta TEXT NOT NULL,
+                    resultado TEXT NOT NULL,
+                    fecha_consulta REAL NOT NULL,
+                    aciertos INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (tipo_documento, numero_documento)
+                )
+            """)
+
+    def ttl_for(self, status):
+        """Vigencia en segundos de un resultado según su estado."""
+        return self.not_found_ttl_seconds if status == 'not_found' else self.ttl_seconds
+
+    def get(self, doc_type, doc_number, max_age=None):
+        """
+        Resultado guardado y vigente para el documento.
+
+        Args:
+            max_age: edad máxima aceptada en segundos (además de la vigencia
+                del estado); 0 obliga a consultar de nuevo
+
+        Returns:
+            dict con el resultado y 'cache' (edad y aciertos), o None
+        """
+        doc_type, doc_number = normalize_document(doc_type, doc_number)
+        row = self._db.execute(
+            """SELECT estado_consulta, resultado, fecha_consulta, aciertos FROM Cache_Afiliacion
+               WHERE tipo_documento = ? AND numero_documento = ?""",
+            (doc_type, doc_number)
+        ).fetchone()
+        if row is None:
+            return None
+        status, payload, fetched_at, hits = row
+        age = time.time() - fetched_at
+        limit = self.ttl_for(status)
+        if max_age is not None:
+            limit = min(limit, max_age)
+        if age > limit:
+            return None
+        with self._db:
+            self._db.execute(
+                "UPDATE Cache_Afiliacion SET aciertos = aciertos + 1 WHERE tipo_documento = ? AND numero_documento = ?",
+                (doc_type, doc_number)
+            )
+        result = json.loads(payload)
+        result['cache'] = {
+            'hit': True,
+            'age_seconds': round(age, 1),
+            'fetched_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(fetched_at)),
+            'hits': hits + 1,
+        }
+        return result
+
+    def put(self, doc_type, doc_number, result):
+        """
+        Guarda un resultado 'success' o 'not_found'; los demás se ignoran.
+
+        Returns:
+            True si se guardó
+        """
+        status = result.get('status')
+        if status not in CACHEABLE_STATUSES:
+            return False
+        doc_type, doc_number = normalize_document(doc_type, doc_number)
+        # Los tiempos por fase describen la consulta original, no el resultado
+        payload = normalize_result({key: value for key, value in result.items() if key not in ('cache', 'timings')})
+        with self._db:
+            self._db.execute(
+                """INSERT OR REPLACE INTO Cache_Afiliacion
+                   (tipo_documento, numero_documento, estado_consulta, resultado, fecha_consulta)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (doc_type, doc_number, status, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+        return True
+
+    def purge_expired(self):
+        """Elimina los resultados vencidos. Returns: cantidad eliminada."""
+        now = time.time()
+        with self._db:
+            cursor = self._db.execute(
+                """DELETE FROM Cache_Afiliacion
+                   WHERE (estado_consulta = 'not_found' AND fecha_consulta < ?)
+                      OR (estado_consulta != 'not_found' AND fecha_consulta < ?)""",
+                (now - self.not_found_ttl_seconds, now - self.ttl_seconds)
+            )
+        return max(cursor.rowcount, 0)
+
+    def stats(self):
+        """Contenido de la caché por estado."""
+        by_status = {
+            status: {'entries': entries, 'hits': int(hits)}
+            for status, entries, hits in self._db.execute(
+                "SELECT estado_consulta, COUNT(*), TOTAL(aciertos) FROM Cache_Afiliacion GROUP BY estado_consulta"
+            )
+        }
+        return {
+            'entries': sum(item['entries'] for item in by_status.values()),
+            'by_status': by_status,
+            'ttl_hours': round(self.ttl_seconds / 3600, 2),
+            'not_found_ttl_hours': round(self.not_found_ttl_seconds / 3600, 2),
+            'db_path': self.db_path,
+        }
+
+    def clear(self):
+        """Elimina todos los resultados guardados."""
+        with self._db:
+            self._db.execute("DELETE FROM Cache_Afiliacion")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Caché de consultas ADRES")
+    parser.add_argument("command", choices=["stats", "clear", "purge"])
+    parser.add_argument("--db", default=str(CACHE_DB_PATH), help="Ruta de la base SQLite de la caché")
+    args = parser.parse_args(argv)
+    try:
+        cache = AdresCache(args.db)
+        purged = None
+        if args.command == "clear":
+            cache.clear()
+        elif args.command == "purge":
+            purged = cache.purge_expired()
+        result = dict(cache.stats(), success=True)
+        if purged is not None:
+            result['purged'] = purged
+        cache.close()
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result['success'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
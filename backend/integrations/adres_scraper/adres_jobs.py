@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Consultas ADRES asíncronas por trabajos.
+
+Cada consulta es un trabajo con su propio id en una tabla SQLite (estado,
+fechas, duración por fase y resultado), en lugar de un único
+demo_resultado.json que dos consultas simultáneas se sobrescriben. El backend
+encola el trabajo, responde de inmediato con el id y consulta el estado por id;
+los resultados terminados siguen disponibles después.
+
+Estados: queued -> running -> done | failed. Un trabajo 'done' tiene el
+resultado de la consulta (status success, not_found o error de ADRES); 'failed'
+indica que la ejecución misma falló (excepción).
+
+El worker toma trabajos en orden de llegada con concurrencia acotada
+(--concurrency; cada trabajo en ejecución usa un navegador, o el servicio con
+sesión reutilizable si se define ADRES_SERVICE_SOCKET). Los navegadores avanzan
+en paralelo, pero el captcha manual se pide de a uno por la consola del worker,
+con el id del trabajo y el documento en el prompt.
+
+Uso:
+  python adres_jobs.py submit --doc-type CC --doc-number 1006206595 [--max-age S] [--no-cache]
+  python adres_jobs.py status <id>
+  python adres_jobs.py latest
+  python adres_jobs.py list [--limit 20] [--state done]
+  python adres_jobs.py worker [--concurrency 1] [--headless] [--idle-exit SEGUNDOS]
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+JOBS_DB_PATH = Path(os.environ.get('ADRES_JOBS_DB') or SCRIPT_DIR / 'adres_jobs.db')
+
+STATES = ('queued', 'running', 'done', 'failed')
+
+def log(message):
+    print(f"[ADRES jobs] {message}", file=sys.stderr, flush=True)
+
+class JobStore:
+    """
+    Tabla de trabajos en SQLite (compartida entre el backend y el worker).
+
+    Args:
+        db_path: ruta de la base SQLite
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS Trabajos_ADRES (
+                    id TEXT PRIMARY KEY,
+                    tipo_documento TEXT NOT NULL,
+                    numero_documento TEXT NOT NULL,
+                    opciones TEXT NOT NULL DEFAULT '{}',
+                    estado TEXT NOT NULL DEFAULT 'queued',
+                    resultado TEXT,
+                    error TEXT,
+                    duraciones TEXT,
+                    fecha_creacion REAL NOT NULL,
+                    fecha_inicio REAL,
+                    fecha_fin REAL
+                )
+            """)
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_trabajos_adres_estado ON Trabajos_ADRES (estado, fecha_creacion)"
+            )
+
+    def submit(self, doc_type, doc_number, options=None):
+        """Encola una consulta. Returns: id del trabajo."""
+        job_id = uuid.uuid4().hex
+        with self._lock, self._db:
+            self._db.execute(
+                """INSERT INTO Trabajos_ADRES (id, tipo_documento, numero_documento, opciones, fecha_creacion)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (job_id, (doc_type or 'CC').strip().upper(), str(doc_number).strip(),
+                 json.dumps(options or {}, ensure_ascii=False), time.time())
+            )
+        return job_id
+
+    def claim_next(self):
+        """
+        Toma el trabajo en cola más antiguo y lo marca 'running'.
+
+        Returns:
+            dict del trabajo, o None si no hay trabajos en cola
+        """
+        with self._lock:
+            # BEGIN IMMEDIATE: otro worker no puede tomar el mismo trabajo
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM Trabajos_ADRES WHERE estado = 'queued' ORDER BY fecha_creacion LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE Trabajos_ADRES SET estado = 'running', fecha_inicio = ? WHERE id = ?",
+                        (time.time(), row['id'])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.get(row['id']) if row is not None else None
+
+    def finish(self, job_id, result=None, error=None, durations=None):
+        """Marca un trabajo como 'done' (con resultado) o 'failed' (con error)."""
+        with self._lock, self._db:
+            self._db.execute(
+                """UPDATE Trabajos_ADRES SET estado = ?, resultado = ?, error = ?, duraciones = ?, fecha_fin = ?
+                   WHERE id = ?""",
+                ('failed' if error else 'done',
+                 json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, json.dumps(durations or {}), time.time(), job_id)
+            )
+
+    def requeue_running(self):
+        """
+        Devuelve a la cola los trabajos 'running' (el worker que los tomó terminó
+        sin completarlos). Returns: cantidad de trabajos devueltos.
+        """
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "UPDATE Trabajos_ADRES SET estado = 'queued', fecha_inicio = NULL WHERE estado = 'running'"
+            )
+        return max(cursor.rowcount, 0)
+
+    @staticmethod
+    def _to_dict(row):
+        return {
+            'id': row['id'],
+            'doc_type': row['tipo_documento'],
+            'doc_number': row['numero_documento'],
+            'options': json.loads(row['opciones'] or '{}'),
+            'state': row['estado'],
+            'created_at': row['fecha_creacion'],
+            'started_at': row['fecha_inicio'],
+            'finished_at': row['fecha_fin'],
+            'durations': json.loads(row['duraciones']) if row['duraciones'] else None,
+            'result': json.loads(row['resultado']) if row['resultado'] else None,
+            'error': row['error'],
+        }
+
+    def get(self, job_id):
+        """Trabajo por id, o None."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM Trabajos_ADRES WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._to_dict(row)
+            if job['state'] == 'queued':
+                # Trabajos en cola antes que este (0 = es el siguiente)
+                job['position'] = self._db.execute(
+                    "SELECT COUNT(*) FROM Trabajos_ADRES WHERE estado = 'queued' AND fecha_creacion < ?",
+                    (row['fecha_creacion'],)
+                ).fetchone()[0]
+        return job
+
+    def latest(self, state='done'):
+        """Último trabajo terminado en el estado indicado, o None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM Trabajos_ADRES WHERE estado = ? ORDER BY fecha_fin DESC LIMIT 1", (state,)
+            ).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def list(self, limit=20, state=None):
+        """Trabajos más recientes (opcionalmente de un estado)."""
+        query = "SELECT * FROM Trabajos_ADRES"
+        params = []
+        if state:
+            query += " WHERE estado = ?"
+            params.append(state)
+        query += " ORDER BY fecha_creacion DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [self._to_dict(row) for row in self._db.execute(query, params)]
+
+    def counts(self):
+        """Cantidad de trabajos por estado."""
+        with self._lock:
+            counts = dict(self._db.execute("SELECT estado, COUNT(*) FROM Trabajos_ADRES GROUP BY estado").fetchall())
+        return {state: counts.get(state, 0) for state in STATES}
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+def execute_job(job, headless=False, service_socket=None):
+    """
+    Ejecuta la consulta de un trabajo.
+
+    Returns:
+        tuple (resultado, duraciones por fase en segundos)
+    """
+    import adres_scraper_cli
+
+    options = job['options']
+    started = time.time()
+    result = adres_scraper_cli.consultar(
+        job['doc_type'], job['doc_number'],
+        headless=options.get('headless') or headless,
+        max_age=options.get('max_age'),
+        no_cache=options.get('no_cache', False),
+        service_socket=service_socket,
+        captcha_label=f"trabajo {job['id']}, {job['doc_type']} {job['doc_number']}",
+    )
+    durations = {
+        'queue_wait_seconds': round(job['started_at'] - job['created_at'], 3),
+        'lookup_seconds': round(time.time() - started, 3),
+        'cache_hit': bool((result.get('cache') or {}).get('hit')),
+    }
+    # Fases del navegador (adres_tracing.py); no hay cuando responde la caché
+    phases = (result.get('timings') or {}).get('phases')
+    if phases:
+        durations['phases'] = phases
+    return result, durations
+
+def run_worker(store, concurrency=1, headless=False, poll_interval=0.5, idle_exit=None, service_socket=None):
+    """
+    Ejecuta trabajos en cola hasta Ctrl+C (o hasta --idle-exit segundos sin trabajo).
+
+    Args:
+        concurrency: trabajos en ejecución simultánea como máximo
+        poll_interval: segundos entre revisiones de la cola cuando está vacía
+    """
+    requeued = store.requeue_running()
+    if requeued:
+        log(f"{requeued} trabajos interrumpidos devueltos a la cola")
+    log(f"Worker iniciado (concurrencia {concurrency})")
+
+    slots = threading.BoundedSemaphore(concurrency)
+    last_activity = time.time()
+    active = [0]
+    active_lock = threading.Lock()
+
+    def run(job):
+        try:
+            log(f"Trabajo {job['id']}: {job['doc_type']} {job['doc_number']}")
+            try:
+                result, durations = execute_job(job, headless, service_socket)
+                store.finish(job['id'], result=result, durations=durations)
+                log(f"Trabajo {job['id']} terminado: {result.get('status')}")
+            except Exception as e:
+                store.finish(job['id'], error=f'{type(e).__name__}: {str(e)}')
+                log(f"Trabajo {job['id']} falló: {e}")
+        finally:
+            with active_lock:
+                active[0] -= 1
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            while True:
+                slots.acquire()
+                job = store.claim_next()
+                if job is None:
+                    slots.release()
+                    with active_lock:
+                        idle = active[0] == 0
+                    if idle and idle_exit is not None and time.time() - last_activity > idle_exit:
+                        log("Sin trabajos; worker detenido")
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                with active_lock:
+                    active[0] += 1
+                last_activity = time.time()
+                pool.submit(run, job)
+        except KeyboardInterrupt:
+            log("Worker detenido; los trabajos en ejecución vuelven a la cola al reiniciar")
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Consultas ADRES por trabajos")
+    parser.add_argument("--db", default=str(JOBS_DB_PATH), help="Ruta de la base SQLite de trabajos")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="Encolar una consulta")
+    submit.add_argument("--doc-type", default="CC", help="Tipo de documento (CC, TI, CE, etc.)")
+    submit.add_argument("--doc-number", required=True, help="Número de documento")
+    submit.add_argument("--max-age", type=float, default=None, help="Edad máxima aceptada en caché (0 = consultar)")
+    submit.add_argument("--no-cache", action="store_true", help="No usar la caché")
+    submit.add_argument("--headless", action="store_true", help="Ejecutar navegador en modo headless")
+
+    status = commands.add_parser("status", help="Estado y resultado de un trabajo")
+    status.add_argument("job_id")
+
+    commands.add_parser("latest", help="Último trabajo terminado")
+
+    listing = commands.add_parser("list", help="Trabajos recientes")
+    listing.add_argument("--limit", type=int, default=20)
+    listing.add_argument("--state", choices=STATES, default=None)
+
+    worker = commands.add_parser("worker", help="Ejecutar los trabajos en cola")
+    worker.add_argument("--concurrency", type=int, default=1, help="Trabajos simultáneos")
+    worker.add_argument("--headless", action="store_true", help="Ejecutar navegador en modo headless")
+    worker.add_argument("--poll-interval", type=float, default=0.5, help="Segundos entre revisiones de la cola")
+    worker.add_argument("--idle-exit", type=float, default=None, help="Terminar tras estos segundos sin trabajos")
+    worker.add_argument("--service-socket", default=os.environ.get("ADRES_SERVICE_SOCKET"),
+                        help="Socket del servicio con sesión reutilizable")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        store = JobStore(args.db)
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}, ensure_ascii=False))
+        return 1
+
+    try:
+        if args.command == "worker":
+            run_worker(store, concurrency=max(1, args.concurrency), headless=args.headless,
+                       poll_interval=args.poll_interval, idle_exit=args.idle_exit,
+                       service_socket=args.service_socket)
+            return 0
+        if args.command == "submit":
+            options = {'max_age': args.max_age, 'no_cache': args.no_cache, 'headless': args.headless}
+            job_id = store.submit(args.doc_type, args.doc_number, options)
+            response = {'success': True, 'job_id': job_id, 'counts': store.counts()}
+        elif args.command == "status":
+            job = store.get(args.job_id)
+            response = {'success': True, 'job': job} if job else {'success': False, 'error': 'Trabajo no encontrado'}
+        elif args.command == "latest":
+            job = store.latest()
+            response = {'success': True, 'job': job} if job else {'success': False, 'error': 'No hay trabajos terminados'}
+        else:
+            response = {'success': True, 'jobs': store.list(args.limit, args.state), 'counts': store.counts()}
+    except Exception as e:
+        response = {'success': False, 'error': str(e)}
+    finally:
+        store.close()
+    print(json.dumps(response, ensure_ascii=False))
+    return 0 if response['success'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
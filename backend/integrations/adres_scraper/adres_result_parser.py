@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Parser local (sin navegador) de la página de resultados de ADRES (BDUA).
+
+El scraper toma una sola instantánea del DOM (driver.page_source) y la extrae
+aquí, en lugar de recorrer tablas, filas y celdas con find_elements y .text
+(cada uno es una llamada al WebDriver). Solo usa la librería estándar
+(html.parser), así que las páginas guardadas en fixtures/ se pueden verificar
+sin Selenium ni Chrome.
+
+Extrae, en este orden (igual que el recorrido anterior con Selenium):
+  1) Mensaje de error (lblError): captcha incorrecto o documento no encontrado
+  2) Etiquetas con ID (lblNombre, lblEstado, ...)
+  3) Tabla de información básica (COLUMNAS | DATOS)
+  4) Tabla de afiliación (ESTADO | ENTIDAD | REGIMEN | ... | TIPO DE AFILIADO)
+  5) Si no se encontró nada: cualquier fila con pares (etiqueta, valor)
+
+Uso:
+  python adres_result_parser.py verificar [fixtures/adres_fixtures.json]
+  python adres_result_parser.py pagina_guardada.html
+"""
+
+import sys
+import json
+import unicodedata
+from html.parser import HTMLParser
+from pathlib import Path
+
+FIXTURES_PATH = Path(__file__).parent / 'fixtures' / 'adres_fixtures.json'
+
+# Campos que la página puede exponer como etiquetas con ID
+FIELD_IDS = {
+    "nombre": "lblNombre",
+    "apellidos": "lblApellidos",
+    "tipo_documento": "lblTipoDoc",
+    "documento": "lblNumDoc",
+    "estado": "lblEstado",
+    "regimen": "lblRegimen",
+    "eps": "lblEPS",
+    "fecha_afiliacion": "lblFechaAfiliacion",
+    "fecha_nacimiento": "lblFechaNacimiento",
+    "departamento": "lblDepartamento",
+    "municipio": "lblMunicipio",
+}
+ERROR_ID = "lblError"
+
+# Filas de la tabla COLUMNAS | DATOS (etiqueta normalizada -> campo)
+BASIC_LABELS = {
+    "NOMBRES": "nombre",
+    "APELLIDOS": "apellidos",
+    "TIPO DE IDENTIFICACION": "tipo_documento",
+    "NUMERO DE IDENTIFICACION": "documento",
+    "FECHA DE NACIMIENTO": "fecha_nacimiento",
+    "DEPARTAMENTO": "departamento",
+    "MUNICIPIO": "municipio",
+}
+
+# Columnas de la tabla de afiliación (campo -> encabezado normalizado)
+AFFILIATION_COLUMNS = {
+    "estado": "ESTADO",
+    "eps": "ENTIDAD",
+    "regimen": "REGIMEN",
+    "fecha_afiliacion": "FECHA DE AFILIACION EFECTIVA",
+    "tipo_afiliado": "TIPO DE AFILIADO",
+}
+
+RESULTS_TITLE = "RESULTADOS DE LA CONSULTA"
+
+def norm(s):
+    """Mayúsculas, sin tildes y con espacios simples."""
+    s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(s.upper().split())
+
+class _ResultPageParser(HTMLParser):
+    """
+    Recorre el HTML una vez y guarda:
+      - tables: lista de tablas; cada tabla es una lista de filas y cada fila
+        una lista de celdas (tag, texto)
+      - id_texts: texto de los elementos con los IDs pedidos
+      - text: texto visible de toda la página
+    """
+
+    SKIP_TAGS = {'script', 'style', 'noscript', 'template'}
+
+    def __init__(self, ids):
+        super().__init__(convert_charrefs=True)
+        self.ids = set(ids)
+        self.id_texts = {}
+        self.tables = []
+        self._captures = []  # [tag, id, profundidad, partes]
+        self._tables = []    # tablas abiertas: {'rows', 'row', 'cell'}
+        self._skip = 0
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+            return
+        for capture in self._captures:
+            if capture[0] == tag:
+                capture[2] += 1
+        element_id = dict(attrs).get('id')
+        if element_id in self.ids and element_id not in self.id_texts:
+            self._captures.append([tag, element_id, 1, []])
+
+        if tag == 'br':
+            self._append('\n')
+        elif tag == 'table':
+            table = {'rows': [], 'row': None, 'cell': None}
+            # Orden de aparición (las tablas anidadas van después de la externa)
+            self.tables.append(table['rows'])
+            self._tables.append(table)
+        elif not self._tables:
+            pass
+        elif tag == 'tr':
+            self._close_row(self._tables[-1])
+            self._tables[-1]['row'] = []
+        elif tag in ('td', 'th'):
+            table = self._tables[-1]
+            self._close_cell(table)
+            if table['row'] is None:
+                table['row'] = []
+            table['cell'] = (tag, [])
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+            return
+        for capture in list(self._captures):
+            if capture[0] == tag:
+                capture[2] -= 1
+                if capture[2] == 0:
+                    self.id_texts[capture[1]] = _clean(''.join(capture[3]))
+                    self._captures.remove(capture)
+
+        if tag == 'table' and self._tables:
+            self._close_row(self._tables.pop())
+        elif not self._tables:
+            pass
+        elif tag == 'tr':
+            self._close_row(self._tables[-1])
+        elif tag in ('td', 'th'):
+            self._close_cell(self._tables[-1])
+        elif tag in ('p', 'div', 'li'):
+            self._append('\n')
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._append(data)
+
+    def close(self):
+        super().close()
+        # Etiquetas sin cerrar al final del documento
+        for capture in self._captures:
+            self.id_texts.setdefault(capture[1], _clean(''.join(capture[3])))
+        self._captures = []
+        while self._tables:
+            self._close_row(self._tables.pop())
+
+    @property
+    def text(self):
+        return ''.join(self._text)
+
+    def _append(self, data):
+        self._text.append(data)
+        for capture in self._captures:
+            capture[3].append(data)
+        if self._tables and self._tables[-1]['cell'] is not None:
+            self._tables[-1]['cell'][1].append(data)
+
+    @staticmethod
+    def _close_cell(table):
+        if table['cell'] is not None:
+            tag, parts = table['cell']
+            table['row'].append((tag, _clean(''.join(parts))))
+            table['cell'] = None
+
+    def _close_row(self, table):
+        self._close_cell(table)
+        if table['row'] is not None:
+            table['rows'].append(table['row'])
+            table['row'] = None
+
+def _clean(text):
+    """Texto de una celda como lo daría .text de Selenium (espacios simples por línea)."""
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+def parse_html(html):
+    """
+    Instantánea del DOM en estructuras de Python.
+
+    Returns:
+        dict con 'tables' (filas de celdas (tag, texto)), 'ids' (texto por ID)
+        y 'text' (texto de la página)
+    """
+    parser = _ResultPageParser(list(FIELD_IDS.values()) + [ERROR_ID])
+    parser.feed(html)
+    parser.close()
+    return {'tables': parser.tables, 'ids': parser.id_texts, 'text': parser.text}
+
+def _cell_texts(row, tags=('td', 'th')):
+    return [text for tag, text in row if tag in tags]
+
+def extract_from_tables(tables):
+    """
+    Campos del afiliado a partir de las tablas de la página de resultados.
+
+    Args:
+        tables: lista de tablas de parse_html
+
+    Returns:
+        dict con los campos encontrados
+    """
+    result = {}
+
+    # a) Información básica (COLUMNAS | DATOS)
+    for rows in tables:
+        if len(rows) < 2:
+            continue
+        header = [norm(text) for text in _cell_texts(rows[0])]
+        if "COLUMNAS" in header and "DATOS" in header and len(header) >= 2:
+            for row in rows[1:]:
+                cells = _cell_texts(row)
+                if len(cells) >= 2 and cells[1]:
+                    field = BASIC_LABELS.get(norm(cells[0]))
+                    if field:
+                        result[field] = cells[1]
+
+    # b) Datos de afiliación (ESTADO | ENTIDAD | REGIMEN | ...): primera fila con al menos 3 celdas
+    for rows in tables:
+        if len(rows) < 2:
+            continue
+        header = [norm(text) for text in _cell_texts(rows[0])]
+        if not ("ESTADO" in header and "ENTIDAD" in header and "REGIMEN" in header):
+            continue
+        data_row = next((cells for cells in (_cell_texts(row, ('td',)) for row in rows[1:]) if len(cells) >= 3), None)
+        if not data_row:
+            continue
+        for field, column in AFFILIATION_COLUMNS.items():
+            index = header.index(column) if column in header else None
+            result[field] = data_row[index] if index is not None and index < len(data_row) else None
+
+    # c) Sin tablas reconocidas: cualquier fila con pares (etiqueta, valor)
+    if not result:
+        for rows in tables:
+            for row in rows:
+                cells = _cell_texts(row)
+                if len(cells) < 2 or not cells[1]:
+                    continue
+                label, value = norm(cells[0]), cells[1]
+                candidates = (
+                    ("nombre", "NOMBRES" in label),
+                    ("apellidos", "APELLIDOS" in label),
+                    ("tipo_documento", "TIPO DE IDENTIFIC" in label),
+                    ("documento", "NUMERO DE IDENTIFIC" in label),
+                    ("fecha_nacimiento", "FECHA DE NACIMIENTO" in label),
+                    ("departamento", "DEPARTAMENTO" in label),
+                    ("municipio", "MUNICIPIO" in label),
+                    ("estado", label == "ESTADO"),
+                    ("eps", label == "ENTIDAD"),
+                    ("regimen", "REGIMEN" in label),
+                    ("fecha_afiliacion", "FECHA DE AFILIACION EFECTIVA" in label),
+                    ("tipo_afiliado", "TIPO DE AFILIADO" in label),
+                )
+                for field, matches in candidates:
+                    if matches and field not in result:
+                        result[field] = value
+
+    return result
+
+def parse_result_page(html):
+    """
+    Resultado de la consulta a partir del HTML de la página de respuesta.
+
+    Returns:
+        dict con 'status' ('success', 'not_found' o 'error') y los campos del
+        afiliado, con el mismo formato que demo_adres_consulta
+    """
+    page = parse_html(html)
+
+    error_msg = page['ids'].get(ERROR_ID)
+    if error_msg:
+        if "captcha" in error_msg.lower() or "imagen" in error_msg.lower():
+            return {"status": "error", "message": "Captcha incorrecto", "error": error_msg}
+        return {"status": "not_found", "message": "Documento no encontrado", "error": error_msg}
+
+    result = {"status": "success"}
+    for field, element_id in FIELD_IDS.items():
+        if page['ids'].get(element_id):
+            result[field] = page['ids'][element_id]
+    if len(result) == 1:
+        result.update(extract_from_tables(page['tables']))
+    return result
+
+def has_results_title(html):
+    """True si la página contiene el título 'Resultados de la consulta'."""
+    return RESULTS_TITLE in norm(parse_html(html)['text'])
+
+def verify_fixtures(path=FIXTURES_PATH):
+    """
+    Parsea cada página guardada en fixtures y la compara con el resultado esperado.
+
+    Returns:
+        dict con el total de casos y la lista de diferencias
+    """
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        cases = json.load(f)['cases']
+
+    mismatches = []
+    for case in cases:
+        html = (path.parent / case['html']).read_text(encoding='utf-8')
+        actual = parse_result_page(html)
+        for key in sorted(set(case['expected']) | set(actual)):
+            if actual.get(key) != case['expected'].get(key):
+                mismatches.append({
+                    'caso': case['name'], 'campo': key,
+                    'esperado': case['expected'].get(key), 'obtenido': actual.get(key)
+                })
+    return {'success': not mismatches, 'cases': len(cases), 'mismatches': mismatches}
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'verificar':
+        result = verify_fixtures(sys.argv[2] if len(sys.argv) > 2 else FIXTURES_PATH)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(0 if result['success'] else 1)
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r', encoding='utf-8') as f:
+            print(json.dumps(parse_result_page(f.read()), ensure_ascii=False, indent=2))
+        sys.exit(0)
+    print("Uso: python adres_result_parser.py verificar [fixtures.json] | python adres_result_parser.py pagina.html",
+          file=sys.stderr)
+    sys.exit(1)
@@ -6,8 +6,16 @@ CLI para ejecutar el scraper de ADRES y devolver el resultado como JSON.
 Utiliza el script `modified_demo_scraper.py` y guarda el resultado en
 `demo_resultado.json` en el mismo directorio.
 
+Antes de abrir el navegador consulta la caché de `adres_cache.py`: si el mismo
+documento se consultó hace poco, responde con ese resultado (campo "cache").
+
+Con ADRES_SERVICE_SOCKET (o --service-socket) la consulta se envía al servicio
+con sesión de navegador reutilizable (adres_scraper_service.py) en lugar de
+abrir Chrome; si el servicio no responde se usa el scraper de un solo uso.
+
 Uso:
   python adres_scraper_cli.py --doc-type CC --doc-number 1006206595 [--headless]
+                              [--max-age SEGUNDOS] [--no-cache] [--service-socket RUTA]
 """
 
 import os
@@ -19,24 +27,84 @@ import argparse
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, SCRIPT_DIR)
 
-try:
-    import modified_demo_scraper as scraper
-except Exception as e:
-    print(json.dumps({
-        "status": "error",
-        "message": "No se pudo importar el scraper",
-        "error": str(e)
-    }, ensure_ascii=False))
-    sys.exit(1)
+import adres_cache
+
+def open_cache():
+    """Caché de consultas, o None si no se puede abrir (no es fatal)."""
+    try:
+        return adres_cache.AdresCache()
+    except Exception as e:
+        print(f"[ADRES] Caché no disponible: {e}", file=sys.stderr)
+        return None
+
+def run_scraper(doc_type, doc_number, headless, captcha_label=None):
+    # El scraper (y Selenium) solo se importa si hay que abrir el navegador
+    try:
+        import modified_demo_scraper as scraper
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": "No se pudo importar el scraper",
+            "error": str(e)
+        }
+    return scraper.demo_adres_consulta(doc_type, doc_number, headless=headless, captcha_label=captcha_label)
+
+def run_with_service(socket_path, doc_type, doc_number, max_age=None, no_cache=False):
+    """Resultado del servicio con sesión reutilizable, o None si no está disponible."""
+    import adres_scraper_service
+    request = {"doc_type": doc_type, "doc_number": doc_number,
+               "max_age": max_age, "no_cache": no_cache}
+    try:
+        result = adres_scraper_service.request_service(request, socket_path=socket_path)
+    except (OSError, ValueError) as e:
+        print(f"[ADRES] Servicio no disponible en {socket_path} ({e}); se abrirá un navegador", file=sys.stderr)
+        return None
+    if result.get("busy"):
+        print("[ADRES] Servicio ocupado; se abrirá un navegador", file=sys.stderr)
+        return None
+    return result
+
+def consultar(doc_type, doc_number, headless=False, max_age=None, no_cache=False, service_socket=None,
+              captcha_label=None):
+    """
+    Consulta un documento: servicio (si se indica), caché y, si no hay
+    resultado vigente, el scraper de un solo uso. captcha_label identifica la
+    consulta en el prompt del captcha (p. ej. el id del trabajo).
+
+    Returns:
+        dict: Resultado normalizado de la consulta
+    """
+    # El servicio consulta y actualiza la caché por su cuenta
+    result = run_with_service(service_socket, doc_type, doc_number, max_age, no_cache) if service_socket else None
+    cache = None if no_cache or result is not None else open_cache()
+    if result is None and cache:
+        result = cache.get(doc_type, doc_number, max_age=max_age)
+    if result is None:
+        result = adres_cache.normalize_result(run_scraper(doc_type, doc_number, headless, captcha_label))
+        if cache:
+            try:
+                cache.put(doc_type, doc_number, result)
+            except Exception as e:
+                print(f"[ADRES] No se pudo guardar en caché: {e}", file=sys.stderr)
+    if cache:
+        cache.close()
+    return result
 
 def main():
     parser = argparse.ArgumentParser(description="ADRES scraper CLI (manual captcha)")
     parser.add_argument("--doc-type", required=True, help="Tipo de documento (CC, TI, CE, etc.)")
     parser.add_argument("--doc-number", required=True, help="Número de documento")
     parser.add_argument("--headless", action="store_true", help="Ejecutar navegador en modo headless")
+    parser.add_argument("--max-age", type=float, default=None,
+                        help="Edad máxima en segundos de un resultado en caché (0 = consultar siempre)")
+    parser.add_argument("--no-cache", action="store_true", help="No leer ni guardar en la caché")
+    parser.add_argument("--service-socket", default=os.environ.get("ADRES_SERVICE_SOCKET"),
+                        help="Socket del servicio con sesión reutilizable (adres_scraper_service.py)")
     args = parser.parse_args()
 
-    result = scraper.demo_adres_consulta(args.doc_type, args.doc_number, headless=args.headless)
+    result = consultar(args.doc_type, args.doc_number, headless=args.headless, max_age=args.max_age,
+                       no_cache=args.no_cache, service_socket=args.service_socket)
+
     # Imprimir a stdout
     print(json.dumps(result, ensure_ascii=False))
 
@@ -51,5 +119,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
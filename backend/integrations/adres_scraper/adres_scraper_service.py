@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Servicio de consultas ADRES con una sesión de Chrome reutilizable.
+
+Iniciar Chrome y cargar el formulario por primera vez es el costo principal de
+cada consulta (antes del captcha). Este servicio mantiene un WebDriver abierto
+y lo deja listo en el formulario entre consultas:
+
+- Antes de cada consulta verifica que la sesión responda (health check); si no,
+  la recicla (cierra y abre un navegador nuevo).
+- La sesión se recicla también tras --max-uses consultas o cuando una consulta
+  falla por el navegador (no por captcha incorrecto ni documento no encontrado).
+- Hay un solo navegador: las consultas se atienden de a una; una petición que
+  espera turno más de --max-wait segundos recibe {"busy": true}.
+- Antes de usar el navegador se consulta la caché de adres_cache.py.
+
+Protocolo (socket Unix o TCP local): una petición JSON por línea y una respuesta
+por línea.
+  {"id": 1, "doc_type": "CC", "doc_number": "1006206595"}
+  {"id": 2, "doc_type": "CC", "doc_number": "1006206595", "max_age": 0, "captcha": "AB12C"}
+  {"cmd": "ping"} | {"cmd": "stats"}
+
+Sin "captcha" en la petición se pide por la consola del servicio, como en el
+scraper de un solo uso. adres_scraper_cli.py usa el servicio si se define
+ADRES_SERVICE_SOCKET.
+
+Uso:
+  python adres_scraper_service.py [--socket RUTA | --port PUERTO] [--headless]
+                                  [--max-uses 50] [--max-wait 300]
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import tempfile
+import threading
+import socketserver
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import adres_cache
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'adres_scraper.sock')
+
+# Resultados que indican una falla del navegador (no de la consulta)
+BROWSER_FAILURE_MESSAGES = ("Error en el proceso", "Error al extraer información")
+
+def log(message):
+    print(f"[ADRES service] {message}", file=sys.stderr, flush=True)
+
+class BrowserSession:
+    """
+    Un WebDriver de larga duración con health check y reciclaje.
+
+    Args:
+        headless: ejecutar Chrome sin ventana
+        max_uses: consultas antes de reciclar el navegador
+        url: formulario de consulta (por defecto ADRES_URL del scraper)
+    """
+
+    def __init__(self, headless=False, max_uses=50, url=None):
+        import modified_demo_scraper as scraper
+        self.scraper = scraper
+        self.headless = headless
+        self.max_uses = max_uses
+        self.url = url or scraper.ADRES_URL
+        self.driver = None
+        self.uses = 0
+        self.started_at = None
+        self.recycles = 0
+        self.last_recycle_reason = None
+
+    def start(self, tracer=None):
+        started = time.time()
+        if tracer is not None:
+            with tracer.span("driver_start"):
+                self.driver = self.scraper.setup_driver(headless=self.headless)
+        else:
+            self.driver = self.scraper.setup_driver(headless=self.headless)
+        self.uses = 0
+        self.started_at = time.time()
+        # Cargar el formulario una vez deja caliente la conexión y la caché del navegador
+        try:
+            self.driver.get(self.url)
+        except Exception as e:
+            log(f"No se pudo precargar el formulario: {e}")
+        log(f"Navegador iniciado en {time.time() - started:.1f} s")
+
+    def stop(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+    def recycle(self, reason, tracer=None):
+        log(f"Reciclando navegador: {reason}")
+        self.recycles += 1
+        self.last_recycle_reason = reason
+        self.stop()
+        self.start(tracer)
+
+    def healthy(self):
+        """True si el navegador responde."""
+        if self.driver is None:
+            return False
+        try:
+            self.driver.execute_script("return document.readyState")
+            return True
+        except Exception:
+            return False
+
+    def ensure(self, tracer=None):
+        """
+        Sesión viva y en el documento principal, lista para consultar. Si hay
+        que (re)iniciar el navegador se registra como fase driver_start.
+        """
+        if self.driver is None:
+            self.start(tracer)
+        elif not self.healthy():
+            self.recycle("la sesión no responde", tracer)
+        try:
+            self.scraper.reset_to_form(self.driver)
+        except Exception as e:
+            self.recycle(f"no se pudo reiniciar la sesión ({e})", tracer)
+
+    def lookup(self, doc_type, doc_number, captcha_provider=None):
+        """Consulta un documento reutilizando el navegador."""
+        tracer = self.scraper.PhaseTracer()
+        self.ensure(tracer)
+        result = self.scraper.consultar_afiliado(
+            self.driver, doc_type, doc_number, captcha_provider=captcha_provider, url=self.url,
+            tracer=tracer
+        )
+        self.uses += 1
+        if result.get("status") == "error" and result.get("message") in BROWSER_FAILURE_MESSAGES:
+            self.recycle(f"error en la consulta: {result.get('error')}")
+        elif self.uses >= self.max_uses:
+            self.recycle(f"{self.uses} consultas")
+        return result
+
+class AdresScraperService:
+    """Atiende peticiones del protocolo con una BrowserSession y la caché."""
+
+    def __init__(self, session, max_wait=300.0):
+        self.session = session
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats_counters = {
+            'lookups': 0, 'cache_hits': 0, 'browser_lookups': 0, 'errors': 0, 'busy': 0,
+            'total_browser_seconds': 0.0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats_counters[name] += amount
+
+    def lookup(self, request):
+        doc_number = request.get('doc_number')
+        if not doc_number:
+            return {'status': 'error', 'message': "Falta 'doc_number'"}
+        doc_type = request.get('doc_type') or 'CC'
+        max_age = request.get('max_age')
+        self._count('lookups')
+
+        # La caché no necesita el navegador: se consulta sin esperar turno
+        cache = None
+        if not request.get('no_cache'):
+            try:
+                cache = adres_cache.AdresCache()
+                cached = cache.get(doc_type, doc_number, max_age=max_age)
+                if cached is not None:
+                    self._count('cache_hits')
+                    return cached
+            except Exception as e:
+                log(f"Caché no disponible: {e}")
+
+        try:
+            if not self._lock.acquire(timeout=self.max_wait):
+                self._count('busy')
+                return {'status': 'error', 'busy': True,
+                        'message': f'El navegador sigue ocupado después de {self.max_wait:.0f} s'}
+            try:
+                captcha = request.get('captcha')
+                started = time.time()
+                result = self.session.lookup(doc_type, doc_number,
+                                             captcha_provider=(lambda: captcha) if captcha else None)
+                self._count('browser_lookups')
+                self._count('total_browser_seconds', time.time() - started)
+            finally:
+                self._lock.release()
+
+            result = adres_cache.normalize_result(result)
+            if result.get('status') == 'error':
+                self._count('errors')
+            elif cache is not None:
+                cache.put(doc_type, doc_number, result)
+            return result
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def stats(self):
+        with self._stats_lock:
+            counters = dict(self.stats_counters)
+        browser_lookups = counters['browser_lookups']
+        return dict(
+            counters,
+            total_browser_seconds=round(counters['total_browser_seconds'], 3),
+            avg_browser_seconds=round(counters['total_browser_seconds'] / browser_lookups, 3) if browser_lookups else None,
+            session={
+                'alive': self.session.driver is not None,
+                'uses': self.session.uses,
+                'max_uses': self.session.max_uses,
+                'recycles': self.session.recycles,
+                'last_recycle_reason': self.session.last_recycle_reason,
+                'uptime_seconds': round(time.time() - self.session.started_at, 1) if self.session.started_at else None,
+            },
+        )
+
+    def handle(self, request):
+        command = request.get('cmd')
+        if command == 'ping':
+            response = {'success': True, 'pong': True}
+        elif command == 'stats':
+            response = dict(self.stats(), success=True)
+        elif command:
+            response = {'success': False, 'error': f'Comando desconocido: {command}'}
+        else:
+            response = self.lookup(request)
+        if 'id' in request:
+            response['id'] = request['id']
+        return response
+
+def make_server(service, socket_path=None, port=None):
+    """Servidor con un hilo por conexión; cada conexión puede enviar varias peticiones."""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw_line in self.rfile:
+                line = raw_line.decode('utf-8').strip()
+                if not line:
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('Se esperaba un objeto JSON')
+                    response = service.handle(request)
+                except (json.JSONDecodeError, ValueError) as e:
+                    response = {'success': False, 'error': f'Petición inválida: {e}'}
+                self.wfile.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+                self.wfile.flush()
+
+    if port is not None:
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', port), Handler)
+    else:
+        # Eliminar un socket huérfano de una ejecución anterior
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    return server
+
+def request_service(request, socket_path=None, port=None, timeout=None):
+    """
+    Envía una petición a un servicio en ejecución y retorna la respuesta.
+    Lanza OSError si el servicio no está disponible.
+    """
+    import socket
+    if port is not None:
+        conn = socket.create_connection(('127.0.0.1', port), timeout=timeout)
+    else:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(timeout)
+        conn.connect(socket_path or DEFAULT_SOCKET)
+    with conn, conn.makefile('rwb') as stream:
+        stream.write((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+        stream.flush()
+        line = stream.readline()
+    if not line:
+        raise ConnectionError('El servicio cerró la conexión sin responder')
+    return json.loads(line)
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Servicio ADRES con sesión de navegador reutilizable")
+    parser.add_argument("--socket", default=None, help=f"Socket Unix (por defecto {DEFAULT_SOCKET})")
+    parser.add_argument("--port", type=int, default=None, help="Escuchar en 127.0.0.1:PUERTO en lugar de un socket Unix")
+    parser.add_argument("--headless", action="store_true", help="Ejecutar navegador en modo headless")
+    parser.add_argument("--max-uses", type=int, default=int(os.environ.get('ADRES_SESSION_MAX_USES', '50')),
+                        help="Consultas antes de reciclar el navegador")
+    parser.add_argument("--max-wait", type=float, default=300.0,
+                        help="Segundos máximos de espera por el navegador antes de responder busy")
+    parser.add_argument("--url", default=None, help="URL del formulario (por defecto ADRES_URL)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    session = None
+    try:
+        session = BrowserSession(headless=args.headless, max_uses=max(1, args.max_uses), url=args.url)
+        session.start()
+        service = AdresScraperService(session, max_wait=args.max_wait)
+        socket_path = None if args.port is not None else (args.socket or DEFAULT_SOCKET)
+        server = make_server(service, socket_path=socket_path, port=args.port)
+    except Exception as e:
+        if session is not None:
+            session.stop()
+        print(json.dumps({'success': False, 'ready': False, 'error': str(e)}, ensure_ascii=False), flush=True)
+        return 1
+
+    # SIGTERM detiene el servidor de forma ordenada (serve_forever corre en este hilo)
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+
+    print(json.dumps({
+        'success': True,
+        'ready': True,
+        'socket': socket_path,
+        'port': args.port,
+        'url': session.url,
+        'max_uses': session.max_uses,
+    }, ensure_ascii=False), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        session.stop()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
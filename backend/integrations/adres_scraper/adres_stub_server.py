@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Servidor HTTP local que imita el formulario y las respuestas de ADRES con las
+páginas guardadas en fixtures/ (datos ficticios).
+
+Sirve para probar sin conexión el scraper y el servicio con sesión reutilizable
+(adres_scraper_service.py): reutilización del navegador, reciclaje y extracción.
+Con ADRES_URL apuntando a este servidor el scraper no sale a internet.
+
+  GET  /bdua_internet/Pages/ConsultarAfiliadoWeb.aspx   formulario
+  POST /bdua_internet/Pages/RespuestaConsulta.aspx      respuesta según el documento
+  GET  /__stats                                         peticiones y sesiones vistas
+
+El captcha del formulario es siempre STUB01 (o --captcha). Documentos:
+  1000000001  afiliado activo (tablas COLUMNAS/DATOS y ESTADO/ENTIDAD/REGIMEN)
+  1000000002  etiquetas con ID
+  1000000003  pares etiqueta/valor
+  otro        documento no encontrado
+
+Uso:
+  python adres_stub_server.py [--port 8765] [--delay 0.5] [--captcha STUB01]
+  ADRES_URL=http://127.0.0.1:8765/bdua_internet/Pages/ConsultarAfiliadoWeb.aspx \\
+      python adres_scraper_cli.py --doc-type CC --doc-number 1000000001 --no-cache
+"""
+
+import sys
+import json
+import time
+import uuid
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+FORM_PATH = '/bdua_internet/Pages/ConsultarAfiliadoWeb.aspx'
+RESULT_PATH = '/bdua_internet/Pages/RespuestaConsulta.aspx'
+
+STUB_CAPTCHA = 'STUB01'
+STUB_RESPONSES = {
+    '1000000001': 'resultado_afiliado_activo.html',
+    '1000000002': 'resultado_etiquetas_id.html',
+    '1000000003': 'resultado_pares_etiqueta_valor.html',
+}
+NOT_FOUND_PAGE = 'resultado_no_encontrado.html'
+WRONG_CAPTCHA_PAGE = 'resultado_captcha_incorrecto.html'
+SESSION_COOKIE = 'ASP.NET_SessionId'
+
+def make_server(port=8765, delay=0.0, captcha=STUB_CAPTCHA):
+    """
+    Servidor de prueba (sin iniciar).
+
+    Args:
+        port: puerto en 127.0.0.1 (0 = uno libre)
+        delay: segundos de espera antes de cada respuesta (latencia simulada)
+        captcha: texto de captcha aceptado
+    """
+    stats = {'form_loads': 0, 'lookups': 0, 'wrong_captcha': 0, 'sessions': set()}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            sys.stderr.write(f"[ADRES stub] {self.address_string()} - {format % args}\n")
+
+        def _session(self):
+            """Sesión de la cookie (o una nueva, que se envía en la respuesta)."""
+            for part in (self.headers.get('Cookie') or '').split(';'):
+                name, _, value = part.strip().partition('=')
+                if name == SESSION_COOKIE and value:
+                    return value, False
+            return uuid.uuid4().hex, True
+
+        def _send(self, status, body, content_type='text/html; charset=utf-8', session=None):
+            data = body.encode('utf-8')
+            if delay:
+                time.sleep(delay)
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            if session:
+                self.send_header('Set-Cookie', f'{SESSION_COOKIE}={session}; path=/; HttpOnly')
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _page(self, name):
+            return (FIXTURES_DIR / name).read_text(encoding='utf-8')
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == FORM_PATH:
+                session, new = self._session()
+                with lock:
+                    stats['form_loads'] += 1
+                    stats['sessions'].add(session)
+                self._send(200, self._page('formulario_consulta.html'), session=session if new else None)
+            elif path == '/__stats':
+                with lock:
+                    body = json.dumps(dict(stats, sessions=len(stats['sessions'])))
+                self._send(200, body, content_type='application/json')
+            else:
+                self._send(404, '<html><body>No encontrado</body></html>')
+
+        def do_POST(self):
+            if urlparse(self.path).path != RESULT_PATH:
+                self._send(404, '<html><body>No encontrado</body></html>')
+                return
+            length = int(self.headers.get('Content-Length') or 0)
+            form = parse_qs(self.rfile.read(length).decode('utf-8'))
+            doc_number = (form.get('txtNumDoc') or [''])[0].strip()
+            captcha_text = (form.get('Capcha$CaptchaTextBox') or [''])[0].strip()
+            session, new = self._session()
+            with lock:
+                stats['lookups'] += 1
+                stats['sessions'].add(session)
+                if captcha_text.upper() != captcha.upper():
+                    stats['wrong_captcha'] += 1
+            if captcha_text.upper() != captcha.upper():
+                page = WRONG_CAPTCHA_PAGE
+            else:
+                page = STUB_RESPONSES.get(doc_number, NOT_FOUND_PAGE)
+            self._send(200, self._page(page), session=session if new else None)
+
+    ThreadingHTTPServer.allow_reuse_address = True
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    return server
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Servidor local que imita ADRES con páginas guardadas")
+    parser.add_argument("--port", type=int, default=8765, help="Puerto en 127.0.0.1 (0 = uno libre)")
+    parser.add_argument("--delay", type=float, default=0.0, help="Latencia simulada por respuesta (segundos)")
+    parser.add_argument("--captcha", default=STUB_CAPTCHA, help="Texto de captcha aceptado")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.port, args.delay, args.captcha)
+    port = server.server_address[1]
+    print(json.dumps({
+        'ready': True,
+        'url': f'http://127.0.0.1:{port}{FORM_PATH}',
+        'captcha': args.captcha,
+    }, ensure_ascii=False), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tiempos por fase de una consulta del scraper de ADRES.
+
+Cada fase (inicio del navegador, navegación, llenado del formulario, espera del
+captcha, envío, detección del resultado, búsqueda en iframes, extracción) es un
+span con su duración. Cada span se emite al terminar como una línea JSON en
+stderr y el resumen se agrega al resultado de la consulta en "timings":
+
+  {"event": "adres_span", "lookup_id": "...", "phase": "navigation", "seconds": 1.84,
+   "offset_seconds": 2.91, "ok": true}
+  {"event": "adres_trace", "lookup_id": "...", "total_seconds": 19.2, "phases": {...}}
+
+ADRES_TRACE=0 desactiva las líneas en stderr (el resumen se sigue agregando).
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+from contextlib import contextmanager
+
+TRACE_ENABLED = os.environ.get('ADRES_TRACE', '1') != '0'
+
+class PhaseTracer:
+    """
+    Registra spans de una consulta.
+
+    Args:
+        lookup_id: identificador de la consulta (por defecto uno nuevo)
+        emit: escribir cada span como JSON en stderr
+    """
+
+    def __init__(self, lookup_id=None, emit=TRACE_ENABLED):
+        self.lookup_id = lookup_id or uuid.uuid4().hex[:12]
+        self.emit = emit
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def _emit(self, event):
+        if self.emit:
+            print(json.dumps(event, ensure_ascii=False), file=sys.stderr, flush=True)
+
+    @contextmanager
+    def span(self, phase, **attrs):
+        """
+        Mide el bloque como una fase. Los atributos extra (y los que se agreguen
+        al dict que entrega el with) se guardan en el span.
+        """
+        start = time.perf_counter()
+        span = dict(attrs)
+        ok = True
+        try:
+            yield span
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            record = dict(
+                span,
+                phase=phase,
+                seconds=round(time.perf_counter() - start, 3),
+                offset_seconds=round(start - self.started, 3),
+                ok=ok,
+            )
+            self.spans.append(record)
+            self._emit(dict(record, event='adres_span', lookup_id=self.lookup_id))
+
+    def phases(self):
+        """Segundos por fase (sumados si una fase se repite)."""
+        totals = {}
+        for span in self.spans:
+            totals[span['phase']] = round(totals.get(span['phase'], 0.0) + span['seconds'], 3)
+        return totals
+
+    def finish(self):
+        """
+        Emite el resumen y lo retorna.
+
+        Returns:
+            dict con 'lookup_id', 'total_seconds', 'phases' y 'spans'
+        """
+        summary = {
+            'lookup_id': self.lookup_id,
+            'total_seconds': round(time.perf_counter() - self.started, 3),
+            'phases': self.phases(),
+        }
+        self._emit(dict(summary, event='adres_trace'))
+        return dict(summary, spans=self.spans)
@@ -13,16 +13,19 @@ con una implementación real utilizando la API de 2Captcha.
 """
 
 import os
-import time
 import json
 import logging
+import threading
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException
+
+import adres_result_parser
+from adres_tracing import PhaseTracer
 
 # Configuración de logging
 logging.basicConfig(
@@ -31,6 +34,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger()
 
+# URL del formulario; ADRES_URL permite apuntar al servidor de prueba (adres_stub_server.py)
+ADRES_URL = os.environ.get(
+    "ADRES_URL", "https://aplicaciones.adres.gov.co/bdua_internet/Pages/ConsultarAfiliadoWeb.aspx"
+)
+
 def setup_driver(headless=True):
     """Configura el driver de Selenium."""
     chrome_options = Options()
@@ -57,27 +65,50 @@ def setup_driver(headless=True):
     driver.implicitly_wait(10)
     return driver
 
-def simulate_2captcha_service():
+def save_html_snapshot(html):
+    """
+    Guarda el HTML de la respuesta si ADRES_HTML_SNAPSHOT indica una ruta
+    (sirve para agregar casos a fixtures/ tras anonimizar los datos).
+    """
+    path = os.environ.get("ADRES_HTML_SNAPSHOT")
+    if not path:
+        return
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        logger.info(f"HTML de la respuesta guardado en {path}")
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el HTML de la respuesta: {e}")
+
+# Un solo prompt de captcha a la vez: con varios trabajos en paralelo
+# (adres_jobs.py --concurrency) todos leerían de la misma consola.
+_captcha_lock = threading.Lock()
+
+def simulate_2captcha_service(label=None):
     """
     Simula el servicio de 2Captcha solicitando al usuario que ingrese el captcha.
     
     En un entorno real, esta función sería reemplazada por la integración
     con la API de 2Captcha.
     
+    Args:
+        label (str): Consulta a la que corresponde el captcha (trabajo y documento)
+    
     Returns:
         str: Texto del captcha ingresado por el usuario
     """
-    print("\n" + "="*50)
-    print("SIMULACIÓN DE SERVICIO 2CAPTCHA")
-    print("="*50)
-    print("En un entorno real, esta parte utilizaría la API de 2Captcha.")
-    print("Para esta demostración, por favor observe la imagen del captcha")
-    print("en el navegador (si está en modo visible) e ingrese el texto:")
-    captcha_text = input("Ingrese el texto del captcha: ")
-    print("="*50 + "\n")
+    with _captcha_lock:
+        print("\n" + "="*50)
+        print("SIMULACIÓN DE SERVICIO 2CAPTCHA")
+        print("="*50)
+        print("En un entorno real, esta parte utilizaría la API de 2Captcha.")
+        print("Para esta demostración, por favor observe la imagen del captcha")
+        print("en el navegador (si está en modo visible) e ingrese el texto:")
+        captcha_text = input(f"Ingrese el texto del captcha ({label}): " if label else "Ingrese el texto del captcha: ")
+        print("="*50 + "\n")
     return captcha_text
 
-def demo_adres_consulta(doc_type="CC", doc_number="1006206595", headless=False):
+def demo_adres_consulta(doc_type="CC", doc_number="1006206595", headless=False, captcha_label=None):
     """
     Demuestra el proceso de consulta en ADRES con intervención manual para el captcha.
     
@@ -85,334 +116,242 @@ def demo_adres_consulta(doc_type="CC", doc_number="1006206595", headless=False):
         doc_type (str): Tipo de documento
         doc_number (str): Número de documento
         headless (bool): Si se ejecuta el navegador en modo headless
+        captcha_label (str): Identifica la consulta en el prompt del captcha
         
     Returns:
-        dict: Resultado de la consulta
+        dict: Resultado de la consulta (con "timings" por fase)
+    """
+    tracer = PhaseTracer()
+    with tracer.span("driver_start"):
+        driver = setup_driver(headless=headless)
+    try:
+        return consultar_afiliado(driver, doc_type, doc_number, tracer=tracer,
+                                  captcha_provider=lambda: simulate_2captcha_service(captcha_label))
+    finally:
+        # Cerrar el navegador
+        driver.quit()
+        logger.info("Navegador cerrado")
+
+def reset_to_form(driver):
+    """
+    Deja una sesión reutilizada lista para otra consulta: cierra las pestañas
+    extra que abrió la respuesta y vuelve al documento principal. La navegación
+    al formulario la hace consultar_afiliado.
+    """
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    driver.switch_to.default_content()
+
+# Estado de la página en una sola llamada al WebDriver (se evalúa en cada sondeo)
+PAGE_STATE_SCRIPT = """
+var error = document.getElementById('lblError');
+var text = ((document.body && document.body.innerText) || '').normalize('NFD')
+    .replace(/[\\u0300-\\u036f]/g, '').toUpperCase();
+return {
+    ready: document.readyState,
+    tables: document.getElementsByTagName('table').length,
+    iframes: document.getElementsByTagName('iframe').length,
+    error: error ? error.textContent.trim() : '',
+    title: text.indexOf('RESULTADOS DE LA CONSULTA') >= 0
+};
+"""
+
+# Sondeo de las esperas por condición (en lugar de pausas fijas)
+POLL_SECONDS = 0.25
+
+def page_state(driver):
+    """Estado de carga, tablas, iframes, mensaje de error y título de resultados."""
+    return driver.execute_script(PAGE_STATE_SCRIPT) or {}
+
+def _has_result(state):
+    return state.get("ready") == "complete" and bool(state.get("tables") or state.get("error") or state.get("title"))
+
+def _result_state(driver):
+    """Condición de espera: el estado de la página si ya tiene resultado, si no False."""
+    state = page_state(driver)
+    return state if _has_result(state) else False
+
+def _form_submitted(driver, submit_button, initial_handles):
+    """
+    Condición de espera tras enviar el formulario: se abrió una ventana nueva
+    (se cambia a ella) o la página del formulario se reemplazó (el botón quedó
+    obsoleto). Cubre tanto la respuesta en otra pestaña como el postback con
+    error en la misma URL.
+    """
+    handles = driver.window_handles
+    new_handles = [handle for handle in handles if handle not in initial_handles]
+    if new_handles:
+        driver.switch_to.window(new_handles[-1])
+        return "new_window"
+    try:
+        submit_button.is_enabled()
+    except StaleElementReferenceException:
+        return "page_replaced"
+    return False
+
+def consultar_afiliado(driver, doc_type="CC", doc_number="1006206595", captcha_provider=None, url=None,
+                       tracer=None):
     """
-    driver = setup_driver(headless=headless)
-    url = "https://aplicaciones.adres.gov.co/bdua_internet/Pages/ConsultarAfiliadoWeb.aspx"
+    Consulta un documento en ADRES con un navegador ya iniciado (no lo cierra,
+    para poder reutilizarlo entre consultas).
     
+    Args:
+        driver: WebDriver de Selenium
+        doc_type (str): Tipo de documento
+        doc_number (str): Número de documento
+        captcha_provider (callable): Función que retorna el texto del captcha
+            (por defecto se pide por consola)
+        url (str): URL del formulario (por defecto ADRES_URL)
+        tracer (PhaseTracer): Registro de tiempos por fase (por defecto uno nuevo)
+        
+    Returns:
+        dict: Resultado de la consulta, con "timings" (segundos por fase)
+    """
+    tracer = tracer or PhaseTracer()
+    result = _consultar_afiliado(driver, doc_type, doc_number, captcha_provider or simulate_2captcha_service,
+                                 url or ADRES_URL, tracer)
+    result["timings"] = tracer.finish()
+    return result
+
+def _consultar_afiliado(driver, doc_type, doc_number, captcha_provider, url, tracer):
     try:
         # Paso 1: Navegar al formulario
-        logger.info(f"Navegando a {url}")
-        driver.get(url)
-        
-        # Esperar a que la página cargue
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.ID, "txtNumDoc"))
-        )
-        logger.info("Página cargada correctamente")
+        with tracer.span("navigation"):
+            logger.info(f"Navegando a {url}")
+            driver.get(url)
+            
+            # Esperar a que la página cargue
+            WebDriverWait(driver, 20, poll_frequency=POLL_SECONDS).until(
+                EC.presence_of_element_located((By.ID, "txtNumDoc"))
+            )
+            logger.info("Página cargada correctamente")
         
         # Paso 2: Completar el formulario
-        logger.info(f"Completando formulario con documento {doc_type}: {doc_number}")
-        
-        # Seleccionar tipo de documento
-        select_doc_type = Select(driver.find_element(By.CSS_SELECTOR, "select"))
-        
-        # Mapeo de tipos de documento a índices
-        doc_type_mapping = {
-            "CC": 0,  # Cédula de Ciudadanía
-            "TI": 1,  # Tarjeta de Identidad
-            "CE": 2,  # Cédula de Extranjería
-            "PA": 3,  # Pasaporte
-            "RC": 4,  # Registro Civil
-        }
-        
-        # Seleccionar tipo de documento
-        if doc_type in doc_type_mapping:
-            select_doc_type.select_by_index(doc_type_mapping[doc_type])
-        else:
-            select_doc_type.select_by_visible_text(doc_type)
-        
-        # Ingresar número de documento
-        input_doc_number = driver.find_element(By.ID, "txtNumDoc")
-        input_doc_number.clear()
-        input_doc_number.send_keys(doc_number)
+        with tracer.span("form_fill"):
+            logger.info(f"Completando formulario con documento {doc_type}: {doc_number}")
+            
+            # Seleccionar tipo de documento
+            select_doc_type = Select(driver.find_element(By.CSS_SELECTOR, "select"))
+            
+            # Mapeo de tipos de documento a índices
+            doc_type_mapping = {
+                "CC": 0,  # Cédula de Ciudadanía
+                "TI": 1,  # Tarjeta de Identidad
+                "CE": 2,  # Cédula de Extranjería
+                "PA": 3,  # Pasaporte
+                "RC": 4,  # Registro Civil
+            }
+            
+            # Seleccionar tipo de documento
+            if doc_type in doc_type_mapping:
+                select_doc_type.select_by_index(doc_type_mapping[doc_type])
+            else:
+                select_doc_type.select_by_visible_text(doc_type)
+            
+            # Ingresar número de documento
+            input_doc_number = driver.find_element(By.ID, "txtNumDoc")
+            input_doc_number.clear()
+            input_doc_number.send_keys(doc_number)
         
         # Paso 3: Simular resolución del captcha (en producción, usar 2Captcha)
-        captcha_text = simulate_2captcha_service()
+        with tracer.span("captcha_wait"):
+            captcha_text = captcha_provider()
         
-        # Ingresar texto del captcha
-        input_captcha = driver.find_element(By.ID, "Capcha_CaptchaTextBox")
-        input_captcha.clear()
-        input_captcha.send_keys(captcha_text)
+        with tracer.span("form_fill", step="captcha"):
+            # Ingresar texto del captcha
+            input_captcha = driver.find_element(By.ID, "Capcha_CaptchaTextBox")
+            input_captcha.clear()
+            input_captcha.send_keys(captcha_text)
         
-        # Paso 4: Enviar formulario
-        submit_button = driver.find_element(By.ID, "btnConsultar")
-        submit_button.click()
-        logger.info("Formulario enviado")
-        
-        # Esperar a que se procese la solicitud
-        time.sleep(3)
-
-        # Intentar detectar si se abrió una nueva ventana/pestaña para los resultados
-        try:
-            start_time = time.time()
-            timeout_window = 90  # esperar hasta 90s por nueva pestaña o cambio de URL
-            switched = False
-            last_count = len(driver.window_handles)
-            original_url = driver.current_url
-
-            while time.time() - start_time < timeout_window and not switched:
-                handles = driver.window_handles
-                # Si aparecen nuevas ventanas, probar la última primero
-                if len(handles) != last_count:
-                    last_count = len(handles)
-                for h in handles[::-1]:
-                    try:
-                        driver.switch_to.window(h)
-                        current_url = driver.current_url
-                        title_ok = False
-                        url_ok = ("RespuestaConsulta" in current_url) or ("Respuesta" in current_url)
-                        # Buscar el título dentro del body
-                        try:
-                            title_el = driver.find_elements(By.XPATH, "//*[contains(translate(., 'áéíóúÁÉÍÓÚ', 'aeiouAEIOU'), 'RESULTADOS DE LA CONSULTA')]")
-                            title_ok = len(title_el) > 0
-                        except Exception:
-                            title_ok = False
-                        if url_ok or title_ok:
-                            logger.info(f"Contexto de resultados detectado en {current_url}")
-                            switched = True
-                            break
-                    except Exception:
-                        continue
-                if not switched:
-                    # También considerar cambio de URL en la misma ventana
-                    if driver.current_url != original_url:
-                        logger.info(f"URL cambió a {driver.current_url}")
-                        break
-                    time.sleep(1.0)
-
-            if not switched:
-                logger.info("No se detectó nueva ventana; continuando en la actual.")
-        except Exception as e:
-            logger.warning(f"No se pudo verificar/cambiar de ventana: {e}")
+        # Paso 4: Enviar formulario y esperar la respuesta (nueva pestaña o página reemplazada)
+        with tracer.span("submit") as span:
+            initial_handles = list(driver.window_handles)
+            submit_button = driver.find_element(By.ID, "btnConsultar")
+            submit_button.click()
+            logger.info("Formulario enviado")
+            try:
+                span["outcome"] = WebDriverWait(driver, 90, poll_frequency=POLL_SECONDS).until(
+                    lambda d: _form_submitted(d, submit_button, initial_handles)
+                )
+                logger.info(f"Respuesta recibida ({span['outcome']}) en {driver.current_url}")
+            except TimeoutException:
+                span["outcome"] = "timeout"
+                logger.warning("No se detectó la respuesta del formulario; continuando en la ventana actual.")
         
-        # Paso 5: Extraer resultado
-        logger.info("Extrayendo resultados")
-        try:
-            WebDriverWait(driver, 25).until(
-                EC.presence_of_all_elements_located((By.TAG_NAME, "table"))
-            )
-            # Guardar captura para depuración
+        # Paso 5: Esperar a que la respuesta tenga contenido (tablas, mensaje de error o título)
+        state = None
+        with tracer.span("result_detection") as span:
             try:
-                driver.save_screenshot("resultado_adres.png")
-            except Exception:
-                pass
-        except TimeoutException:
-            logger.warning("No se detectaron tablas a tiempo; intentaré dentro de iframes.")
+                state = WebDriverWait(driver, 25, poll_frequency=POLL_SECONDS).until(_result_state)
+                span.update(tables=state.get("tables"), error=bool(state.get("error")))
+            except TimeoutException:
+                span["outcome"] = "timeout"
+                logger.warning("No se detectaron resultados a tiempo; intentaré dentro de iframes.")
+        
+        if state is None:
             # Intentar buscar dentro de iframes
-            try:
-                frames = driver.find_elements(By.TAG_NAME, "iframe")
+            with tracer.span("iframe_search") as span:
                 found_in_iframe = False
-                for i, fr in enumerate(frames):
-                    try:
-                        driver.switch_to.frame(fr)
-                        logger.info(f"Probando iframe {i+1}/{len(frames)}")
-                        tables = driver.find_elements(By.TAG_NAME, "table")
-                        if tables and len(tables) > 0:
-                            logger.info("Tablas encontradas dentro del iframe. Permaneciendo en este iframe para extraer.")
-                            found_in_iframe = True
-                            break
-                        driver.switch_to.default_content()
-                    except Exception:
+                try:
+                    frames = driver.find_elements(By.TAG_NAME, "iframe")
+                    span["iframes"] = len(frames)
+                    for i, fr in enumerate(frames):
                         try:
+                            driver.switch_to.frame(fr)
+                            logger.info(f"Probando iframe {i+1}/{len(frames)}")
+                            if _has_result(page_state(driver)):
+                                logger.info("Resultados encontrados dentro del iframe. Permaneciendo en este iframe para extraer.")
+                                found_in_iframe = True
+                                break
                             driver.switch_to.default_content()
                         except Exception:
-                            pass
-                # Volver al contenido principal solo si no se encontró nada útil en iframes
-                if not found_in_iframe:
-                    try:
-                        driver.switch_to.default_content()
-                    except Exception:
-                        pass
-            except Exception as e:
-                logger.warning(f"No fue posible iterar iframes: {e}")
-
-        # Verificar si hay mensaje de error
-        try:
-            error_msg = driver.find_element(By.ID, "lblError").text
-            logger.warning(f"Mensaje de error: {error_msg}")
-            
-            if "captcha" in error_msg.lower() or "imagen" in error_msg.lower():
-                return {"status": "error", "message": "Captcha incorrecto", "error": error_msg}
-            else:
-                return {"status": "not_found", "message": "Documento no encontrado", "error": error_msg}
-        except NoSuchElementException:
-            # No hay mensaje de error, intentar extraer la información
-            pass
-
-        # Asegurar que estamos en la página de resultados
-        try:
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.XPATH, "//*[contains(translate(., 'áéíóúÁÉÍÓÚ', 'aeiouAEIOU'), 'RESULTADOS DE LA CONSULTA')]"))
-            )
-        except TimeoutException:
-            logger.warning("No se detectó el título 'Resultados de la consulta'. Continuando con extracción por tablas.")
+                            try:
+                                driver.switch_to.default_content()
+                            except Exception:
+                                pass
+                except Exception as e:
+                    logger.warning(f"No fue posible iterar iframes: {e}")
+                span["found"] = found_in_iframe
         
-        # Extraer información
-        result = {"status": "success"}
-        
-        try:
-            # 1) Intento por IDs (si la página expone labels con ID)
-            fields_to_extract = {
-                "nombre": "lblNombre",
-                "apellidos": "lblApellidos",
-                "tipo_documento": "lblTipoDoc",
-                "documento": "lblNumDoc",
-                "estado": "lblEstado",
-                "regimen": "lblRegimen",
-                "eps": "lblEPS",
-                "fecha_afiliacion": "lblFechaAfiliacion",
-                "fecha_nacimiento": "lblFechaNacimiento",
-                "departamento": "lblDepartamento",
-                "municipio": "lblMunicipio",
-            }
-            ids_encontrados = 0
-            for field, element_id in fields_to_extract.items():
+        # Una sola instantánea del DOM (ventana o iframe actual) extraída localmente,
+        # en lugar de una llamada al WebDriver por tabla, fila y celda
+        with tracer.span("extraction") as span:
+            try:
+                # Guardar captura para depuración
                 try:
-                    el = driver.find_element(By.ID, element_id)
-                    txt = el.text.strip()
-                    if txt:
-                        result[field] = txt
-                        ids_encontrados += 1
-                except NoSuchElementException:
+                    driver.save_screenshot("resultado_adres.png")
+                except Exception:
                     pass
-
-            # 2) Fallback: Parseo por tablas visibles en la página de resultados
-            if ids_encontrados == 0:
-                import unicodedata
-
-                def norm(s: str) -> str:
-                    s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('ascii')
-                    s = ' '.join(s.upper().split())
-                    return s
-
-                tables = driver.find_elements(By.TAG_NAME, "table")
-                logger.info(f"Tablas detectadas para extracción: {len(tables)}")
-
-                # a) Información Básica (COLUMNAS | DATOS)
-                for tbl in tables:
+                html = driver.page_source
+                result = adres_result_parser.parse_result_page(html)
+                if len(result) == 1 and not adres_result_parser.has_results_title(html):
+                    # Sin datos ni título: la respuesta puede seguir cargando; otra instantánea al aparecer el título
                     try:
-                        rows = tbl.find_elements(By.TAG_NAME, "tr")
-                        if len(rows) < 2:
-                            continue
-                        header_cells = rows[0].find_elements(By.XPATH, ".//th|.//td")
-                        header = [norm(c.text) for c in header_cells]
-                        if "COLUMNAS" in header and "DATOS" in header and len(header) >= 2:
-                            for r in rows[1:]:
-                                cells = r.find_elements(By.XPATH, ".//td|.//th")
-                                if len(cells) >= 2:
-                                    label = norm(cells[0].text)
-                                    value = cells[1].text.strip()
-                                    if not value:
-                                        continue
-                                    if label == "NOMBRES":
-                                        result["nombre"] = value
-                                    elif label == "APELLIDOS":
-                                        result["apellidos"] = value
-                                    elif label in ("TIPO DE IDENTIFICACION", "TIPO DE IDENTIFICACIÓN"):
-                                        result["tipo_documento"] = value
-                                    elif label in ("NUMERO DE IDENTIFICACION", "NÚMERO DE IDENTIFICACIÓN"):
-                                        result["documento"] = value
-                                    elif label == "FECHA DE NACIMIENTO":
-                                        result["fecha_nacimiento"] = value
-                                    elif label == "DEPARTAMENTO":
-                                        result["departamento"] = value
-                                    elif label == "MUNICIPIO":
-                                        result["municipio"] = value
-                    except Exception:
-                        continue
+                        WebDriverWait(driver, 15, poll_frequency=POLL_SECONDS).until(
+                            lambda d: page_state(d).get("title")
+                        )
+                        html = driver.page_source
+                        result = adres_result_parser.parse_result_page(html)
+                    except TimeoutException:
+                        logger.warning("No se detectó el título 'Resultados de la consulta'. Continuando con extracción por tablas.")
+                save_html_snapshot(html)
+                span["status"] = result["status"]
 
-                # b) Datos de afiliación (encabezados: ESTADO | ENTIDAD | REGIMEN | FECHA DE AFILIACION EFECTIVA | ... | TIPO DE AFILIADO)
-                for tbl in tables:
-                    try:
-                        rows = tbl.find_elements(By.TAG_NAME, "tr")
-                        if len(rows) < 2:
-                            continue
-                        header_cells = rows[0].find_elements(By.XPATH, ".//th|.//td")
-                        header = [norm(c.text) for c in header_cells]
-                        if ("ESTADO" in header and "ENTIDAD" in header and "REGIMEN" in header) or \
-                           ("ESTADO" in header and "ENTIDAD" in header and "RÉGIMEN" in header):
-                            # Tomar la primera fila de datos con al menos 3 celdas
-                            data_row = None
-                            for r in rows[1:]:
-                                tds = r.find_elements(By.TAG_NAME, "td")
-                                if len(tds) >= 3:
-                                    data_row = tds
-                                    break
-                            if not data_row:
-                                continue
-                            def val(col_name_variants):
-                                for name in col_name_variants:
-                                    if name in header:
-                                        idx = header.index(name)
-                                        if idx < len(data_row):
-                                            return data_row[idx].text.strip()
-                                return None
-
-                            result["estado"] = val(["ESTADO"])
-                            result["eps"] = val(["ENTIDAD"])
-                            result["regimen"] = val(["REGIMEN", "RÉGIMEN"])
-                            result["fecha_afiliacion"] = val(["FECHA DE AFILIACION EFECTIVA", "FECHA DE AFILIACIÓN EFECTIVA"])
-                            result["tipo_afiliado"] = val(["TIPO DE AFILIADO"])
-                    except Exception:
-                        continue
-
-                # c) Fallback ultra robusto: examinar cualquier tabla con pares (label, valor)
-                if len(result.keys()) <= 1:  # solo 'status'
-                    for tbl in tables:
-                        try:
-                            rows = tbl.find_elements(By.TAG_NAME, "tr")
-                            for r in rows:
-                                cells = r.find_elements(By.XPATH, ".//td|.//th")
-                                if len(cells) < 2:
-                                    continue
-                                label = norm(cells[0].text)
-                                value = cells[1].text.strip()
-                                if not value:
-                                    continue
-                                if "NOMBRES" in label and "nombre" not in result:
-                                    result["nombre"] = value
-                                if "APELLIDOS" in label and "apellidos" not in result:
-                                    result["apellidos"] = value
-                                if "TIPO DE IDENTIFIC" in label and "tipo_documento" not in result:
-                                    result["tipo_documento"] = value
-                                if "NUMERO DE IDENTIFIC" in label and "documento" not in result:
-                                    result["documento"] = value
-                                if "FECHA DE NACIMIENTO" in label and "fecha_nacimiento" not in result:
-                                    result["fecha_nacimiento"] = value
-                                if "DEPARTAMENTO" in label and "departamento" not in result:
-                                    result["departamento"] = value
-                                if "MUNICIPIO" in label and "municipio" not in result:
-                                    result["municipio"] = value
-                                if "ESTADO" == label and "estado" not in result:
-                                    result["estado"] = value
-                                if "ENTIDAD" == label and "eps" not in result:
-                                    result["eps"] = value
-                                if ("REGIMEN" == label or "REGIMEN " in label or "REGIMEN" in label) and "regimen" not in result:
-                                    result["regimen"] = value
-                                if "FECHA DE AFILIACION EFECTIVA" in label and "fecha_afiliacion" not in result:
-                                    result["fecha_afiliacion"] = value
-                                if "TIPO DE AFILIADO" in label and "tipo_afiliado" not in result:
-                                    result["tipo_afiliado"] = value
-                        except Exception:
-                            continue
-
-            logger.info("Información extraída correctamente")
-            return result
-        except Exception as e:
-            logger.error(f"Error al extraer información: {str(e)}")
-            return {"status": "error", "message": "Error al extraer información", "error": str(e)}
+                if result["status"] != "success":
+                    logger.warning(f"Mensaje de error: {result.get('error')}")
+                    return result
+                logger.info(f"Información extraída correctamente ({len(result) - 1} campos)")
+                return result
+            except Exception as e:
+                logger.error(f"Error al extraer información: {str(e)}")
+                return {"status": "error", "message": "Error al extraer información", "error": str(e)}
     
     except Exception as e:
         logger.error(f"Error en el proceso: {str(e)}")
         return {"status": "error", "message": "Error en el proceso", "error": str(e)}
-    
-    finally:
-        # Cerrar el navegador
-        driver.quit()
-        logger.info("Navegador cerrado")
 
 def extract_document_info_from_json(json_file_path):
     """
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Utilidades de audio para la transcripción por fragmentos.
+
+Detección de voz por energía (VAD simple): el audio se divide en tramas de
+~30 ms, se calcula su energía en dB y se cortan fragmentos en los silencios.
+Así cada fragmento termina entre palabras y se puede transcribir por separado
+(modo --stream y transcripción en paralelo) sin partir frases a la mitad.
+
+Solo depende de NumPy; el audio es el array float32 mono de 16 kHz que usa
+Whisper.
+"""
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Parámetros predeterminados de la segmentación
+FRAME_MS = 30
+MIN_SILENCE_MS = 400
+MIN_CHUNK_SECONDS = 2.0
+# Whisper procesa ventanas de 30 s; fragmentos más largos se parten igual
+MAX_CHUNK_SECONDS = 28.0
+# Umbral de silencio: dB por encima del piso de ruido estimado
+SILENCE_MARGIN_DB = 12.0
+# Piso absoluto: por debajo de esto siempre es silencio
+SILENCE_FLOOR_DB = -55.0
+# Ritmo de habla rápido (palabras por segundo), para acotar cuántas palabras
+# caben en el audio compartido por dos fragmentos
+SPEECH_WORDS_PER_SECOND = 3.0
+
+def frame_energy_db(audio, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+    """Energía RMS en dB de cada trama (la última trama incompleta se descarta)."""
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return np.empty(0, dtype=np.float64), frame_len
+    frames = np.asarray(audio[:n_frames * frame_len], dtype=np.float64).reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-10)), frame_len
+
+def silence_threshold_db(energy_db, margin_db=SILENCE_MARGIN_DB):
+    """
+    Umbral adaptativo: piso de ruido (percentil 10) más un margen, sin pasar
+    de `margin_db` por debajo del nivel de voz (percentil 90). El segundo
+    límite cubre grabaciones casi sin pausas, donde el percentil 10 ya es voz.
+    """
+    if energy_db.size == 0:
+        return SILENCE_FLOOR_DB
+    noise_floor, speech_level = np.percentile(energy_db, [10, 90]).tolist()
+    return max(min(noise_floor + margin_db, speech_level - margin_db), SILENCE_FLOOR_DB)
+
+def _runs(mask):
+    """Tramos consecutivos en True de un array booleano: lista de (inicio, fin)."""
+    padded = np.concatenate([[False], mask, [False]])
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+def split_on_silence(audio, sample_rate=SAMPLE_RATE, min_silence_ms=MIN_SILENCE_MS,
+                     min_chunk_seconds=MIN_CHUNK_SECONDS, max_chunk_seconds=MAX_CHUNK_SECONDS,
+                     frame_ms=FRAME_MS, margin_db=SILENCE_MARGIN_DB):
+    """
+    Divide el audio en fragmentos cortados en silencios.
+
+    Los cortes se ubican en el centro de cada silencio de al menos
+    `min_silence_ms`. Fragmentos más cortos que `min_chunk_seconds` se unen
+    con el siguiente y los más largos que `max_chunk_seconds` se parten en la
+    trama de menor energía. Los fragmentos sin voz se descartan.
+
+    Args:
+        audio: array float32 mono
+        sample_rate: frecuencia de muestreo
+
+    Returns:
+        lista de (inicio, fin) en muestras, en orden
+    """
+    total = len(audio)
+    energy_db, frame_len = frame_energy_db(audio, sample_rate, frame_ms)
+    if energy_db.size == 0:
+        return [(0, total)] if total else []
+
+    threshold = silence_threshold_db(energy_db, margin_db)
+    silent = energy_db < threshold
+    if silent.all():
+        return []
+
+    # Puntos de corte (en tramas) en el centro de los silencios largos
+    min_silence_frames = max(1, int(min_silence_ms / frame_ms))
+    cuts = [(start + end) // 2 for start, end in _runs(silent)
+            if end - start >= min_silence_frames and start > 0 and end < silent.size]
+    boundaries = [0] + cuts + [energy_db.size]
+
+    min_frames = int(min_chunk_seconds * 1000 / frame_ms)
+    max_frames = max(1, int(max_chunk_seconds * 1000 / frame_ms))
+
+    # Unir fragmentos demasiado cortos
+    merged = [boundaries[0]]
+    for boundary in boundaries[1:-1]:
+        if boundary - merged[-1] >= min_frames:
+            merged.append(boundary)
+    if len(merged) > 1 and boundaries[-1] - merged[-1] < min_frames:
+        merged.pop()
+    merged.append(boundaries[-1])
+
+    # Partir fragmentos demasiado largos en su trama más silenciosa
+    frame_chunks = []
+    for start, end in zip(merged[:-1], merged[1:]):
+        while end - start > max_frames:
+            # Buscar el corte en la segunda mitad de la ventana para no dejar trozos mínimos
+            window_start = start + max_frames // 2
+            cut = window_start + int(np.argmin(energy_db[window_start:start + max_frames]))
+            frame_chunks.append((start, cut))
+            start = cut
+        frame_chunks.append((start, end))
+
+    chunks = []
+    for start, end in frame_chunks:
+        if silent[start:end].all():
+            continue
+        sample_end = total if end == energy_db.size else end * frame_len
+        chunks.append((start * frame_len, sample_end))
+    return chunks
+
+def _normalize_word(word):
+    """Palabra en minúsculas sin puntuación, para comparar uniones."""
+    return ''.join(ch for ch in word.lower() if ch.isalnum())
+
+def overlap_word_limit(pad_seconds):
+    """
+    Máximo de palabras que pueden repetirse en una unión cuando cada fragmento
+    lleva `pad_seconds` de audio extra a cada lado (2 con 0.3 s). Los cortes
+    caen en silencios, así que el audio compartido es casi todo silencio; una
+    frase que el hablante repite tras una pausa no debe quitarse.
+    """
+    return max(1, int(round(2 * pad_seconds * SPEECH_WORDS_PER_SECOND)))
+
+def merge_segment_texts(texts, max_overlap_words=2):
+    """
+    Une los textos de fragmentos consecutivos quitando las palabras repetidas
+    en cada unión (los fragmentos se transcriben con un pequeño solapamiento,
+    así que el final de uno puede repetirse al inicio del siguiente).
+
+    Args:
+        texts: textos en orden
+        max_overlap_words: máximo de palabras repetidas que se quitan por unión
+            (ver overlap_word_limit); más que eso borraría repeticiones reales
+
+    Returns:
+        str con el texto completo
+    """
+    merged = []
+    for text in texts:
+        words = text.split()
+        if not words:
+            continue
+        tail = [_normalize_word(word) for word in merged[-max_overlap_words:]]
+        head = [_normalize_word(word) for word in words[:max_overlap_words]]
+        overlap = 0
+        for size in range(min(len(tail), len(head)), 0, -1):
+            if tail[-size:] == head[:size] and any(head[:size]):
+                # Una sola palabra corta repetida ("de", "la") puede ser legítima
+                if size > 1 or len(head[0]) > 2:
+                    overlap = size
+                break
+        merged.extend(words[overlap:])
+    return ' '.join(merged)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Benchmark de transcribe.py por tamaño de modelo en la CPU actual.
+
+Para cada modelo (por defecto tiny, base y small) y perfil mide, en un proceso
+nuevo para que la carga sea en frío y la memoria no se mezcle:
+  - carga del modelo
+  - decodificación de cada audio (ffmpeg, igual que en producción)
+  - inferencia y factor de tiempo real (RTF = inferencia / duración del audio)
+  - memoria residente máxima (peak RSS)
+
+El audio de prueba se genera en español con espeak-ng (o espeak) con varias
+duraciones, o se pasan archivos propios con --audio (recomendado: dictados
+reales, la síntesis es más fácil de transcribir que una consulta).
+
+Con las mediciones recomienda el modelo más grande cuyo peor RTF no supere
+--max-rtf y el timeout (WHISPER_TIMEOUT_MS de whisperStt.js) para audios de
+hasta --max-audio-seconds, con y sin daemon:
+
+  python benchmark_whisper.py --output whisper_bench.json
+  python benchmark_whisper.py --audio dictado1.webm dictado2.webm --models base,small
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import wave
+import shutil
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+DEFAULT_MODELS = ('tiny', 'base', 'small')
+# Duraciones (segundos) del audio generado
+DEFAULT_LENGTHS = (15, 60, 180)
+
+# Frases de consulta para la síntesis; se repiten hasta la duración pedida
+SPANISH_SENTENCES = (
+    "Paciente de sesenta y siete años que consulta por dolor de cabeza de tres días de evolución.",
+    "Refiere antecedentes de hipertensión arterial en tratamiento con losartán cincuenta miligramos al día.",
+    "Niega fiebre, vómito o pérdida de fuerza en las extremidades.",
+    "Al examen físico presenta tensión arterial de ciento cincuenta sobre noventa y cinco.",
+    "Se solicita glucemia en ayunas, perfil lipídico y electrocardiograma.",
+    "Se indica control en quince días con los resultados de laboratorio.",
+)
+SENTENCE_PAUSE_SECONDS = 0.6
+
+def find_tts():
+    """Ejecutable de síntesis de voz disponible (espeak-ng o espeak), o None."""
+    return shutil.which('espeak-ng') or shutil.which('espeak')
+
+def synthesize_sentence(tts, text, path):
+    subprocess.run([tts, '-v', 'es', '-s', '150', '-w', str(path), text],
+                   check=True, capture_output=True)
+
+def generate_audio(output_dir, lengths=DEFAULT_LENGTHS):
+    """
+    Genera un WAV por duración concatenando frases sintetizadas con pausas.
+
+    Returns:
+        lista de rutas generadas
+    """
+    tts = find_tts()
+    if tts is None:
+        raise RuntimeError("No se encontró espeak-ng ni espeak; instálelo o pase archivos con --audio")
+
+    output_dir = Path(output_dir)
+    sentences = []
+    params = None
+    for index, text in enumerate(SPANISH_SENTENCES):
+        path = output_dir / f'sentence_{index}.wav'
+        synthesize_sentence(tts, text, path)
+        with wave.open(str(path), 'rb') as f:
+            params = f.getparams()
+            sentences.append(f.readframes(f.getnframes()))
+
+    frame_bytes = params.sampwidth * params.nchannels
+    pause = b'\x00' * (int(SENTENCE_PAUSE_SECONDS * params.framerate) * frame_bytes)
+    paths = []
+    for seconds in lengths:
+        target_frames = int(seconds * params.framerate)
+        frames = bytearray()
+        index = 0
+        while len(frames) // frame_bytes < target_frames:
+            frames += sentences[index % len(sentences)] + pause
+            index += 1
+        path = output_dir / f'es_{seconds}s.wav'
+        with wave.open(str(path), 'wb') as f:
+            f.setparams(params)
+            f.writeframes(bytes(frames[:target_frames * frame_bytes]))
+        paths.append(str(path))
+    return paths
+
+def _rss_mb():
+    """RSS actual del proceso en MB (Linux), o None."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def _peak_rss_mb():
+    """RSS máximo del proceso en MB."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def measure_model(model_name, profile, audio_paths, language='es'):
+    """
+    Mediciones de un modelo dentro del proceso actual (se llama en un proceso
+    nuevo por modelo, ver run_worker).
+    """
+    import transcribe
+    from whisper_profiles import decode_options
+
+    rss_before = _rss_mb()
+    whisper = transcribe.import_whisper()
+    started = time.perf_counter()
+    model = transcribe.load_model(model_name, profile)
+    load_seconds = time.perf_counter() - started
+    rss_after_load = _rss_mb()
+
+    files = []
+    for path in audio_paths:
+        started = time.perf_counter()
+        audio = whisper.load_audio(path)
+        decode_seconds = time.perf_counter() - started
+        audio_seconds = len(audio) / transcribe.SAMPLE_RATE
+
+        started = time.perf_counter()
+        result = model.transcribe(audio, language=language, task='transcribe', **decode_options(profile))
+        inference_seconds = time.perf_counter() - started
+        text = result.get('text', '').strip()
+        files.append({
+            'audio': path,
+            'audio_seconds': round(audio_seconds, 2),
+            'decode_seconds': round(decode_seconds, 3),
+            'inference_seconds': round(inference_seconds, 3),
+            'rtf': round(inference_seconds / audio_seconds, 4) if audio_seconds else None,
+            'words': len(text.split()),
+            'text_preview': text[:160],
+        })
+
+    return {
+        'model': model_name,
+        'profile': profile,
+        'load_seconds': round(load_seconds, 3),
+        'rss_before_load_mb': rss_before,
+        'rss_after_load_mb': rss_after_load,
+        'peak_rss_mb': _peak_rss_mb(),
+        'files': files,
+        'max_rtf': max((entry['rtf'] for entry in files if entry['rtf'] is not None), default=None),
+        'max_decode_rtf': max((entry['decode_seconds'] / entry['audio_seconds']
+                               for entry in files if entry['audio_seconds']), default=None),
+    }
+
+def run_worker(model_name, profile, audio_paths, language, timeout):
+    """Ejecuta measure_model en un proceso nuevo y retorna su resultado."""
+    command = [sys.executable, str(Path(__file__).resolve()), '--worker', model_name,
+               '--profiles', profile, '--language', language, '--audio', *audio_paths]
+    started = time.perf_counter()
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'model': model_name, 'profile': profile, 'error': f'Timeout de {timeout} s'}
+    wall_seconds = time.perf_counter() - started
+    try:
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+    except (IndexError, json.JSONDecodeError):
+        return {'model': model_name, 'profile': profile,
+                'error': (completed.stderr.strip() or 'sin salida')[-300:]}
+    if not result.pop('success', False):
+        return {'model': model_name, 'profile': profile, 'error': result.get('error')}
+    # Incluye intérprete, imports de torch/whisper y carga: lo que paga un proceso por petición
+    result['process_wall_seconds'] = round(wall_seconds, 3)
+    return result
+
+def recommend(results, max_rtf, max_audio_seconds, safety=2.0):
+    """
+    Modelo más grande (en el orden medido) cuyo peor RTF no supera max_rtf, y
+    timeouts para un audio de max_audio_seconds con margen `safety`.
+    """
+    candidates = [result for result in results if not result.get('error') and result.get('max_rtf') is not None]
+    if not candidates:
+        return {'model': None, 'reason': 'Ningún modelo terminó el benchmark'}
+    fitting = [result for result in candidates if result['max_rtf'] <= max_rtf]
+    chosen = fitting[-1] if fitting else min(candidates, key=lambda result: result['max_rtf'])
+
+    work_seconds = (chosen['max_rtf'] + (chosen['max_decode_rtf'] or 0.0)) * max_audio_seconds
+    def round_up(seconds):
+        # Múltiplos de 5 s, mínimo 30 s
+        return max(30, int(math.ceil(seconds / 5.0)) * 5)
+
+    # Arranque del intérprete, imports y carga del modelo en un proceso nuevo
+    measured_work = sum(entry['inference_seconds'] + entry['decode_seconds'] for entry in chosen['files'])
+    startup_seconds = max(chosen.get('process_wall_seconds', 0.0) - measured_work, chosen['load_seconds'])
+    daemon_timeout = round_up(work_seconds * safety)
+    one_shot_timeout = round_up((work_seconds + startup_seconds) * safety)
+    return {
+        'model': chosen['model'],
+        'profile': chosen['profile'],
+        'max_rtf_measured': chosen['max_rtf'],
+        'within_target': bool(fitting),
+        'reason': (f"Modelo más grande con RTF <= {max_rtf}" if fitting
+                   else f"Ningún modelo cumple RTF <= {max_rtf}; se elige el más rápido"),
+        'max_audio_seconds': max_audio_seconds,
+        'safety_factor': safety,
+        'startup_seconds': round(startup_seconds, 3),
+        # Con daemon el modelo ya está cargado; un proceso por petición paga la carga
+        'timeout_ms': {'daemon': daemon_timeout * 1000, 'one_shot': one_shot_timeout * 1000},
+        # whisperStt.js usa el mismo timeout para el daemon y para el respaldo de un proceso
+        'env': {
+            'WHISPER_MODEL': chosen['model'],
+            'WHISPER_PROFILE': chosen['profile'],
+            'WHISPER_TIMEOUT_MS': str(one_shot_timeout * 1000),
+        },
+    }
+
+def environment_info():
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': shutil.which('ffmpeg'),
+    }
+    for module in ('whisper', 'torch', 'numpy'):
+        try:
+            info[module] = getattr(__import__(module), '__version__', 'desconocida')
+        except ImportError:
+            info[module] = None
+    try:
+        import torch
+        info['torch_threads'] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+def run_benchmark(models, profiles, audio_paths=None, lengths=DEFAULT_LENGTHS, language='es',
+                  max_rtf=0.5, max_audio_seconds=300, worker_timeout=3600):
+    """
+    Ejecuta todas las mediciones.
+
+    Returns:
+        dict serializable a JSON con el entorno, los audios, los resultados y la recomendación
+    """
+    generated_dir = None
+    if not audio_paths:
+        generated_dir = tempfile.TemporaryDirectory(prefix='whisper_bench_')
+        sys.stderr.write("Generando audio de prueba en español...\n")
+        audio_paths = generate_audio(generated_dir.name, lengths)
+    try:
+        results = []
+        for model_name in models:
+            for profile in profiles:
+                sys.stderr.write(f"Midiendo {model_name} ({profile})...\n")
+                results.append(run_worker(model_name, profile, audio_paths, language, worker_timeout))
+        return {
+            'success': True,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'environment': environment_info(),
+            'audio': {'generated': generated_dir is not None, 'files': audio_paths, 'language': language},
+            'results': results,
+            'recommendation': recommend(results, max_rtf, max_audio_seconds),
+        }
+    finally:
+        if generated_dir is not None:
+            generated_dir.cleanup()
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark de Whisper por tamaño de modelo")
+    parser.add_argument("--models", default=','.join(DEFAULT_MODELS), help="Modelos separados por coma, de menor a mayor")
+    parser.add_argument("--profiles", default='default', help="Perfiles de inferencia separados por coma")
+    parser.add_argument("--audio", nargs='+', help="Archivos de audio propios (en lugar de generarlos)")
+    parser.add_argument("--lengths", default=','.join(str(s) for s in DEFAULT_LENGTHS),
+                        help="Duraciones en segundos del audio generado")
+    parser.add_argument("--language", default='es', help="Idioma")
+    parser.add_argument("--max-rtf", type=float, default=0.5,
+                        help="RTF máximo aceptable para recomendar un modelo (por defecto 0.5)")
+    parser.add_argument("--max-audio-seconds", type=float, default=300,
+                        help="Duración máxima de audio esperada para calcular el timeout")
+    parser.add_argument("--output", default="-", help="Archivo JSON de resultados ('-' = stdout)")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    profiles = [name.strip() for name in args.profiles.split(',') if name.strip()]
+
+    if args.worker:
+        # Proceso hijo: un modelo y un perfil
+        try:
+            result = dict(measure_model(args.worker, profiles[0], args.audio, args.language), success=True)
+        except Exception as e:
+            result = {'success': False, 'error': f'{type(e).__name__}: {str(e)}'}
+        print(json.dumps(result, ensure_ascii=False))
+        sys.exit(0 if result['success'] else 1)
+
+    try:
+        report = run_benchmark(
+            [name.strip() for name in args.models.split(',') if name.strip()],
+            profiles,
+            audio_paths=args.audio,
+            lengths=[int(value) for value in args.lengths.split(',') if value.strip()],
+            language=args.language,
+            max_rtf=args.max_rtf,
+            max_audio_seconds=args.max_audio_seconds,
+        )
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}, ensure_ascii=False))
+        sys.exit(1)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        sys.stderr.write(f"Resultados guardados en {args.output}\n")
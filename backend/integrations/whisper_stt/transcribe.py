@@ -1,18 +1,42 @@
 #!/usr/bin/env python3
 """
 Script para transcribir audio usando Whisper de OpenAI.
-Uso: python transcribe.py <ruta_audio> [modelo] [idioma]
+Uso:
+  python transcribe.py <ruta_audio> [modelo] [idioma]
+  python transcribe.py - [modelo] [idioma] < audio.webm     (audio por stdin, sin archivos)
+  python transcribe.py --stream <ruta_audio|-> [modelo] [idioma]  (eventos NDJSON por fragmento)
+  python transcribe.py --parallel N <ruta_audio|-> [modelo] [idioma]  (N procesos; 0 = todos los núcleos)
+  python transcribe.py --daemon [--socket RUTA | --port PUERTO] [--models base,small]
+  python transcribe.py --batch <carpeta|manifiesto> --output resultados.ndjson [--concurrency N]
+  python transcribe.py --compare <ruta_audio> [--profiles default,cpu-greedy,cpu-int8]
+
+Los modos de un archivo, --stream y --parallel aceptan --profile NOMBRE
+(default, cpu-greedy, cpu-int8; ver whisper_profiles.py).
 """
 import sys
 import os
 import json
 import time
 import signal
+import subprocess
+
+# Whisper trabaja con audio mono a 16 kHz (SAMPLE_RATE)
+from audio_utils import SAMPLE_RATE, split_on_silence, merge_segment_texts, overlap_word_limit
+from whisper_profiles import DEFAULT_PROFILE, default_threads, decode_options, get_profile, prepare_model
+import transcription_cache
 
 # Logs de progreso (van a stderr para no interferir con JSON en stdout)
 def log_progress(message):
     print(f"[Whisper-Python] {message}", file=sys.stderr, flush=True)
 
+# Tamaño máximo del audio recibido por stdin o por el socket del daemon
+MAX_AUDIO_BYTES = 50 * 1024 * 1024
+
+# Solapamiento de cada fragmento con sus vecinos en modo paralelo; las palabras
+# repetidas en las uniones (las que caben en este audio) se quitan con
+# merge_segment_texts
+SEGMENT_PAD_SECONDS = 0.3
+
 # Variable global para manejar señales de terminación
 terminate_requested = False
 
@@ -26,68 +50,127 @@ def signal_handler(signum, frame):
     print(json.dumps(error))
     sys.exit(1)
 
-# Registrar manejadores de señales
-signal.signal(signal.SIGTERM, signal_handler)
-signal.signal(signal.SIGINT, signal_handler)
+def import_whisper():
+    """
+    Importa whisper. Se hace bajo demanda para que el daemon y otros módulos
+    puedan importar este archivo sin cargar torch en el proceso principal.
+    """
+    try:
+        import whisper
+    except ImportError as e:
+        raise ImportError(f'Whisper no está instalado: {str(e)}. Ejecuta: pip install openai-whisper')
+    return whisper
 
-try:
-    import whisper
-except ImportError as e:
-    error = {'error': f'Whisper no está instalado: {str(e)}. Ejecuta: pip install openai-whisper', 'success': False}
-    print(json.dumps(error), file=sys.stderr)
-    sys.exit(1)
+# Modelos ya cargados en este proceso por (modelo, perfil); el daemon los mantiene entre trabajos
+_loaded_models = {}
+# Hilos de torch fijados en este proceso (None = valor predeterminado de torch)
+_torch_threads = None
 
-def transcribe_audio(audio_path, model_name='base', language='es'):
+def set_torch_threads(threads):
+    """Fija los hilos de torch del proceso."""
+    global _torch_threads
+    import torch
+    torch.set_num_threads(threads)
+    _torch_threads = threads
+
+def load_model(model_name, profile=DEFAULT_PROFILE):
+    """Carga un modelo de Whisper una sola vez por proceso y perfil."""
+    key = (model_name, profile)
+    if key not in _loaded_models:
+        settings = get_profile(profile)
+        whisper = import_whisper()
+        if settings['pin_threads'] and _torch_threads is None:
+            set_torch_threads(default_threads())
+        # Cargar el modelo (se descarga automáticamente la primera vez)
+        log_progress(f"Cargando modelo {model_name} (perfil {profile})...")
+        start_load = time.time()
+        if settings['quantize']:
+            # La cuantización dinámica int8 solo corre en CPU
+            model = whisper.load_model(model_name, device='cpu')
+        else:
+            model = whisper.load_model(model_name)
+        _loaded_models[key] = prepare_model(model, profile)
+        log_progress(f"Modelo cargado en {time.time() - start_load:.2f} segundos")
+    return _loaded_models[key]
+
+def decode_audio_bytes(data, sample_rate=SAMPLE_RATE):
     """
-    Transcribe un archivo de audio usando Whisper.
-    
+    Decodifica audio en memoria: los bytes entran a ffmpeg por stdin y el PCM
+    sale por stdout, sin archivos temporales. Equivale a whisper.load_audio.
+
     Args:
-        audio_path: Ruta al archivo de audio
+        data: bytes del audio en cualquier formato que entienda ffmpeg (webm, ogg, wav...)
+        sample_rate: frecuencia de muestreo de salida
+
+    Returns:
+        numpy.ndarray float32 mono en [-1, 1]
+    """
+    import numpy as np
+    if not data:
+        raise ValueError('Audio vacío')
+    cmd = [
+        'ffmpeg', '-nostdin', '-threads', '0', '-i', 'pipe:0',
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sample_rate), 'pipe:1'
+    ]
+    try:
+        result = subprocess.run(cmd, input=data, capture_output=True, check=False)
+    except FileNotFoundError:
+        raise RuntimeError('ffmpeg no está instalado o no está en el PATH')
+    if result.returncode != 0 or not result.stdout:
+        details = result.stderr.decode('utf-8', errors='replace').strip().splitlines()[-3:]
+        # mp4/m4a con el índice al final no se pueden leer desde un pipe
+        raise RuntimeError(f"ffmpeg no pudo decodificar el audio: {' | '.join(details) or 'sin salida'}")
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+def transcribe_audio(audio, model_name='base', language='es', profile=DEFAULT_PROFILE):
+    """
+    Transcribe audio usando Whisper.
+
+    Args:
+        audio: Ruta al archivo de audio o array float32 a 16 kHz ya decodificado
         model_name: Modelo de Whisper a usar (tiny, base, small, medium, large)
         language: Código de idioma (es para español)
-    
+        profile: Perfil de inferencia (ver whisper_profiles.py)
+
     Returns:
         str: Texto transcrito
     """
     global terminate_requested
-    
+
     try:
         log_progress(f"Iniciando transcripción con modelo {model_name}, idioma {language}")
-        
+
         # Verificar si se solicitó terminación antes de empezar
         if terminate_requested:
             raise InterruptedError("Proceso interrumpido antes de iniciar")
-        
-        # Cargar el modelo (se descarga automáticamente la primera vez)
-        log_progress(f"Cargando modelo {model_name}...")
-        start_load = time.time()
-        model = whisper.load_model(model_name)
-        
+
+        model = load_model(model_name, profile)
+
         # Verificar si se solicitó terminación durante la carga
         if terminate_requested:
             raise InterruptedError("Proceso interrumpido durante la carga del modelo")
-        
-        load_time = time.time() - start_load
-        log_progress(f"Modelo cargado en {load_time:.2f} segundos")
-        
+
         # Transcribir el audio
-        log_progress(f"Transcribiendo audio: {audio_path}")
+        if isinstance(audio, str):
+            log_progress(f"Transcribiendo audio: {audio}")
+        else:
+            log_progress(f"Transcribiendo audio en memoria: {len(audio) / SAMPLE_RATE:.1f} segundos")
         start_transcribe = time.time()
-        result = model.transcribe(audio_path, language=language, task='transcribe')
-        
+        result = model.transcribe(audio, language=language, task='transcribe', **decode_options(profile))
+
         # Verificar si se solicitó terminación durante la transcripción
         if terminate_requested:
             raise InterruptedError("Proceso interrumpido durante la transcripción")
-        
+
         transcribe_time = time.time() - start_transcribe
         log_progress(f"Transcripción completada en {transcribe_time:.2f} segundos")
-        
+
         # Retornar el texto transcrito
         text = result.get('text', '').strip()
         if not text:
             log_progress("Advertencia: El resultado está vacío")
         return text
-    
+
     except KeyboardInterrupt:
         log_progress("Interrupción por teclado detectada")
         raise
@@ -98,35 +181,387 @@ def transcribe_audio(audio_path, model_name='base', language='es'):
         log_progress(f"Error en transcribe_audio: {type(e).__name__}: {str(e)}")
         raise
 
-if __name__ == '__main__':
+# Caché de transcripciones del proceso (ver transcription_cache.py)
+_transcription_cache = None
+_cache_unavailable = False
+
+def get_transcription_cache():
+    """
+    Retorna el caché de transcripciones, o None si está desactivado
+    (WHISPER_CACHE_SIZE=0) o no se pudo abrir la base.
+    """
+    global _transcription_cache, _cache_unavailable
+    if _transcription_cache is None and not _cache_unavailable:
+        if transcription_cache.CACHE_SIZE <= 0:
+            _cache_unavailable = True
+            return None
+        try:
+            _transcription_cache = transcription_cache.TranscriptionCache()
+        except Exception as e:
+            # Sin caché se sigue transcribiendo normalmente
+            log_progress(f"Caché de transcripciones no disponible: {type(e).__name__}: {str(e)}")
+            _cache_unavailable = True
+    return _transcription_cache
+
+def cache_lookup(audio, model_name, language, profile, mode='sequential'):
+    """
+    Busca la transcripción del audio decodificado en el caché. `mode` es
+    'parallel' cuando el texto sale de segmentos unidos (--parallel).
+
+    Returns:
+        tuple (resultado o None, referencia para cache_store o None)
+    """
+    cache = get_transcription_cache()
+    if cache is None:
+        return None, None
+    try:
+        audio_sha256 = cache.audio_sha256(audio)
+        key = cache.key_for(audio_sha256, model_name, language, profile, mode)
+        return cache.get(key), (key, audio_sha256, model_name, language, profile)
+    except Exception as e:
+        log_progress(f"Error consultando el caché: {type(e).__name__}: {str(e)}")
+        return None, None
+
+def cache_store(reference, text, audio_seconds):
+    """
+    Guarda una transcripción nueva (referencia obtenida con cache_lookup).
+    Un texto vacío (silencio o decodificación fallida) no se guarda.
+    """
+    if reference is None or not (text or '').strip():
+        return
     try:
-        if len(sys.argv) < 2:
+        get_transcription_cache().put(*reference, text=text, audio_seconds=audio_seconds)
+    except Exception as e:
+        log_progress(f"Error guardando en el caché: {type(e).__name__}: {str(e)}")
+
+def transcribe_request(request):
+    """
+    Atiende un trabajo del daemon con el modelo ya residente en memoria.
+
+    Args:
+        request: dict con 'audio_path' o 'audio' (bytes del archivo, se
+            decodifican en memoria) y opcionalmente 'model', 'language' y 'profile'
+
+    Returns:
+        dict con 'success', 'text', 'cached' y los tiempos de decodificación e inferencia
+    """
+    try:
+        model_name = request.get('model') or 'base'
+        language = request.get('language') or 'es'
+        profile = request.get('profile') or DEFAULT_PROFILE
+        audio_bytes = request.get('audio')
+        audio_path = request.get('audio_path')
+        if audio_bytes is None:
+            if not audio_path:
+                return {'success': False, 'error': "Falta 'audio_path' o 'audio_bytes'"}
+            if not os.path.exists(audio_path):
+                return {'success': False, 'error': f'Archivo no encontrado: {audio_path}'}
+
+        whisper = import_whisper()
+
+        start_decode = time.time()
+        if audio_bytes is not None:
+            audio = decode_audio_bytes(audio_bytes)
+        else:
+            audio = whisper.load_audio(audio_path)
+        decode_time = time.time() - start_decode
+        audio_seconds = round(len(audio) / SAMPLE_RATE, 2)
+
+        start_lookup = time.time()
+        cached, cache_reference = cache_lookup(audio, model_name, language, profile)
+        lookup_time = time.time() - start_lookup
+
+        if cached is not None:
+            text = cached['text']
+            transcribe_time = 0.0
+        else:
+            model = load_model(model_name, profile)
+            start_transcribe = time.time()
+            result = model.transcribe(audio, language=language, task='transcribe', **decode_options(profile))
+            transcribe_time = time.time() - start_transcribe
+            text = result.get('text', '').strip()
+            cache_store(cache_reference, text, audio_seconds)
+
+        return {
+            'success': True,
+            'text': text,
+            'model': model_name,
+            'profile': profile,
+            'language': language,
+            'audio_seconds': audio_seconds,
+            'cached': cached is not None,
+            'timings': {
+                'decode_seconds': round(decode_time, 3),
+                'cache_seconds': round(lookup_time, 3),
+                'inference_seconds': round(transcribe_time, 3),
+            },
+        }
+    except Exception as e:
+        log_progress(f"Error en transcribe_request: {type(e).__name__}: {str(e)}")
+        return {'success': False, 'error': f'{type(e).__name__}: {str(e)}', 'type': type(e).__name__}
+
+def read_stdin_audio():
+    """Lee los bytes del audio desde stdin (máximo MAX_AUDIO_BYTES)."""
+    data = sys.stdin.buffer.read(MAX_AUDIO_BYTES + 1)
+    if len(data) > MAX_AUDIO_BYTES:
+        raise ValueError(f'Audio demasiado grande (máximo {MAX_AUDIO_BYTES} bytes)')
+    log_progress(f"Audio recibido por stdin: {len(data)} bytes")
+    return data
+
+def iter_transcribe_chunks(audio, model_name='base', language='es', chunks=None, profile=DEFAULT_PROFILE):
+    """
+    Transcribe el audio por fragmentos cortados en silencios, en orden.
+
+    Cada fragmento recibe como contexto (initial_prompt) el final del texto
+    anterior, para conservar la puntuación y los nombres entre fragmentos.
+
+    Args:
+        audio: array float32 a 16 kHz
+        model_name: Modelo de Whisper
+        language: Código de idioma
+        chunks: fragmentos (inicio, fin) en muestras; por defecto split_on_silence
+        profile: Perfil de inferencia
+
+    Yields:
+        dict por fragmento: index, start, end (segundos), text, inference_seconds
+    """
+    model = load_model(model_name, profile)
+    options = decode_options(profile)
+    if chunks is None:
+        chunks = split_on_silence(audio, SAMPLE_RATE)
+    previous_text = ''
+    for index, (start, end) in enumerate(chunks):
+        if terminate_requested:
+            raise InterruptedError("Proceso interrumpido durante la transcripción")
+        started = time.time()
+        result = model.transcribe(
+            audio[start:end], language=language, task='transcribe',
+            initial_prompt=previous_text[-200:] or None, **options
+        )
+        text = result.get('text', '').strip()
+        if text:
+            previous_text = f'{previous_text} {text}'.strip()
+        yield {
+            'index': index,
+            'chunks': len(chunks),
+            'start': round(start / SAMPLE_RATE, 2),
+            'end': round(end / SAMPLE_RATE, 2),
+            'text': text,
+            'inference_seconds': round(time.time() - started, 3),
+        }
+
+# Modelo y perfil del proceso actual dentro del pool de transcripción en paralelo
+_parallel_model_name = None
+_parallel_profile = DEFAULT_PROFILE
+
+def _init_parallel_worker(model_name, threads, profile=DEFAULT_PROFILE):
+    """Inicializador del pool: fija los hilos de torch y carga el modelo una sola vez."""
+    global _parallel_model_name, _parallel_profile
+    # La interrupción la maneja el proceso principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_torch_threads(threads)
+    _parallel_model_name = model_name
+    _parallel_profile = profile
+    load_model(model_name, profile)
+
+def _transcribe_segment(task):
+    """Transcribe un fragmento dentro de un worker del pool."""
+    index, audio, language = task
+    started = time.time()
+    result = load_model(_parallel_model_name, _parallel_profile).transcribe(
+        audio, language=language, task='transcribe', **decode_options(_parallel_profile)
+    )
+    return index, result.get('text', '').strip(), time.time() - started
+
+def transcribe_parallel(audio, model_name='base', language='es', workers=0, pad_seconds=SEGMENT_PAD_SECONDS,
+                        profile=DEFAULT_PROFILE):
+    """
+    Transcribe audio largo repartiendo los fragmentos (cortados en silencios)
+    entre varios procesos, y une el texto en orden.
+
+    Cada worker carga el modelo una vez y usa núcleos/workers hilos de torch,
+    para que los procesos no compitan por los mismos núcleos.
+
+    Args:
+        audio: array float32 a 16 kHz
+        model_name: Modelo de Whisper
+        language: Código de idioma
+        workers: procesos (0 = todos los núcleos)
+        pad_seconds: audio extra a cada lado de un fragmento
+        profile: Perfil de inferencia
+
+    Returns:
+        dict con 'text', 'segments', 'workers' y 'threads_per_worker'
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    cores = os.cpu_count() or 1
+    segments = split_on_silence(audio, SAMPLE_RATE)
+    workers = max(1, min(workers or cores, len(segments) or 1))
+    threads = max(1, cores // workers)
+    pad = int(pad_seconds * SAMPLE_RATE)
+    tasks = [
+        (index, audio[max(0, start - pad):min(len(audio), end + pad)], language)
+        for index, (start, end) in enumerate(segments)
+    ]
+    log_progress(f"Transcripción en paralelo: {len(tasks)} fragmentos, {workers} procesos x {threads} hilos")
+
+    texts = [''] * len(tasks)
+    # spawn: torch no es seguro tras fork con sus hilos ya iniciados
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_parallel_worker, initargs=(model_name, threads, profile)) as pool:
+        for index, text, seconds in pool.map(_transcribe_segment, tasks):
+            texts[index] = text
+            log_progress(f"Fragmento {index + 1}/{len(tasks)} transcrito en {seconds:.2f} segundos")
+
+    return {
+        'text': merge_segment_texts(texts, max_overlap_words=overlap_word_limit(pad_seconds)),
+        'segments': len(tasks),
+        'workers': workers,
+        'threads_per_worker': threads,
+    }
+
+def emit_event(event):
+    """Escribe un evento NDJSON en stdout y lo envía de inmediato."""
+    print(json.dumps(event, ensure_ascii=False), flush=True)
+
+def main_stream(argv, profile=DEFAULT_PROFILE):
+    """
+    Modo streaming: emite un evento NDJSON por fragmento apenas está listo.
+
+    Eventos: 'start' (duración y número de fragmentos), 'partial' (texto de
+    cada fragmento), 'final' (texto completo) o 'error'.
+    """
+    signal.signal(signal.SIGTERM, signal_handler)
+    signal.signal(signal.SIGINT, signal_handler)
+
+    if len(argv) < 1:
+        emit_event({'event': 'error', 'success': False,
+                    'error': 'Uso: python transcribe.py --stream <ruta_audio|-> [modelo] [idioma]'})
+        sys.exit(1)
+    audio_path = argv[0]
+    model_name = argv[1] if len(argv) > 1 else 'base'
+    language = argv[2] if len(argv) > 2 else 'es'
+
+    try:
+        started = time.time()
+        whisper = import_whisper()
+        if audio_path == '-':
+            audio = decode_audio_bytes(read_stdin_audio())
+        else:
+            if not os.path.exists(audio_path):
+                raise FileNotFoundError(f'Archivo no encontrado: {audio_path}')
+            audio = whisper.load_audio(audio_path)
+        decode_time = time.time() - started
+        load_model(model_name, profile)
+
+        chunks = split_on_silence(audio, SAMPLE_RATE)
+        emit_event({
+            'event': 'start',
+            'model': model_name,
+            'profile': profile,
+            'language': language,
+            'audio_seconds': round(len(audio) / SAMPLE_RATE, 2),
+            'chunks': len(chunks),
+        })
+
+        texts = []
+        first_text_seconds = None
+        for chunk in iter_transcribe_chunks(audio, model_name, language, chunks=chunks, profile=profile):
+            if first_text_seconds is None:
+                first_text_seconds = round(time.time() - started, 3)
+            if chunk['text']:
+                texts.append(chunk['text'])
+            emit_event({'event': 'partial', **chunk, 'elapsed_seconds': round(time.time() - started, 3)})
+
+        emit_event({
+            'event': 'final',
+            'success': True,
+            'text': ' '.join(texts),
+            'audio_seconds': round(len(audio) / SAMPLE_RATE, 2),
+            'timings': {
+                'decode_seconds': round(decode_time, 3),
+                'first_text_seconds': first_text_seconds,
+                'total_seconds': round(time.time() - started, 3),
+            },
+        })
+        log_progress("Proceso completado exitosamente")
+    except Exception as e:
+        log_progress(f"Error fatal: {type(e).__name__}: {str(e)}")
+        emit_event({'event': 'error', 'success': False, 'error': f'{type(e).__name__}: {str(e)}', 'type': type(e).__name__})
+        sys.exit(1)
+
+def main_single(argv, parallel=None, profile=DEFAULT_PROFILE):
+    """
+    Modo original: un archivo por proceso, resultado JSON en stdout.
+    Con `parallel` (número de procesos, 0 = núcleos) usa transcribe_parallel.
+    """
+    # Registrar manejadores de señales
+    signal.signal(signal.SIGTERM, signal_handler)
+    signal.signal(signal.SIGINT, signal_handler)
+
+    try:
+        import_whisper()
+    except ImportError as e:
+        error = {'error': str(e), 'success': False}
+        print(json.dumps(error), file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        if len(argv) < 1:
             error = {'error': 'Uso: python transcribe.py <ruta_audio> [modelo] [idioma]', 'success': False}
             print(json.dumps(error))
             sys.exit(1)
-        
-        audio_path = sys.argv[1]
-        model_name = sys.argv[2] if len(sys.argv) > 2 else 'base'
-        language = sys.argv[3] if len(sys.argv) > 3 else 'es'
-        
-        log_progress(f"Parámetros: audio={audio_path}, modelo={model_name}, idioma={language}")
-        
-        # Verificar que el archivo existe
-        if not os.path.exists(audio_path):
-            error = {'error': f'Archivo no encontrado: {audio_path}', 'success': False}
-            print(json.dumps(error))
-            sys.exit(1)
-        
-        # Verificar tamaño del archivo
-        file_size = os.path.getsize(audio_path)
-        log_progress(f"Tamaño del archivo: {file_size} bytes")
-        
+
+        audio_path = argv[0]
+        model_name = argv[1] if len(argv) > 1 else 'base'
+        language = argv[2] if len(argv) > 2 else 'es'
+
+        log_progress(f"Parámetros: audio={audio_path}, modelo={model_name}, idioma={language}, perfil={profile}")
+
+        if audio_path == '-':
+            # Audio por stdin: se decodifica en memoria, sin archivo temporal
+            try:
+                data = read_stdin_audio()
+            except ValueError as e:
+                print(json.dumps({'error': str(e), 'success': False}))
+                sys.exit(1)
+            audio = decode_audio_bytes(data)
+        else:
+            # Verificar que el archivo existe
+            if not os.path.exists(audio_path):
+                error = {'error': f'Archivo no encontrado: {audio_path}', 'success': False}
+                print(json.dumps(error))
+                sys.exit(1)
+
+            # Verificar tamaño del archivo
+            file_size = os.path.getsize(audio_path)
+            log_progress(f"Tamaño del archivo: {file_size} bytes")
+            audio = import_whisper().load_audio(audio_path)
+
+        # Un audio ya transcrito (reintento, nota reabierta) no vuelve a pasar por el modelo
+        audio_seconds = round(len(audio) / SAMPLE_RATE, 2)
+        cached, cache_reference = cache_lookup(audio, model_name, language, profile,
+                                               mode='parallel' if parallel is not None else 'sequential')
+
         # Transcribir y mostrar resultado
-        text = transcribe_audio(audio_path, model_name, language)
-        result = {'text': text, 'success': True}
+        if cached is not None:
+            log_progress(f"Transcripción encontrada en caché (usada {cached['hits']} veces)")
+            result = {'text': cached['text'], 'success': True, 'cached': True}
+        elif parallel is not None:
+            started = time.time()
+            result = transcribe_parallel(audio, model_name, language, workers=parallel, profile=profile)
+            result.update(success=True, elapsed_seconds=round(time.time() - started, 3),
+                          audio_seconds=audio_seconds)
+            cache_store(cache_reference, result['text'], audio_seconds)
+        else:
+            text = transcribe_audio(audio, model_name, language, profile=profile)
+            result = {'text': text, 'success': True}
+            cache_store(cache_reference, text, audio_seconds)
         print(json.dumps(result))
         log_progress("Proceso completado exitosamente")
-        
+
     except KeyboardInterrupt:
         error = {'error': 'Proceso interrumpido por el usuario', 'success': False}
         print(json.dumps(error))
@@ -139,3 +574,36 @@ if __name__ == '__main__':
         print(json.dumps(error))
         sys.exit(1)
 
+def _pop_option(args, name):
+    """Quita `name VALOR` de la lista de argumentos y retorna (VALOR o None, resto)."""
+    if name not in args:
+        return None, args
+    position = args.index(name)
+    if position + 1 >= len(args):
+        raise ValueError(f'Falta el valor de {name}')
+    return args[position + 1], args[:position] + args[position + 2:]
+
+if __name__ == '__main__':
+    if '--daemon' in sys.argv[1:]:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import whisper_daemon
+        sys.exit(whisper_daemon.main([arg for arg in sys.argv[1:] if arg != '--daemon']))
+    if '--batch' in sys.argv[1:]:
+        import whisper_batch
+        sys.exit(whisper_batch.main([arg for arg in sys.argv[1:] if arg != '--batch']))
+    if '--compare' in sys.argv[1:]:
+        import whisper_profiles
+        sys.exit(whisper_profiles.main([arg for arg in sys.argv[1:] if arg != '--compare']))
+    try:
+        profile, args = _pop_option(sys.argv[1:], '--profile')
+        profile = profile or DEFAULT_PROFILE
+        get_profile(profile)
+        workers, args = _pop_option(args, '--parallel')
+        workers = int(workers) if workers is not None else None
+    except ValueError as e:
+        print(json.dumps({'error': f'Argumentos inválidos: {e}', 'success': False}))
+        sys.exit(1)
+    if '--stream' in args:
+        main_stream([arg for arg in args if arg != '--stream'], profile=profile)
+    else:
+        main_single(args, parallel=workers, profile=profile)
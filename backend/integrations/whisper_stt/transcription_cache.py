@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Caché persistente de transcripciones direccionado por contenido.
+
+La clave es el SHA-256 del audio ya decodificado (float32 a 16 kHz) junto con
+el modelo, el idioma, el perfil de inferencia y el modo (secuencial o
+--parallel, que une segmentos y puede dar otro texto). Acierta cuando el audio
+decodificado es idéntico: el mismo dictado reenviado por un reintento del
+frontend o al reabrir una nota. Volver a codificar con un códec con pérdida
+(por ejemplo webm a ogg) cambia las muestras y por lo tanto el hash.
+
+Las transcripciones vacías (silencio o una decodificación fallida) no se
+guardan, para no servirlas durante horas.
+
+Los resultados se guardan en SQLite (sobreviven a reinicios y se comparten
+entre los workers del daemon). El tamaño está acotado: al superar
+`max_entries` se eliminan las entradas usadas hace más tiempo (LRU). Los
+contadores de aciertos del proceso se consultan con stats(); cada entrada
+guarda además cuántas veces se reutilizó.
+
+Uso:
+  python transcription_cache.py stats [--db RUTA]
+  python transcription_cache.py clear [--db RUTA]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+# Ruta y tamaño del caché (WHISPER_CACHE_SIZE=0 lo desactiva)
+CACHE_DB_PATH = Path(os.environ.get('WHISPER_CACHE_DB') or SCRIPT_DIR / 'transcription_cache.db')
+CACHE_SIZE = int(os.environ.get('WHISPER_CACHE_SIZE', '2000'))
+
+class TranscriptionCache:
+    """
+    Caché LRU de transcripciones en SQLite.
+
+    Args:
+        db_path: ruta de la base SQLite
+        max_entries: número máximo de transcripciones guardadas
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, max_entries=CACHE_SIZE):
+        self.db_path = str(db_path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Varios workers del daemon comparten la base: WAL y espera ante bloqueos
+        self._db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS Cache_Transcripcion (
+                    clave TEXT PRIMARY KEY,
+                    audio_sha256 TEXT NOT NULL,
+                    modelo TEXT NOT NULL,
+                    idioma TEXT NOT NULL,
+                    perfil TEXT NOT NULL,
+                    texto TEXT NOT NULL,
+                    duracion_audio REAL,
+                    aciertos INTEGER NOT NULL DEFAULT 0,
+                    ultimo_uso REAL NOT NULL,
+                    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_transcripcion_uso ON Cache_Transcripcion (ultimo_uso)"
+            )
+
+    @staticmethod
+    def audio_sha256(audio):
+        """SHA-256 del audio decodificado (array float32)."""
+        return hashlib.sha256(audio.tobytes()).hexdigest()
+
+    @staticmethod
+    def key_for(audio_sha256, model_name, language, profile, mode='sequential'):
+        """Clave de una transcripción (mode: 'sequential' o 'parallel')."""
+        return hashlib.sha256(
+            f'{audio_sha256}|{model_name}|{language}|{profile}|{mode}'.encode('utf-8')
+        ).hexdigest()
+
+    def get(self, key):
+        """
+        Busca una transcripción y la marca como usada.
+
+        Returns:
+            dict con 'text', 'audio_seconds' y 'hits', o None
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT texto, duracion_audio, aciertos FROM Cache_Transcripcion WHERE clave = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._db:
+                self._db.execute(
+                    "UPDATE Cache_Transcripcion SET aciertos = aciertos + 1, ultimo_uso = ? WHERE clave = ?",
+                    (time.time(), key)
+                )
+            return {'text': row[0], 'audio_seconds': row[1], 'hits': row[2] + 1}
+
+    def put(self, key, audio_sha256, model_name, language, profile, text, audio_seconds=None):
+        """Guarda una transcripción y elimina las menos usadas si se supera el tamaño."""
+        with self._lock, self._db:
+            self._db.execute(
+                """INSERT OR REPLACE INTO Cache_Transcripcion
+                   (clave, audio_sha256, modelo, idioma, perfil, texto, duracion_audio, ultimo_uso)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, audio_sha256, model_name, language, profile, text, audio_seconds, time.time())
+            )
+            cursor = self._db.execute(
+                """DELETE FROM Cache_Transcripcion WHERE clave IN (
+                       SELECT clave FROM Cache_Transcripcion ORDER BY ultimo_uso DESC LIMIT -1 OFFSET ?
+                   )""",
+                (self.max_entries,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+    def stats(self):
+        """Contadores de uso del caché (del proceso) y contenido de la base."""
+        with self._lock:
+            entries, total_hits = self._db.execute(
+                "SELECT COUNT(*), TOTAL(aciertos) FROM Cache_Transcripcion"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'stored_hits': int(total_hits),
+                'db_path': self.db_path,
+            }
+
+    def clear(self):
+        """Elimina todas las transcripciones guardadas."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM Cache_Transcripcion")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Caché de transcripciones Whisper")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--db", default=str(CACHE_DB_PATH), help="Ruta de la base SQLite del caché")
+    args = parser.parse_args(argv)
+    try:
+        cache = TranscriptionCache(args.db)
+        if args.command == "clear":
+            cache.clear()
+        result = dict(cache.stats(), success=True)
+        cache.close()
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result['success'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
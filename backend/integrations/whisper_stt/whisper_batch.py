@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Transcripción por lotes de grabaciones (carpeta o manifiesto).
+
+Pensado para los audios que se recogen sin conexión en los territorios y se
+suben en bloque: en lugar de un proceso (y una carga del modelo) por archivo,
+una sola ejecución carga el modelo una vez por worker y procesa todos los
+archivos con la concurrencia indicada.
+
+Cada resultado se agrega como una línea NDJSON al archivo de salida apenas
+termina, con sus tiempos (hash, decodificación, inferencia). Cada archivo
+recibe su línea: un audio con el mismo SHA-256 e idioma que otro del lote (o
+que un resultado exitoso de la salida, mismo modelo y perfil) no se vuelve a
+transcribir, y su línea lleva el texto del original con "duplicate_of" y
+"skipped": true. Los archivos que ya tienen su propia línea exitosa se omiten,
+así que una ejecución interrumpida se retoma donde quedó.
+
+Manifiesto: un archivo de texto con una ruta por línea (relativa al manifiesto)
+o líneas JSON con "path" y opcionalmente "id" y "language".
+
+Uso:
+  python transcribe.py --batch <carpeta|manifiesto> --output resultados.ndjson
+                       [--model base] [--language es] [--concurrency 2] [--profile cpu-int8]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import transcribe
+from whisper_profiles import PROFILES
+
+AUDIO_EXTENSIONS = {'.webm', '.wav', '.mp3', '.m4a', '.ogg', '.oga', '.opus', '.flac', '.aac', '.mp4'}
+
+def file_sha256(path):
+    """Calcula el SHA-256 del contenido de un archivo."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def list_inputs(source):
+    """
+    Archivos a transcribir.
+
+    Args:
+        source: carpeta (se recorre con subcarpetas) o manifiesto
+
+    Returns:
+        lista de dicts con 'path' y los campos extra del manifiesto
+    """
+    source = Path(source)
+    if source.is_dir():
+        return [
+            {'path': str(path)} for path in sorted(source.rglob('*'))
+            if path.is_file() and path.suffix.lower() in AUDIO_EXTENSIONS
+        ]
+
+    items = []
+    with open(source, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Línea {line_number} del manifiesto: JSON inválido ({e})")
+                if not item.get('path'):
+                    raise ValueError(f"Línea {line_number} del manifiesto: falta 'path'")
+            else:
+                item = {'path': line}
+            # Rutas relativas al manifiesto
+            item['path'] = str(source.parent / item['path']) if not os.path.isabs(item['path']) else item['path']
+            items.append(item)
+    return items
+
+def _entry_key(item):
+    """Identifica una entrada del lote (la misma ruta puede venir con otro id en el manifiesto)."""
+    return (item['path'], item.get('id'))
+
+def _original_name(record):
+    return record.get('duplicate_of') or record.get('id') or record['path']
+
+def load_completed(output_path, model_name, profile='default'):
+    """
+    Resultados exitosos (mismo modelo y perfil) en la salida.
+
+    Returns:
+        dict {(sha256, idioma): {'record': primer resultado, 'entries': {(path, id), ...}}}
+    """
+    completed = {}
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # Línea truncada por una interrupción: ese archivo se repite
+                continue
+            if (result.get('success') and result.get('sha256') and result.get('path')
+                    and result.get('model') == model_name and result.get('profile', 'default') == profile):
+                done = completed.setdefault((result['sha256'], result.get('language')),
+                                            {'record': result, 'entries': set()})
+                done['entries'].add(_entry_key(result))
+    return completed
+
+def _transcribe_item(item):
+    """Transcribe un archivo dentro de un worker (modelo ya cargado)."""
+    started = time.time()
+    result = transcribe.transcribe_request({
+        'audio_path': item['path'],
+        'model': transcribe._parallel_model_name,
+        'language': item['language'],
+        'profile': transcribe._parallel_profile,
+    })
+    result.setdefault('timings', {})['total_seconds'] = round(time.time() - started, 3)
+    return item, result
+
+def run_batch(source, output_path, model_name='base', language='es', concurrency=1, profile='default'):
+    """
+    Transcribe todos los archivos de `source` y agrega los resultados a `output_path`.
+
+    Returns:
+        dict con el resumen de la ejecución
+    """
+    started = time.time()
+    items = list_inputs(source)
+    completed = load_completed(output_path, model_name, profile)
+
+    pending = []
+    skipped = 0
+    # Duplicados de un resultado anterior de la salida: (entrada, resultado original)
+    earlier_duplicates = []
+    # Duplicados de un archivo de este lote: se escriben cuando el original termina
+    batch_duplicates = {}
+    originals = set()
+    for item in items:
+        hash_started = time.time()
+        try:
+            item['sha256'] = file_sha256(item['path'])
+        except OSError as e:
+            pending.append(dict(item, error=f'No se pudo leer el archivo: {e}'))
+            continue
+        item['hash_seconds'] = round(time.time() - hash_started, 3)
+        item.setdefault('language', language)
+        key = (item['sha256'], item['language'])
+        done = completed.get(key)
+        if done is not None and _entry_key(item) in done['entries']:
+            skipped += 1
+        elif done is not None:
+            earlier_duplicates.append((item, done['record']))
+        elif key in originals:
+            batch_duplicates.setdefault(key, []).append(item)
+        else:
+            originals.add(key)
+            pending.append(item)
+
+    duplicates = len(earlier_duplicates) + sum(len(group) for group in batch_duplicates.values())
+    transcribe.log_progress(
+        f"Lote: {len(items)} archivos, {skipped} ya transcritos, {duplicates} duplicados, "
+        f"{len(pending)} pendientes"
+    )
+
+    summary = {'files': len(items), 'skipped': skipped, 'duplicates': duplicates,
+               'transcribed': 0, 'failed': 0, 'audio_seconds': 0.0}
+
+    def write_record(out, item, result, timings):
+        record = {key: value for key, value in item.items() if key not in ('hash_seconds', 'error')}
+        record.update(result, model=model_name, profile=profile, timings=timings)
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        out.flush()
+        return record
+
+    def write_duplicate(out, item, original):
+        """Línea de un audio repetido con el texto (o el error) de su original."""
+        if original.get('success'):
+            result = {'success': True, 'text': original.get('text', ''),
+                      'audio_seconds': original.get('audio_seconds')}
+        else:
+            result = {'success': False, 'error': f"Falló el original: {original.get('error')}"}
+        result.update(duplicate_of=_original_name(original), skipped=True)
+        write_record(out, item, result, {'hash_seconds': item.get('hash_seconds')})
+
+    def write_result(out, item, result):
+        timings = dict(result.pop('timings', {}), hash_seconds=item.get('hash_seconds'))
+        record = write_record(out, item, result, timings)
+        if result.get('success'):
+            summary['transcribed'] += 1
+            summary['audio_seconds'] += result.get('audio_seconds', 0.0)
+        else:
+            summary['failed'] += 1
+        done = summary['transcribed'] + summary['failed']
+        transcribe.log_progress(f"[{done}/{len(pending)}] {item['path']}: "
+                                f"{'ok' if result.get('success') else result.get('error')}")
+        for duplicate in batch_duplicates.pop((item.get('sha256'), item.get('language')), []):
+            write_duplicate(out, duplicate, record)
+
+    unreadable = [item for item in pending if 'error' in item]
+    pending = [item for item in pending if 'error' not in item]
+
+    with open(output_path, 'a', encoding='utf-8') as out:
+        for item in unreadable:
+            write_result(out, item, {'success': False, 'error': item['error']})
+        for item, original in earlier_duplicates:
+            write_duplicate(out, item, original)
+
+        if pending:
+            cores = os.cpu_count() or 1
+            workers = max(1, min(concurrency or cores, len(pending)))
+            threads = max(1, cores // workers)
+            # Cada worker carga el modelo una vez (mismo inicializador que --parallel)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=transcribe._init_parallel_worker,
+                                     initargs=(model_name, threads, profile)) as pool:
+                futures = [pool.submit(_transcribe_item, item) for item in pending]
+                for future in as_completed(futures):
+                    item, result = future.result()
+                    write_result(out, item, result)
+
+    elapsed = time.time() - started
+    summary['audio_seconds'] = round(summary['audio_seconds'], 2)
+    return dict(
+        summary,
+        success=True,
+        output=str(output_path),
+        model=model_name,
+        profile=profile,
+        concurrency=concurrency,
+        elapsed_seconds=round(elapsed, 3),
+        # Segundos de audio por segundo de ejecución
+        speed=round(summary['audio_seconds'] / elapsed, 2) if elapsed > 0 else None,
+    )
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Transcripción Whisper por lotes")
+    parser.add_argument("source", help="Carpeta con audios o manifiesto (rutas o líneas JSON)")
+    parser.add_argument("--output", required=True, help="Archivo NDJSON de resultados (se agregan líneas)")
+    parser.add_argument("--model", default=os.environ.get('WHISPER_MODEL', 'base'), help="Modelo de Whisper")
+    parser.add_argument("--language", default='es', help="Idioma por defecto")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Procesos de transcripción (0 = todos los núcleos)")
+    parser.add_argument("--profile", default='default', choices=sorted(PROFILES), help="Perfil de inferencia")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        transcribe.import_whisper()
+        result = run_batch(args.source, args.output, args.model, args.language, args.concurrency, args.profile)
+    except Exception as e:
+        transcribe.log_progress(f"Error fatal: {type(e).__name__}: {str(e)}")
+        result = {'success': False, 'error': f'{type(e).__name__}: {str(e)}'}
+    print(json.dumps(result, ensure_ascii=False))
+    return 0 if result['success'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
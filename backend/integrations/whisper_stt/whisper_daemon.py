@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+Daemon de transcripción con Whisper y modelos residentes en memoria.
+
+Los modelos se cargan una sola vez en procesos de inferencia hijos; cada
+petición solo paga decodificación + inferencia. El proceso principal no
+importa torch: atiende el socket, admite trabajos en una cola acotada y los
+reparte entre los workers.
+
+- Control de admisión: con la cola llena (--max-queue) la petición se
+  rechaza de inmediato con {"busy": true} en lugar de acumular espera.
+- Timeout por trabajo (--job-timeout, o "timeout" en la petición si es menor):
+  si la inferencia no termina a tiempo el worker se mata y se vuelve a crear,
+  así un audio largo no deja colgado el servicio.
+- Un trabajo que espera en cola más de --max-queue-wait se descarta.
+- Si un worker no vuelve a cargar sus modelos tras varios intentos (con espera
+  creciente) queda fuera de servicio; sin workers vivos las peticiones se
+  rechazan con {"unavailable": true} y los trabajos en cola terminan con error.
+  Ningún trabajo queda sin respuesta: la espera de cada uno está acotada.
+
+Protocolo: una petición JSON por línea y una respuesta por línea.
+  {"id": 1, "audio_path": "/ruta/audio.webm", "model": "base", "language": "es", "timeout": 60}
+  {"id": 2, "audio_bytes": 48213, "model": "base"}\n<48213 bytes del audio>
+  {"cmd": "ping"} | {"cmd": "stats"}
+
+Con "audio_bytes" la línea JSON va seguida de exactamente esa cantidad de
+bytes crudos del archivo de audio; se decodifican en memoria con ffmpeg, sin
+escribir archivos temporales.
+
+Uso:
+  python transcribe.py --daemon [--socket RUTA | --port PUERTO] [--models base,small]
+                       [--workers 1] [--max-queue 8] [--job-timeout 120]
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import tempfile
+import threading
+import socketserver
+import multiprocessing
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from transcribe import MAX_AUDIO_BYTES
+from whisper_profiles import PROFILES
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'whisper_stt.sock')
+
+# Tiempo máximo para que un worker cargue sus modelos (incluye la descarga inicial)
+WORKER_STARTUP_TIMEOUT = 600
+
+# Intentos de reinicio de un worker y espera inicial entre ellos (se duplica)
+RESTART_ATTEMPTS = 3
+RESTART_BACKOFF_SECONDS = 2.0
+
+def log(message):
+    print(f"[Whisper-Daemon] {message}", file=sys.stderr, flush=True)
+
+class DaemonBusy(Exception):
+    """La cola de trabajos está llena."""
+
+class DaemonUnavailable(Exception):
+    """No queda ningún worker en servicio."""
+
+def _worker_main(conn, model_names, profile):
+    """
+    Proceso de inferencia: carga los modelos una vez y atiende trabajos
+    recibidos por el pipe hasta recibir None.
+    """
+    # La terminación la decide el proceso principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import transcribe
+    try:
+        for model_name in model_names:
+            transcribe.load_model(model_name, profile)
+    except Exception as e:
+        conn.send({'ready': False, 'error': f'{type(e).__name__}: {str(e)}'})
+        return
+    conn.send({'ready': True, 'pid': os.getpid()})
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        # null o vacío usa el modelo predeterminado
+        model_name = request.get('model') or model_names[0]
+        if model_name not in model_names:
+            response = {
+                'success': False,
+                'error': f"Modelo no cargado: {model_name}. Disponibles: {', '.join(model_names)}"
+            }
+        else:
+            # Todos los trabajos usan el perfil con el que se cargaron los modelos
+            response = transcribe.transcribe_request(dict(request, model=model_name, profile=profile))
+        conn.send(response)
+
+class InferenceWorker:
+    """Proceso hijo con los modelos cargados; se recrea si excede el timeout o muere."""
+
+    def __init__(self, index, model_names, profile):
+        self.index = index
+        self.model_names = model_names
+        self.profile = profile
+        # spawn: el hijo inicia limpio (fork con hilos de torch puede bloquearse)
+        self.context = multiprocessing.get_context('spawn')
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+        # Motivo por el que el worker quedó fuera de servicio (None mientras sirve)
+        self.failure = None
+
+    def start(self):
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_worker_main, args=(child_conn, self.model_names, self.profile),
+            name=f'whisper-worker-{self.index}', daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        if not self.conn.poll(WORKER_STARTUP_TIMEOUT):
+            self.stop()
+            raise RuntimeError(f"El worker {self.index} no cargó los modelos en {WORKER_STARTUP_TIMEOUT} s")
+        ready = self.conn.recv()
+        if not ready.get('ready'):
+            self.stop()
+            raise RuntimeError(f"El worker {self.index} no pudo cargar los modelos: {ready.get('error')}")
+        log(f"Worker {self.index} listo (pid {ready['pid']}, modelos: {', '.join(self.model_names)})")
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        self.process = None
+
+    def restart(self, reason):
+        """
+        Mata el proceso y crea otro; reintenta con espera creciente si la
+        carga de modelos falla.
+
+        Returns:
+            True si el worker quedó listo; si no, queda fuera de servicio (failure)
+        """
+        log(f"Reiniciando worker {self.index}: {reason}")
+        self.restarts += 1
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+            self.process = None
+        delay = RESTART_BACKOFF_SECONDS
+        for attempt in range(1, RESTART_ATTEMPTS + 1):
+            try:
+                self.start()
+                return True
+            except Exception as e:
+                log(f"Intento {attempt}/{RESTART_ATTEMPTS} de reiniciar el worker {self.index} falló: {e}")
+                error = str(e)
+            if attempt < RESTART_ATTEMPTS:
+                time.sleep(delay)
+                delay *= 2
+        self.failure = error
+        return False
+
+    def run(self, request, timeout):
+        """Envía un trabajo y espera su resultado como máximo `timeout` segundos."""
+        try:
+            self.conn.send(request)
+            if self.conn.poll(timeout):
+                return self.conn.recv()
+        except (EOFError, OSError, ValueError) as e:
+            self.restart(f'proceso terminado inesperadamente ({e})')
+            return {'success': False, 'error': 'El worker de Whisper terminó inesperadamente'}
+        self.restart(f'timeout de {timeout} s')
+        return {
+            'success': False,
+            'timeout': True,
+            'error': f'Timeout: la transcripción superó {timeout} segundos y fue cancelada'
+        }
+
+class Job:
+    def __init__(self, request, timeout):
+        self.request = request
+        self.timeout = timeout
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.done = threading.Event()
+        self.result = None
+        # El cliente dejó de esperar: si sigue en cola no se ejecuta
+        self.abandoned = False
+
+    def finish(self, result):
+        self.result = result
+        self.done.set()
+
+class TranscriptionDaemon:
+    """
+    Cola acotada de trabajos atendida por uno o más workers de inferencia.
+
+    Args:
+        model_names: modelos residentes en cada worker (el primero es el predeterminado)
+        workers: procesos de inferencia
+        max_queue: trabajos en espera antes de rechazar
+        job_timeout: segundos máximos de inferencia por trabajo
+        max_queue_wait: segundos máximos de espera en cola
+        profile: perfil de inferencia de los modelos (ver whisper_profiles.py)
+    """
+
+    def __init__(self, model_names, workers=1, max_queue=8, job_timeout=120.0, max_queue_wait=300.0,
+                 profile='default'):
+        self.model_names = model_names
+        self.profile = profile
+        self.job_timeout = job_timeout
+        self.max_queue_wait = max_queue_wait
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.workers = [InferenceWorker(i, model_names, profile) for i in range(workers)]
+        self.lock = threading.Lock()
+        # Serializa la admisión con la baja del último worker (nadie queda en cola sin dispatcher)
+        self.admission_lock = threading.Lock()
+        self.started_at = time.time()
+        self.counters = {
+            'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0,
+            'timeouts': 0, 'expired': 0, 'cache_hits': 0, 'unavailable': 0, 'abandoned': 0,
+        }
+        self.totals = {'queue_wait_seconds': 0.0, 'decode_seconds': 0.0, 'inference_seconds': 0.0}
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+            threading.Thread(target=self._dispatch, args=(worker,), daemon=True,
+                             name=f'whisper-dispatch-{worker.index}').start()
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def _dispatch(self, worker):
+        while True:
+            job = self.queue.get()
+            if job.abandoned:
+                continue
+            try:
+                self._run_job(worker, job)
+            except Exception as e:
+                log(f"Error inesperado en el dispatcher {worker.index}: {type(e).__name__}: {e}")
+                self._count('failed')
+                job.finish({'success': False, 'error': f'Error interno del daemon: {type(e).__name__}: {e}'})
+            if worker.failure is not None:
+                self._retire(worker)
+                return
+
+    def _run_job(self, worker, job):
+        job.started_at = time.monotonic()
+        waited = job.started_at - job.enqueued_at
+        if waited > self.max_queue_wait:
+            self._count('expired')
+            job.finish({'success': False, 'error': f'El trabajo esperó {waited:.0f} s en cola y fue descartado'})
+            return
+        result = worker.run(job.request, job.timeout)
+        with self.lock:
+            if result.get('success'):
+                self.counters['completed'] += 1
+                if result.get('cached'):
+                    self.counters['cache_hits'] += 1
+                self.totals['queue_wait_seconds'] += waited
+                for name in ('decode_seconds', 'inference_seconds'):
+                    self.totals[name] += result.get('timings', {}).get(name, 0.0)
+            else:
+                self.counters['failed'] += 1
+                if result.get('timeout'):
+                    self.counters['timeouts'] += 1
+        result.setdefault('timings', {})['queue_wait_seconds'] = round(waited, 3)
+        job.finish(result)
+
+    def _alive_workers(self):
+        return [worker for worker in self.workers if worker.failure is None]
+
+    def _retire(self, worker):
+        """
+        Saca de servicio un worker que no se pudo reiniciar. Si era el último,
+        los trabajos en cola terminan con error en lugar de esperar para siempre.
+        """
+        log(f"Worker {worker.index} fuera de servicio: {worker.failure}")
+        with self.admission_lock:
+            if self._alive_workers():
+                return
+            while True:
+                try:
+                    job = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._count('unavailable')
+                job.finish(self._unavailable_response())
+
+    def _unavailable_response(self):
+        reasons = '; '.join(sorted({worker.failure for worker in self.workers if worker.failure}))
+        return {'success': False, 'unavailable': True,
+                'error': f'No hay workers de Whisper disponibles: {reasons}'}
+
+    def submit(self, request):
+        """
+        Encola un trabajo.
+
+        Raises:
+            DaemonBusy: si la cola está llena
+            DaemonUnavailable: si ningún worker está en servicio
+        """
+        try:
+            timeout = float(request.get('timeout') or self.job_timeout)
+        except (TypeError, ValueError):
+            timeout = self.job_timeout
+        job = Job(request, min(timeout, self.job_timeout))
+        with self.admission_lock:
+            if not self._alive_workers():
+                self._count('unavailable')
+                raise DaemonUnavailable()
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                self._count('rejected')
+                raise DaemonBusy()
+        self._count('submitted')
+        return job
+
+    def transcribe(self, request):
+        """Encola y espera el resultado (respuesta lista para serializar)."""
+        try:
+            job = self.submit(request)
+        except DaemonBusy:
+            return {'success': False, 'busy': True, 'error': 'Cola de transcripción llena, intente de nuevo'}
+        except DaemonUnavailable:
+            return self._unavailable_response()
+        # Cota: espera máxima en cola + inferencia (+ margen para reiniciar un worker)
+        if not job.done.wait(job.timeout + self.max_queue_wait + 5):
+            job.abandoned = True
+            self._count('abandoned')
+            return {
+                'success': False,
+                'timeout': True,
+                'error': f'Timeout: el trabajo no terminó en {job.timeout + self.max_queue_wait:.0f} segundos'
+            }
+        return job.result
+
+    def stats(self):
+        with self.lock:
+            completed = self.counters['completed']
+            averages = {
+                f'avg_{name}': round(total / completed, 3) if completed else 0.0
+                for name, total in self.totals.items()
+            }
+            return dict(
+                self.counters,
+                queue_depth=self.queue.qsize(),
+                max_queue=self.queue.maxsize,
+                workers=len(self.workers),
+                workers_alive=len(self._alive_workers()),
+                worker_restarts=sum(worker.restarts for worker in self.workers),
+                models=self.model_names,
+                profile=self.profile,
+                uptime_seconds=round(time.time() - self.started_at, 1),
+                cache_hit_rate=round(self.counters['cache_hits'] / completed, 4) if completed else 0.0,
+                **averages
+            )
+
+    def handle(self, request):
+        """Procesa una petición ya decodificada y retorna la respuesta."""
+        if request.get('cmd') == 'ping':
+            response = {'success': True, 'pong': True}
+        elif request.get('cmd') == 'stats':
+            response = {'success': True, 'stats': self.stats()}
+        else:
+            response = self.transcribe(request)
+        response = dict(response)
+        if request.get('id') is not None:
+            response['id'] = request['id']
+        return response
+
+def parse_request(line):
+    """
+    Decodifica una línea del protocolo.
+
+    Returns:
+        tuple (request, error): error es la respuesta a enviar si la línea no es válida
+    """
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as e:
+        return None, {'success': False, 'error': f'Error parseando JSON: {str(e)}'}
+    if not isinstance(request, dict):
+        return None, {'success': False, 'error': 'Se esperaba un objeto JSON'}
+    return request, None
+
+def make_server(daemon, socket_path=None, port=None):
+    """Servidor con un hilo por conexión; cada conexión puede enviar varias peticiones."""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def respond(self, response):
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+        def handle(self):
+            for raw_line in self.rfile:
+                line = raw_line.decode('utf-8').strip()
+                if not line:
+                    continue
+                request, error = parse_request(line)
+                if error:
+                    self.respond(error)
+                    continue
+                if 'audio_bytes' in request:
+                    size = request.pop('audio_bytes')
+                    if not isinstance(size, int) or not 0 < size <= MAX_AUDIO_BYTES:
+                        # Sin un tamaño válido no se puede saber dónde termina el audio
+                        self.respond({'success': False, 'error': f"'audio_bytes' debe estar entre 1 y {MAX_AUDIO_BYTES}"})
+                        return
+                    request['audio'] = self.rfile.read(size)
+                    if len(request['audio']) != size:
+                        self.respond({'success': False, 'error': 'Conexión cerrada antes de recibir todo el audio'})
+                        return
+                self.respond(daemon.handle(request))
+
+    if port is not None:
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', port), Handler)
+    else:
+        # Eliminar un socket huérfano de una ejecución anterior
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    return server
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Daemon de transcripción Whisper")
+    parser.add_argument("--socket", default=None, help=f"Socket Unix (por defecto {DEFAULT_SOCKET})")
+    parser.add_argument("--port", type=int, default=None, help="Escuchar en 127.0.0.1:PUERTO en lugar de un socket Unix")
+    parser.add_argument("--models", default=os.environ.get('WHISPER_MODEL', 'base'),
+                        help="Modelos residentes separados por coma (el primero es el predeterminado)")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos de inferencia")
+    parser.add_argument("--profile", default=os.environ.get('WHISPER_PROFILE', 'default'),
+                        choices=sorted(PROFILES), help="Perfil de inferencia")
+    parser.add_argument("--max-queue", type=int, default=8, help="Trabajos en espera antes de rechazar")
+    parser.add_argument("--job-timeout", type=float, default=120.0, help="Segundos máximos por trabajo")
+    parser.add_argument("--max-queue-wait", type=float, default=300.0, help="Segundos máximos de espera en cola")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    model_names = [name.strip() for name in args.models.split(',') if name.strip()]
+    daemon = TranscriptionDaemon(
+        model_names, workers=max(1, args.workers), max_queue=max(1, args.max_queue),
+        job_timeout=args.job_timeout, max_queue_wait=args.max_queue_wait, profile=args.profile
+    )
+    try:
+        daemon.start()
+        socket_path = None if args.port is not None else (args.socket or DEFAULT_SOCKET)
+        server = make_server(daemon, socket_path=socket_path, port=args.port)
+    except Exception as e:
+        daemon.stop()
+        print(json.dumps({'success': False, 'ready': False, 'error': str(e)}, ensure_ascii=False), flush=True)
+        return 1
+
+    # SIGTERM detiene el servidor de forma ordenada (serve_forever corre en este hilo)
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+
+    ready = {
+        'success': True,
+        'ready': True,
+        'socket': socket_path,
+        'port': args.port,
+        'models': model_names,
+        'profile': args.profile,
+        'workers': len(daemon.workers),
+        'max_queue': args.max_queue,
+        'job_timeout': args.job_timeout,
+    }
+    print(json.dumps(ready, ensure_ascii=False), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Perfiles de inferencia de Whisper para CPU y comparación entre perfiles.
+
+Perfiles:
+  default     fp32 y la decodificación predeterminada de Whisper (con
+              reintentos a temperaturas mayores si la salida no es confiable)
+  cpu-greedy  fp32 con decodificación voraz: un solo haz, temperatura 0 y sin
+              reintentos
+  cpu-int8    cpu-greedy + cuantización dinámica int8 de las capas lineales
+              (torch.quantization.quantize_dynamic) y hilos de torch fijos
+              (WHISPER_THREADS o todos los núcleos)
+
+La comparación transcribe el mismo audio con cada perfil y reporta el factor de
+tiempo real (RTF = segundos de inferencia / segundos de audio) y las
+diferencias palabra a palabra contra el perfil de referencia (fp32), para
+elegir el perfil de cada despliegue.
+
+Uso:
+  python transcribe.py --compare audio.webm [--model base] [--language es]
+                       [--profiles default,cpu-greedy,cpu-int8]
+"""
+
+import os
+import sys
+import json
+import time
+import difflib
+
+PROFILES = {
+    'default': {'quantize': False, 'greedy': False, 'pin_threads': False},
+    'cpu-greedy': {'quantize': False, 'greedy': True, 'pin_threads': True},
+    'cpu-int8': {'quantize': True, 'greedy': True, 'pin_threads': True},
+}
+DEFAULT_PROFILE = 'default'
+
+def get_profile(name):
+    """Configuración de un perfil, con un error claro si no existe."""
+    if name not in PROFILES:
+        raise ValueError(f"Perfil desconocido: {name}. Disponibles: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+def default_threads():
+    """Hilos de torch para los perfiles de CPU (WHISPER_THREADS o todos los núcleos)."""
+    try:
+        return max(1, int(os.environ.get('WHISPER_THREADS') or os.cpu_count() or 1))
+    except ValueError:
+        return os.cpu_count() or 1
+
+def quantize_linear_int8(model):
+    """
+    Cuantización dinámica int8 de las capas lineales (pesos int8, activaciones
+    cuantizadas al vuelo). Reduce ~4x la memoria de esas capas y acelera la
+    inferencia en CPU.
+
+    Whisper usa su propia subclase de nn.Linear (solo convierte el dtype de los
+    pesos al de la entrada); quantize_dynamic solo reconoce nn.Linear exacto,
+    así que esas capas se tratan como nn.Linear antes de cuantizar. En fp32 el
+    resultado es el mismo.
+    """
+    import torch
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def prepare_model(model, profile_name):
+    """Aplica al modelo recién cargado las transformaciones del perfil."""
+    if get_profile(profile_name)['quantize']:
+        model = quantize_linear_int8(model)
+    return model
+
+def decode_options(profile_name):
+    """Opciones extra para model.transcribe según el perfil."""
+    if not get_profile(profile_name)['greedy']:
+        return {}
+    # beam_size/best_of None = decodificación voraz; temperatura fija sin reintentos
+    return {'beam_size': None, 'best_of': None, 'temperature': 0.0, 'fp16': False}
+
+def _normalize_words(text):
+    words = []
+    for word in text.lower().split():
+        word = ''.join(ch for ch in word if ch.isalnum())
+        if word:
+            words.append(word)
+    return words
+
+def word_diff(reference, hypothesis, max_changes=50):
+    """
+    Diferencias palabra a palabra (sin mayúsculas ni puntuación).
+
+    Returns:
+        dict con 'wer' (errores / palabras de referencia, con la alineación de
+        difflib), 'substitutions', 'deletions', 'insertions' y 'changes'
+    """
+    ref_words = _normalize_words(reference)
+    hyp_words = _normalize_words(hypothesis)
+    counts = {'substitutions': 0, 'deletions': 0, 'insertions': 0}
+    changes = []
+    matcher = difflib.SequenceMatcher(a=ref_words, b=hyp_words, autojunk=False)
+    for op, ref_start, ref_end, hyp_start, hyp_end in matcher.get_opcodes():
+        if op == 'equal':
+            continue
+        ref_len, hyp_len = ref_end - ref_start, hyp_end - hyp_start
+        common = min(ref_len, hyp_len)
+        counts['substitutions'] += common
+        counts['deletions'] += ref_len - common
+        counts['insertions'] += hyp_len - common
+        if len(changes) < max_changes:
+            changes.append({
+                'op': op,
+                'reference': ' '.join(ref_words[ref_start:ref_end]),
+                'hypothesis': ' '.join(hyp_words[hyp_start:hyp_end]),
+            })
+    errors = sum(counts.values())
+    return dict(
+        counts,
+        wer=round(errors / len(ref_words), 4) if ref_words else (0.0 if not hyp_words else 1.0),
+        reference_words=len(ref_words),
+        changes=changes,
+    )
+
+def compare_profiles(audio_path, model_name='base', language='es', profiles=None, reference=DEFAULT_PROFILE):
+    """
+    Transcribe el mismo audio con cada perfil y compara contra `reference`.
+
+    Returns:
+        dict con la duración del audio y un resultado por perfil
+    """
+    import transcribe
+
+    profiles = list(profiles or PROFILES)
+    if reference not in profiles:
+        profiles.insert(0, reference)
+    for name in profiles:
+        get_profile(name)
+
+    whisper = transcribe.import_whisper()
+    audio = whisper.load_audio(audio_path)
+    audio_seconds = len(audio) / transcribe.SAMPLE_RATE
+
+    results = []
+    for name in profiles:
+        started = time.time()
+        transcribe.load_model(model_name, name)
+        load_seconds = time.time() - started
+        started = time.time()
+        text = transcribe.transcribe_audio(audio, model_name, language, profile=name)
+        inference_seconds = time.time() - started
+        results.append({
+            'profile': name,
+            'load_seconds': round(load_seconds, 3),
+            'inference_seconds': round(inference_seconds, 3),
+            'rtf': round(inference_seconds / audio_seconds, 4) if audio_seconds else None,
+            'text': text,
+        })
+
+    reference_text = next(result['text'] for result in results if result['profile'] == reference)
+    reference_seconds = next(result['inference_seconds'] for result in results if result['profile'] == reference)
+    for result in results:
+        if result['profile'] != reference:
+            result['diff'] = word_diff(reference_text, result['text'])
+            result['speedup'] = round(reference_seconds / result['inference_seconds'], 2) if result['inference_seconds'] else None
+
+    return {
+        'success': True,
+        'audio': audio_path,
+        'audio_seconds': round(audio_seconds, 2),
+        'model': model_name,
+        'reference': reference,
+        'threads': default_threads(),
+        'results': results,
+    }
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Comparar perfiles de inferencia de Whisper")
+    parser.add_argument("audio", help="Archivo de audio")
+    parser.add_argument("--model", default=os.environ.get('WHISPER_MODEL', 'base'), help="Modelo de Whisper")
+    parser.add_argument("--language", default='es', help="Idioma")
+    parser.add_argument("--profiles", default=','.join(PROFILES), help="Perfiles separados por coma")
+    parser.add_argument("--reference", default=DEFAULT_PROFILE, help="Perfil de referencia")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        profiles = [name.strip() for name in args.profiles.split(',') if name.strip()]
+        result = compare_profiles(args.audio, args.model, args.language, profiles, args.reference)
+    except Exception as e:
+        result = {'success': False, 'error': f'{type(e).__name__}: {str(e)}'}
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result['success'] else 1
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Benchmark reproducible de la ruta de predicción de stroke.
+
+Mide:
+  - arranque en frío: intérprete + imports (y primera predicción completa)
+  - load_model() por estrategia de carga (joblib, pickle, pickle latin1, motor NumPy)
+  - latencia de una fila con el modelo ya cargado (p50/p95/p99)
+  - throughput por lotes de 1, 10, 100 y 10000 filas
+
+Las filas son sintéticas dentro de los rangos documentados de las features
+(stroke_tree_engine.synthetic_features) con semilla fija. Si no hay modelo en
+STROKE_MODEL_PATH se entrena al vuelo un modelo sustituto pequeño; el
+resultado lo indica en 'model.stand_in'.
+
+Los resultados se guardan en JSON para comparar entre versiones:
+  python benchmark_stroke.py --output resultados.json
+  python benchmark_stroke.py --output nuevo.json --compare resultados.json
+
+Con --compare se marca como regresión toda métrica que empeore más que
+--threshold (por defecto 20%) y el script sale con código 1.
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import predict_stroke
+from stroke_tree_engine import TreeEnsemble, export_model, file_sha256, synthetic_features
+
+BATCH_SIZES = (1, 10, 100, 10000)
+
+# Una predicción completa de una fila, como la hace aiService.js en modo one-shot
+COLD_START_INPUT = json.dumps({'age': 67, 'hypertension': 1, 'avg_glucose_level': 180, 'bmi': 31})
+
+def percentiles(samples):
+    """Resumen en milisegundos de una lista de duraciones en segundos."""
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        'n': int(values.size),
+        'mean_ms': round(float(values.mean()), 4),
+        'p50_ms': round(float(np.percentile(values, 50)), 4),
+        'p95_ms': round(float(np.percentile(values, 95)), 4),
+        'p99_ms': round(float(np.percentile(values, 99)), 4),
+        'max_ms': round(float(values.max()), 4),
+    }
+
+def train_stand_in_model(output_dir, seed=0):
+    """
+    Entrena un RandomForest pequeño sobre filas sintéticas, con una etiqueta
+    que crece con la edad, la glucosa y la hipertensión, y lo guarda junto con
+    su artefacto .npz. Solo sirve para medir tiempos, no para predecir.
+
+    Returns:
+        Path del .pkl creado
+    """
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+
+    X = synthetic_features(5000, seed)
+    rng = np.random.default_rng(seed)
+    logit = -7.0 + 0.06 * X[:, 0] + 0.01 * X[:, 3] + 1.0 * X[:, 1] + 0.8 * X[:, 2]
+    y = (rng.random(len(X)) < 1.0 / (1.0 + np.exp(-logit))).astype(int)
+
+    model = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=seed, n_jobs=1)
+    model.fit(X, y)
+
+    model_path = Path(output_dir) / 'stroke_model.pkl'
+    joblib.dump(model, model_path)
+    export_model(model, model_path.with_suffix('.npz'), source_path=model_path)
+    return model_path
+
+def _best_of(func, repeats):
+    """Ejecuta func repeats veces; retorna (último resultado, tiempos en segundos)."""
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return result, timings
+
+def bench_cold_start(env, repeats):
+    """
+    Tiempo de pared de procesos nuevos: solo imports, y una predicción completa
+    por stdin con cada motor.
+    """
+    scenarios = {
+        'import_only': ([sys.executable, '-c', 'import predict_stroke'], None, {}),
+        'predict_numpy_engine': ([sys.executable, 'predict_stroke.py'], COLD_START_INPUT, {}),
+        'predict_sklearn': ([sys.executable, 'predict_stroke.py'], COLD_START_INPUT, {'STROKE_ENGINE': 'sklearn'}),
+    }
+    results = {}
+    for name, (command, stdin_data, extra_env) in scenarios.items():
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                command, input=stdin_data, capture_output=True, text=True,
+                cwd=SCRIPT_DIR, env=dict(env, **extra_env)
+            )
+            timings.append(time.perf_counter() - started)
+            if completed.returncode != 0:
+                raise RuntimeError(f"Arranque en frío '{name}' falló: {completed.stderr.strip()[-300:]}")
+        results[name] = percentiles(timings)
+    return results
+
+def bench_load_strategies(model_path, engine_path, repeats):
+    """Tiempo de carga del modelo con cada estrategia de load_model() y con el motor NumPy."""
+    import joblib
+
+    def pickle_load(**kwargs):
+        with open(model_path, 'rb') as f:
+            return pickle.load(f, **kwargs)
+
+    strategies = {
+        'load_model': predict_stroke.load_model,
+        'joblib': lambda: joblib.load(model_path),
+        'pickle': pickle_load,
+        'pickle_latin1': lambda: pickle_load(encoding='latin1'),
+    }
+    if engine_path.exists():
+        strategies['numpy_engine'] = lambda: TreeEnsemble.load(engine_path)
+
+    results = {}
+    for name, load in strategies.items():
+        try:
+            _, timings = _best_of(load, repeats)
+            results[name] = percentiles(timings)
+        except Exception as e:
+            results[name] = {'error': str(e)[:200]}
+    return results
+
+def _feature_dicts(X):
+    return [dict(zip(predict_stroke.FEATURE_ORDER, row)) for row in X.tolist()]
+
+def bench_single_row(model, iterations, warmup=50):
+    """Latencia de predict_stroke_batch con una fila, modelo ya en memoria y sin caché."""
+    rows = _feature_dicts(synthetic_features(iterations, seed=1))
+    for features in rows[:warmup]:
+        predict_stroke.predict_stroke_batch([features], model=model, use_cache=False)
+    timings = []
+    for features in rows:
+        started = time.perf_counter()
+        predict_stroke.predict_stroke_batch([features], model=model, use_cache=False)
+        timings.append(time.perf_counter() - started)
+    return percentiles(timings)
+
+def bench_batches(model, min_seconds):
+    """
+    Throughput por tamaño de lote. Cada tamaño se repite hasta acumular al
+    menos min_seconds. Se mide la llamada al modelo (score_matrix) y la ruta
+    completa desde dicts (predict_stroke_batch).
+    """
+    results = {}
+    for size in BATCH_SIZES:
+        X = synthetic_features(size, seed=2)
+        rows = _feature_dicts(X)
+        entry = {}
+        for name, run in (('score_matrix', lambda: predict_stroke.score_matrix(X, model)),
+                          ('predict_stroke_batch',
+                           lambda: predict_stroke.predict_stroke_batch(rows, model=model, use_cache=False))):
+            run()
+            timings = []
+            total = 0.0
+            while total < min_seconds or len(timings) < 3:
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                timings.append(elapsed)
+                total += elapsed
+            summary = percentiles(timings)
+            summary['rows_per_second'] = round(size * len(timings) / total, 1)
+            entry[name] = summary
+        results[str(size)] = entry
+    return results
+
+def environment_info():
+    info = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+    for module in ('sklearn', 'joblib'):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    return info
+
+def run_benchmark(repeats=5, iterations=1000, min_seconds=0.5, skip_cold_start=False):
+    """
+    Ejecuta todas las mediciones.
+
+    Returns:
+        dict serializable a JSON con el entorno, el modelo y los resultados
+    """
+    stand_in_dir = None
+    model_path = predict_stroke.MODEL_PATH
+    if not model_path.exists():
+        stand_in_dir = tempfile.TemporaryDirectory(prefix='stroke_bench_')
+        sys.stderr.write(f"No se encontró {model_path}; entrenando modelo sustituto\n")
+        model_path = train_stand_in_model(stand_in_dir.name)
+
+    try:
+        engine_path = (predict_stroke.ENGINE_PATH if stand_in_dir is None
+                       else model_path.with_suffix('.npz'))
+        predict_stroke.MODEL_PATH = model_path
+        predict_stroke.ENGINE_PATH = engine_path
+        env = dict(os.environ, STROKE_MODEL_PATH=str(model_path), STROKE_ENGINE_PATH=str(engine_path))
+
+        sklearn_model = predict_stroke.load_model()
+        models = {'sklearn': sklearn_model}
+        engine = predict_stroke.load_engine()
+        if engine is not None:
+            models['numpy_engine'] = engine
+
+        report = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'environment': environment_info(),
+            'model': {
+                'path': str(model_path),
+                'sha256': file_sha256(model_path),
+                'estimator': type(sklearn_model).__name__,
+                'stand_in': stand_in_dir is not None,
+                'numpy_engine': engine is not None,
+            },
+            'settings': {
+                'repeats': repeats,
+                'iterations': iterations,
+                'min_seconds': min_seconds,
+                'batch_sizes': list(BATCH_SIZES),
+            },
+        }
+
+        sys.stderr.write("Midiendo carga del modelo...\n")
+        report['load_model'] = bench_load_strategies(model_path, engine_path, repeats)
+        if not skip_cold_start:
+            sys.stderr.write("Midiendo arranque en frío...\n")
+            report['cold_start'] = bench_cold_start(env, repeats)
+
+        report['single_row'] = {}
+        report['batch_throughput'] = {}
+        for name, model in models.items():
+            sys.stderr.write(f"Midiendo latencia y throughput ({name})...\n")
+            report['single_row'][name] = bench_single_row(model, iterations)
+            report['batch_throughput'][name] = bench_batches(model, min_seconds)
+        return report
+    finally:
+        if stand_in_dir is not None:
+            stand_in_dir.cleanup()
+
+def _comparable_metrics(report):
+    """
+    Aplana las métricas comparables como {ruta: (valor, mayor_es_mejor)}.
+    Las latencias se comparan por p50 y p95; los lotes por filas/segundo.
+    """
+    metrics = {}
+    for section in ('cold_start', 'load_model'):
+        for name, summary in report.get(section, {}).items():
+            if 'p50_ms' in summary:
+                metrics[f'{section}.{name}.p50_ms'] = (summary['p50_ms'], False)
+    for engine, summary in report.get('single_row', {}).items():
+        for key in ('p50_ms', 'p95_ms'):
+            metrics[f'single_row.{engine}.{key}'] = (summary[key], False)
+    for engine, sizes in report.get('batch_throughput', {}).items():
+        for size, entry in sizes.items():
+            for path, summary in entry.items():
+                metrics[f'batch_throughput.{engine}.{size}.{path}.rows_per_second'] = (
+                    summary['rows_per_second'], True)
+    return metrics
+
+def compare_reports(current, baseline, threshold=0.2):
+    """
+    Compara dos reportes. Una métrica es regresión si empeora más que
+    threshold (fracción) respecto a la línea base.
+
+    Returns:
+        dict con 'regressions' y 'improvements' (listas de métricas)
+    """
+    current_metrics = _comparable_metrics(current)
+    baseline_metrics = _comparable_metrics(baseline)
+    regressions, improvements = [], []
+    for key, (value, higher_is_better) in current_metrics.items():
+        if key not in baseline_metrics:
+            continue
+        base_value = baseline_metrics[key][0]
+        if not base_value:
+            continue
+        change = (value - base_value) / base_value
+        worse = -change if higher_is_better else change
+        entry = {'metric': key, 'baseline': base_value, 'current': value, 'change': round(change, 4)}
+        if worse > threshold:
+            regressions.append(entry)
+        elif worse < -threshold:
+            improvements.append(entry)
+    baseline_sha256 = baseline.get('model', {}).get('sha256')
+    return {
+        'baseline_model_sha256': baseline_sha256,
+        # Con modelos distintos las diferencias no son solo de rendimiento del código
+        'model_changed': baseline_sha256 != current.get('model', {}).get('sha256'),
+        'threshold': threshold,
+        'regressions': regressions,
+        'improvements': improvements,
+    }
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark de la predicción de riesgo de stroke")
+    parser.add_argument("--output", default="-", help="Archivo JSON de resultados ('-' = stdout)")
+    parser.add_argument("--compare", default=None, help="Reporte JSON anterior para detectar regresiones")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Empeoramiento relativo considerado regresión (por defecto 0.2)")
+    parser.add_argument("--repeats", type=int, default=5, help="Repeticiones de arranque en frío y carga")
+    parser.add_argument("--iterations", type=int, default=1000, help="Predicciones de una fila a medir")
+    parser.add_argument("--min-seconds", type=float, default=0.5,
+                        help="Tiempo mínimo medido por cada tamaño de lote")
+    parser.add_argument("--skip-cold-start", action="store_true",
+                        help="No lanzar procesos nuevos para medir el arranque en frío")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        report = run_benchmark(
+            repeats=args.repeats,
+            iterations=args.iterations,
+            min_seconds=args.min_seconds,
+            skip_cold_start=args.skip_cold_start,
+        )
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                report['comparison'] = compare_reports(report, json.load(f), args.threshold)
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}, ensure_ascii=False))
+        sys.exit(1)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        sys.stderr.write(f"Resultados guardados en {args.output}\n")
+
+    if report.get('comparison', {}).get('regressions'):
+        sys.exit(1)
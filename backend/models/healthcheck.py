@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Diagnóstico del entorno Python usado por los servicios de IA.
+
+En una sola ejecución revisa el intérprete, las versiones de numpy,
+scikit-learn, joblib, whisper y torch, ffmpeg, los scripts y el modelo de
+stroke (con su SHA-256), y escribe el resultado en un manifiesto JSON.
+
+El manifiesto incluye una huella ('fingerprint') con tamaño y fecha de
+modificación del intérprete, de los directorios site-packages y de los
+archivos del modelo. Mientras esa huella no cambie (nada se instaló ni se
+reemplazó el modelo) el manifiesto se reutiliza sin volver a importar nada;
+services/pythonHealthcheck.js compara la huella sin lanzar Python.
+
+Solo usa la biblioteca estándar, para poder diagnosticar un entorno sin numpy.
+
+Uso:
+  python healthcheck.py [--manifest RUTA] [--force]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import platform
+import importlib
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+BACKEND_DIR = SCRIPT_DIR.parent
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_PATH = SCRIPT_DIR / 'healthcheck_manifest.json'
+
+# Mismas rutas que predict_stroke.py
+MODEL_PATH = Path(os.environ.get('STROKE_MODEL_PATH') or SCRIPT_DIR / 'stroke_model.pkl')
+ENGINE_PATH = Path(os.environ.get('STROKE_ENGINE_PATH') or MODEL_PATH.with_suffix('.npz'))
+
+SCRIPTS = {
+    'predict_stroke': SCRIPT_DIR / 'predict_stroke.py',
+    'whisper_transcribe': BACKEND_DIR / 'integrations' / 'whisper_stt' / 'transcribe.py',
+}
+
+# Módulo a importar -> paquete de pip
+MODULES = {
+    'numpy': 'numpy',
+    'sklearn': 'scikit-learn',
+    'joblib': 'joblib',
+    'whisper': 'openai-whisper',
+    'torch': 'torch',
+}
+
+def file_sha256(path):
+    """Calcula el SHA-256 de un archivo."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _stat_entry(path):
+    """Tamaño y mtime (ns) de una ruta, o None si no existe."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {'path': str(path), 'size': None, 'mtime_ns': None}
+    return {'path': str(path), 'size': stat.st_size, 'mtime_ns': str(stat.st_mtime_ns)}
+
+def _site_packages_dirs():
+    import site
+    dirs = []
+    try:
+        dirs.extend(site.getsitepackages())
+    except AttributeError:
+        # virtualenv antiguos no definen getsitepackages
+        pass
+    user_site = getattr(site, 'USER_SITE', None)
+    if user_site:
+        dirs.append(user_site)
+    return sorted({d for d in dirs if os.path.isdir(d)})
+
+def fingerprint():
+    """
+    Huella del entorno: cambia al instalar/desinstalar paquetes (cambia el
+    mtime de site-packages), al cambiar de intérprete o al reemplazar el modelo.
+    """
+    paths = [os.path.realpath(sys.executable)] + _site_packages_dirs() + [str(MODEL_PATH), str(ENGINE_PATH)]
+    return {
+        'executable': sys.executable,
+        'version': sys.version,
+        'files': [_stat_entry(path) for path in paths],
+    }
+
+def check_modules():
+    """Importa cada módulo y registra su versión o el error."""
+    modules = {}
+    for name, package in MODULES.items():
+        started = time.perf_counter()
+        try:
+            module = importlib.import_module(name)
+            version = getattr(module, '__version__', None)
+            if version is None:
+                from importlib import metadata
+                version = metadata.version(package)
+            modules[name] = {'available': True, 'version': str(version)}
+        except Exception as e:
+            modules[name] = {'available': False, 'error': f'{type(e).__name__}: {str(e)[:200]}'}
+        modules[name]['package'] = package
+        modules[name]['import_seconds'] = round(time.perf_counter() - started, 3)
+    return modules
+
+def check_model():
+    """Presencia, tamaño y SHA-256 del modelo, y vigencia del motor NumPy."""
+    model = {'path': str(MODEL_PATH), 'exists': MODEL_PATH.exists()}
+    if model['exists']:
+        model['size_bytes'] = MODEL_PATH.stat().st_size
+        model['sha256'] = file_sha256(MODEL_PATH)
+
+    engine = {'path': str(ENGINE_PATH), 'exists': ENGINE_PATH.exists(), 'current': False}
+    if engine['exists']:
+        try:
+            import numpy as np
+            with np.load(ENGINE_PATH, allow_pickle=False) as data:
+                metadata = json.loads(str(data['metadata']))
+            engine['source_sha256'] = metadata.get('source_sha256')
+            engine['current'] = not model.get('sha256') or metadata.get('source_sha256') == model['sha256']
+        except Exception as e:
+            engine['error'] = f'{type(e).__name__}: {str(e)[:200]}'
+    model['numpy_engine'] = engine
+    return model
+
+def _capabilities(modules, model, scripts, ffmpeg):
+    """Resume qué servicios pueden funcionar y por qué no."""
+    stroke_errors = []
+    if not modules['numpy']['available']:
+        stroke_errors.append('Dependencia Python faltante: numpy. Instalar con: pip install numpy')
+    if not model['numpy_engine']['current'] and not modules['sklearn']['available']:
+        # Sin motor NumPy vigente el .pkl se carga con scikit-learn
+        stroke_errors.append('Dependencia Python faltante: sklearn. Instalar con: pip install scikit-learn')
+    if not scripts['predict_stroke']['exists']:
+        stroke_errors.append(f"Script Python no encontrado: {scripts['predict_stroke']['path']}")
+    if not model['exists'] and not model['numpy_engine']['exists']:
+        stroke_errors.append(f"Modelo no encontrado: {model['path']}")
+
+    whisper_errors = []
+    missing = [name for name in ('whisper', 'torch') if not modules[name]['available']]
+    if missing:
+        whisper_errors.append(
+            f"Dependencias Python no instaladas: {', '.join(missing)}. Ejecuta: pip install openai-whisper torch"
+        )
+    if not ffmpeg:
+        whisper_errors.append('ffmpeg no está instalado o no está en el PATH')
+    if not scripts['whisper_transcribe']['exists']:
+        whisper_errors.append(f"Script Python no encontrado: {scripts['whisper_transcribe']['path']}")
+
+    return {
+        'stroke': {'ok': not stroke_errors, 'errors': stroke_errors},
+        'whisper': {'ok': not whisper_errors, 'errors': whisper_errors},
+    }
+
+def build_manifest():
+    """Ejecuta todas las verificaciones."""
+    started = time.perf_counter()
+    modules = check_modules()
+    model = check_model()
+    scripts = {name: {'path': str(path), 'exists': path.exists()} for name, path in SCRIPTS.items()}
+    ffmpeg = shutil.which('ffmpeg')
+    return {
+        'manifest_version': MANIFEST_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'interpreter': {
+            'executable': sys.executable,
+            'version': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+        },
+        'modules': modules,
+        'ffmpeg': ffmpeg,
+        'scripts': scripts,
+        'model': model,
+        'capabilities': _capabilities(modules, model, scripts, ffmpeg),
+        'fingerprint': fingerprint(),
+        'elapsed_seconds': round(time.perf_counter() - started, 3),
+    }
+
+def load_manifest(path):
+    """Retorna el manifiesto guardado si sigue vigente, o None."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('manifest_version') != MANIFEST_VERSION or manifest.get('fingerprint') != fingerprint():
+        return None
+    return manifest
+
+def get_manifest(path=DEFAULT_MANIFEST_PATH, force=False):
+    """
+    Manifiesto vigente: el guardado si la huella no cambió, o uno nuevo que se
+    escribe en `path`.
+
+    Returns:
+        tuple (manifest, cached)
+    """
+    path = Path(path)
+    if not force:
+        manifest = load_manifest(path)
+        if manifest is not None:
+            return manifest, True
+
+    manifest = build_manifest()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return manifest, False
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Diagnóstico del entorno Python de los servicios de IA")
+    parser.add_argument("--manifest", default=str(DEFAULT_MANIFEST_PATH), help="Ruta del manifiesto JSON")
+    parser.add_argument("--force", action="store_true", help="Ignorar el manifiesto guardado")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    try:
+        manifest, cached = get_manifest(args.manifest, force=args.force)
+        result = dict(manifest, success=True, cached=cached, manifest_path=str(args.manifest))
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+    print(json.dumps(result, ensure_ascii=False))
+    sys.exit(0 if result['success'] else 1)
@@ -8,18 +8,29 @@ import sys
 import json
 import pickle
 import os
+import time
 import numpy as np
 from pathlib import Path
 
-# Intentar importar joblib para mejor compatibilidad de modelos
-try:
-    import joblib
-    USE_JOBLIB = True
-except ImportError:
-    USE_JOBLIB = False
+# Permitir imports de módulos hermanos (stroke_tree_engine, etc.)
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
 
-# Ruta al modelo
-MODEL_PATH = Path(__file__).parent / 'stroke_model.pkl'
+from stroke_cache import PredictionCache
+from stroke_features import records_to_columns, stroke_feature_matrix, validate_stroke_data
+import stroke_population
+
+# Ruta al modelo (se puede sobrescribir con STROKE_MODEL_PATH)
+MODEL_PATH = Path(os.environ.get('STROKE_MODEL_PATH') or SCRIPT_DIR / 'stroke_model.pkl')
+
+# Artefacto del motor NumPy exportado desde el .pkl (ver stroke_tree_engine.py).
+# Si existe y está vigente se usa en lugar de scikit-learn.
+ENGINE_PATH = Path(os.environ.get('STROKE_ENGINE_PATH') or MODEL_PATH.with_suffix('.npz'))
+
+# Caché de predicciones (ver stroke_cache.py): tamaño del LRU en memoria
+# (0 lo desactiva) y base SQLite opcional para conservarlo entre reinicios
+CACHE_SIZE = int(os.environ.get('STROKE_CACHE_SIZE', '4096'))
+CACHE_DB_PATH = os.environ.get('STROKE_CACHE_DB') or None
 
 def load_model():
     """Carga el modelo desde archivo .pkl"""
@@ -30,6 +41,13 @@ def load_model():
     # Suprimir TODOS los warnings para evitar problemas de compatibilidad
     warnings.filterwarnings('ignore')
     
+    # joblib se importa aquí para no pagar su costo cuando se usa el motor NumPy
+    try:
+        import joblib
+        USE_JOBLIB = True
+    except ImportError:
+        USE_JOBLIB = False
+    
     # Intentar múltiples estrategias para cargar el modelo
     strategies = []
     
@@ -98,66 +116,740 @@ def load_model():
             f"Último error: {str(last_error)[:200]}"
         )
 
-def predict_stroke(features):
+# Orden de features según el modelo
+FEATURE_ORDER = [
+    'age',
+    'hypertension',
+    'heart_disease',
+    'avg_glucose_level',
+    'bmi',
+    'gender_Male',
+    'gender_Other',
+    'ever_married_Yes',
+    'work_type_Never_worked',
+    'work_type_Private',
+    'work_type_Self_employed',
+    'work_type_children',
+    'Residence_type_Urban',
+    'smoking_status_formerly_smoked',
+    'smoking_status_never_smoked',
+    'smoking_status_smokes'
+]
+
+# Modelo cargado en memoria (se reutiliza entre predicciones en modo worker)
+_loaded_model = None
+_model_sha256 = None
+_prediction_cache = None
+
+def validate_model(model):
     """
-    Predice riesgo de stroke basado en features.
+    Verifica que el modelo cargado responde con la forma esperada
+    haciendo una predicción de prueba sobre un vector de ceros.
+    """
+    probe = np.zeros((1, len(FEATURE_ORDER)))
+    proba = np.asarray(model.predict_proba(probe))
+    if proba.ndim != 2 or proba.shape[0] != 1 or proba.shape[1] < 2:
+        raise ValueError(
+            f"El modelo retornó probabilidades con forma inesperada {proba.shape}; "
+            f"se esperaba (1, 2)"
+        )
+
+def load_engine():
+    """
+    Carga el motor NumPy si hay un artefacto exportado y corresponde al .pkl
+    actual. Retorna None si no existe, está desactualizado o se fuerza
+    scikit-learn con STROKE_ENGINE=sklearn.
+    """
+    if os.environ.get('STROKE_ENGINE') == 'sklearn' or not ENGINE_PATH.exists():
+        return None
+    
+    from stroke_tree_engine import TreeEnsemble, file_sha256
+    try:
+        engine = TreeEnsemble.load(ENGINE_PATH)
+    except Exception as e:
+        sys.stderr.write(f"Motor NumPy no disponible ({e}); usando scikit-learn\n")
+        return None
+    
+    source_sha256 = engine.metadata.get('source_sha256')
+    if source_sha256 and MODEL_PATH.exists() and file_sha256(MODEL_PATH) != source_sha256:
+        sys.stderr.write(
+            f"{ENGINE_PATH.name} no corresponde a {MODEL_PATH.name}; usando scikit-learn. "
+            f"Re-exportar con: python stroke_tree_engine.py export\n"
+        )
+        return None
+    return engine
+
+def get_model():
+    """
+    Retorna el modelo cargado y validado. Solo se lee del disco la primera vez;
+    las llamadas siguientes reutilizan la instancia en memoria.
+    Se prefiere el motor NumPy y, si no está disponible, el .pkl de scikit-learn.
+    """
+    global _loaded_model, _model_sha256
+    if _loaded_model is None:
+        from stroke_tree_engine import file_sha256
+        engine = load_engine()
+        if engine is not None:
+            model = engine
+            model_sha256 = engine.metadata.get('source_sha256') or file_sha256(ENGINE_PATH)
+        else:
+            model = load_model()
+            model_sha256 = file_sha256(MODEL_PATH)
+        validate_model(model)
+        _loaded_model = model
+        _model_sha256 = model_sha256
+    return _loaded_model
+
+def get_prediction_cache():
+    """
+    Retorna el caché de predicciones del modelo cargado, o None si está
+    desactivado (STROKE_CACHE_SIZE=0 y sin STROKE_CACHE_DB).
+    """
+    global _prediction_cache
+    if _prediction_cache is None and (CACHE_SIZE > 0 or CACHE_DB_PATH):
+        get_model()
+        _prediction_cache = PredictionCache(_model_sha256, max_entries=CACHE_SIZE, db_path=CACHE_DB_PATH)
+    return _prediction_cache
+
+# Índice poblacional para reportar percentiles (ver stroke_population.py)
+_population_index = None
+_population_index_mtime = None
+
+def get_population_index():
+    """
+    Retorna el índice poblacional, o None si no se ha construido. Se vuelve a
+    cargar cuando el archivo cambia (por ejemplo, después de un backfill).
+    """
+    global _population_index, _population_index_mtime
+    try:
+        mtime = os.stat(stroke_population.INDEX_PATH).st_mtime_ns
+    except OSError:
+        _population_index = _population_index_mtime = None
+        return None
+    if mtime != _population_index_mtime:
+        try:
+            _population_index = stroke_population.PopulationIndex.load(stroke_population.INDEX_PATH)
+        except Exception as e:
+            sys.stderr.write(f"Índice poblacional no disponible ({e})\n")
+            _population_index = None
+        _population_index_mtime = mtime
+    return _population_index
+
+def risk_level_from_probability(probability):
+    """Traduce una probabilidad (0-1) al nivel de riesgo 'low'|'medium'|'high'."""
+    if probability < 0.3:
+        return 'low'
+    elif probability < 0.7:
+        return 'medium'
+    return 'high'
+
+def features_to_vector(features):
+    """
+    Convierte un dict de features en una lista de floats en el orden FEATURE_ORDER.
+    Valores ausentes, None o vacíos se toman como 0.
+    
+    Raises:
+        ValueError: si algún valor no es numérico
+    """
+    vector = []
+    for name in FEATURE_ORDER:
+        value = features.get(name, 0)
+        if value is None or value == '':
+            value = 0
+        try:
+            vector.append(float(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"Valor no numérico para '{name}': {value!r}")
+    return vector
+
+def score_matrix(feature_matrix, model):
+    """
+    Evalúa una matriz (n, 16) con una única llamada a predict_proba.
+    
+    Returns:
+        tuple (probabilities, predictions): probabilidad de stroke y clase predicha
+        por fila. La clase se deriva de las probabilidades (argmax), igual que
+        model.predict, sin una segunda pasada por el modelo.
+    """
+    proba = np.asarray(model.predict_proba(feature_matrix))
+    classes = np.asarray(getattr(model, 'classes_', np.arange(proba.shape[1])))
+    predictions = classes[proba.argmax(axis=1)]
+    return proba[:, 1], predictions
+
+def predict_stroke_batch(features_list, model=None, use_cache=True, with_population=True):
+    """
+    Predice riesgo de stroke para muchos pacientes a la vez.
     
     Args:
-        features: dict con las features requeridas
+        features_list: lista de dicts con las features requeridas
+        model: modelo ya cargado (opcional). Si no se indica, se usa get_model()
+        use_cache: consultar y alimentar el caché de predicciones
+        with_population: agregar el percentil poblacional si hay índice
+            (el municipio se toma de la clave opcional 'municipio')
         
     Returns:
-        dict con 'probability' (0-1) y 'risk_level' ('low'|'medium'|'high')
+        list con un dict por paciente, en el mismo orden y con el mismo formato
+        que predict_stroke(). Las filas con valores inválidos reciben
+        {'success': False, 'error': ...} sin afectar al resto.
     """
-    try:
-        model = load_model()
-        
-        # Orden de features según el modelo
-        feature_order = [
-            'age',
-            'hypertension',
-            'heart_disease',
-            'avg_glucose_level',
-            'bmi',
-            'gender_Male',
-            'gender_Other',
-            'ever_married_Yes',
-            'work_type_Never_worked',
-            'work_type_Private',
-            'work_type_Self_employed',
-            'work_type_children',
-            'Residence_type_Urban',
-            'smoking_status_formerly_smoked',
-            'smoking_status_never_smoked',
-            'smoking_status_smokes'
-        ]
-        
-        # Construir array de features en el orden correcto
-        feature_array = np.array([[features.get(f, 0) for f in feature_order]])
-        
-        # Predecir probabilidad
-        probability = model.predict_proba(feature_array)[0][1]  # Probabilidad de clase 1 (stroke)
-        
-        # Determinar nivel de riesgo
-        if probability < 0.3:
-            risk_level = 'low'
-        elif probability < 0.7:
-            risk_level = 'medium'
-        else:
-            risk_level = 'high'
-        
-        return {
+    if model is None:
+        model = get_model()
+    
+    results = [None] * len(features_list)
+    valid_rows = []
+    vectors = []
+    for i, features in enumerate(features_list):
+        try:
+            if not isinstance(features, dict):
+                raise ValueError('Se esperaba un objeto JSON con features')
+            vectors.append(features_to_vector(features))
+            valid_rows.append(i)
+        except ValueError as e:
+            results[i] = {'success': False, 'error': str(e)}
+    
+    if vectors:
+        # Un solo array contiguo en el orden del modelo
+        feature_matrix = np.ascontiguousarray(vectors, dtype=np.float64)
+        municipios = [features_list[i].get('municipio') for i in valid_rows] if with_population else None
+        _fill_results(results, valid_rows, feature_matrix, model, use_cache=use_cache,
+                      municipios=municipios)
+    return results
+
+def _score_with_cache(feature_matrix, model, cache):
+    """
+    Igual que score_matrix, pero solo evalúa en el modelo las filas que no
+    están en el caché (en una única llamada) y guarda sus resultados.
+    """
+    keys = [cache.key_for(row) for row in feature_matrix]
+    cached = cache.get_many(keys)
+    probabilities = np.empty(len(keys), dtype=np.float64)
+    predictions = np.empty(len(keys), dtype=np.int64)
+    
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    for i, key in enumerate(keys):
+        if key in cached:
+            probabilities[i], predictions[i] = cached[key]
+    
+    if missing:
+        missing_probabilities, missing_predictions = score_matrix(feature_matrix[missing], model)
+        probabilities[missing] = missing_probabilities
+        predictions[missing] = missing_predictions
+        cache.put_many([
+            (keys[i], float(probabilities[i]), int(predictions[i]))
+            for i in dict.fromkeys(missing)
+        ])
+    return probabilities, predictions
+
+def _fill_results(results, rows, feature_matrix, model, include_features=False, use_cache=False,
+                  municipios=None):
+    """
+    Puntúa feature_matrix y escribe el resultado de cada fila en results[rows[i]].
+    Si se pasa municipios (uno por fila) y existe el índice poblacional, cada
+    resultado incluye 'population' con sus percentiles.
+    """
+    # El caché solo es válido para el modelo global, cuyo hash conocemos
+    cache = get_prediction_cache() if use_cache and model is _loaded_model else None
+    if cache is not None:
+        probabilities, predictions = _score_with_cache(feature_matrix, model, cache)
+    else:
+        probabilities, predictions = score_matrix(feature_matrix, model)
+    for i, (row, probability, prediction) in enumerate(zip(rows, probabilities.tolist(), predictions.tolist())):
+        results[row] = {
             'success': True,
             'probability': float(probability),
-            'risk_level': risk_level,
-            'prediction': int(model.predict(feature_array)[0])
+            'risk_level': risk_level_from_probability(probability),
+            'prediction': int(prediction)
         }
+        if include_features:
+            results[row]['features'] = dict(zip(FEATURE_ORDER, feature_matrix[i].tolist()))
+    
+    population_index = get_population_index() if municipios is not None else None
+    if population_index is not None:
+        age_column = FEATURE_ORDER.index('age')
+        rankings = population_index.rank(probabilities, ages=feature_matrix[:, age_column], municipios=municipios)
+        for row, ranking in zip(rows, rankings):
+            results[row]['population'] = ranking
+
+def predict_patients_batch(patients, model=None, use_cache=True, with_population=True):
+    """
+    Predice riesgo de stroke a partir de datos clínicos sin mapear (el mismo
+    payload que recibe mapToStrokeFeatures en dataMapper.js: age, gender,
+    tensionSistolica, peso, talla, imc, glucometria, antecedentesPersonales...).
+    
+    El mapeo a features se hace por columnas sobre el lote completo
+    (ver stroke_features.map_columns_to_stroke_features).
+    
+    Returns:
+        list con un dict por paciente; incluye las 'features' calculadas.
+        Los pacientes sin edad reciben {'success': False, 'missingFields': [...]}
+    """
+    if model is None:
+        model = get_model()
+    
+    results = [None] * len(patients)
+    valid_rows = []
+    for i, patient in enumerate(patients):
+        if not isinstance(patient, dict):
+            results[i] = {'success': False, 'error': 'Se esperaba un objeto JSON con datos del paciente'}
+            continue
+        validation = validate_stroke_data(patient)
+        if not validation['valid']:
+            results[i] = {
+                'success': False,
+                'error': f"Faltan campos requeridos: {', '.join(validation['missingFields'])}",
+                'missingFields': validation['missingFields']
+            }
+            continue
+        valid_rows.append(i)
+    
+    if valid_rows:
+        columns = records_to_columns([patients[i] for i in valid_rows])
+        feature_matrix = stroke_feature_matrix(columns, FEATURE_ORDER, n_rows=len(valid_rows))
+        municipios = [patients[i].get('municipio') for i in valid_rows] if with_population else None
+        _fill_results(results, valid_rows, feature_matrix, model,
+                      include_features=True, use_cache=use_cache, municipios=municipios)
+    return results
+
+def predict_stroke(features, model=None):
+    """
+    Predice riesgo de stroke basado en features.
+    
+    Args:
+        features: dict con las features requeridas
+        model: modelo ya cargado (opcional). Si no se indica, se usa get_model()
         
+    Returns:
+        dict con 'probability' (0-1) y 'risk_level' ('low'|'medium'|'high').
+        Si existe el índice poblacional incluye 'population' con el percentil
+        general, por franja de edad y por municipio (clave opcional 'municipio')
+    """
+    try:
+        return predict_stroke_batch([features], model=model)[0]
     except Exception as e:
         return {
             'success': False,
             'error': str(e)
         }
 
+# Variables modificables que admite el análisis de sensibilidad (what-if)
+WHATIF_NUMERIC = ('avg_glucose_level', 'bmi', 'hypertension')
+
+# Categorías de tabaquismo y su codificación one-hot ('Unknown' = todas en 0)
+SMOKING_CATEGORIES = {
+    'never_smoked': 'smoking_status_never_smoked',
+    'formerly_smoked': 'smoking_status_formerly_smoked',
+    'smokes': 'smoking_status_smokes',
+    'Unknown': None,
+}
+
+# Tamaño máximo de la grilla (celdas) para una sola petición
+WHATIF_MAX_CELLS = 250000
+
+def _whatif_axis_values(name, spec):
+    """
+    Valores de un eje de la grilla. spec puede ser una lista explícita o
+    {"start": a, "stop": b, "steps": n} (n valores equiespaciados, extremos incluidos).
+    """
+    if isinstance(spec, dict):
+        try:
+            start, stop = float(spec['start']), float(spec['stop'])
+            steps = int(spec.get('steps', 10))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Rango inválido para '{name}': se esperaba start, stop y steps")
+        if steps < 1:
+            raise ValueError(f"'steps' debe ser mayor que 0 para '{name}'")
+        return np.linspace(start, stop, steps).tolist()
+    if isinstance(spec, list) and spec:
+        return spec
+    raise ValueError(f"Rango inválido para '{name}': se esperaba una lista o {{start, stop, steps}}")
+
+def sensitivity_grid(base_features, ranges, model=None):
+    """
+    Análisis what-if: evalúa el riesgo de un paciente variando las features
+    modificables sobre una grilla, con una sola llamada a predict_proba.
+    
+    Args:
+        base_features: dict de features del paciente (como en predict_stroke)
+        ranges: dict {eje: valores} con ejes entre avg_glucose_level, bmi,
+            hypertension y smoking_status. Los numéricos aceptan lista o
+            {"start", "stop", "steps"}; smoking_status acepta una lista de
+            'never_smoked', 'formerly_smoked', 'smokes', 'Unknown'.
+        model: modelo ya cargado (opcional)
+    
+    Returns:
+        dict con 'axes' (orden de los ejes y sus valores), 'shape' y
+        'probabilities' (matriz anidada con una dimensión por eje), además de
+        la probabilidad del paciente sin cambios
+    
+    Raises:
+        ValueError: ejes desconocidos, valores inválidos o grilla demasiado grande
+    """
+    if model is None:
+        model = get_model()
+    if not isinstance(ranges, dict) or not ranges:
+        raise ValueError("Se requiere 'ranges' con al menos un eje")
+    
+    base_vector = np.asarray(features_to_vector(base_features), dtype=np.float64)
+    axes = []
+    for name, spec in ranges.items():
+        if name == 'smoking_status':
+            values = spec if isinstance(spec, list) and spec else None
+            if values is None or any(value not in SMOKING_CATEGORIES for value in values):
+                raise ValueError(
+                    f"'smoking_status' debe ser una lista con valores de: {', '.join(SMOKING_CATEGORIES)}"
+                )
+        elif name in WHATIF_NUMERIC:
+            values = _whatif_axis_values(name, spec)
+            try:
+                values = [float(value) for value in values]
+            except (TypeError, ValueError):
+                raise ValueError(f"Valores no numéricos para '{name}'")
+        else:
+            raise ValueError(
+                f"Eje no soportado: '{name}'. Ejes válidos: {', '.join(WHATIF_NUMERIC + ('smoking_status',))}"
+            )
+        axes.append((name, values))
+    
+    shape = tuple(len(values) for _, values in axes)
+    n_cells = int(np.prod(shape))
+    if n_cells > WHATIF_MAX_CELLS:
+        raise ValueError(f"La grilla tiene {n_cells} celdas; el máximo es {WHATIF_MAX_CELLS}")
+    
+    grid = np.tile(base_vector, (n_cells, 1))
+    # Índice de cada celda a lo largo de cada eje (orden C, igual que reshape)
+    cell_indices = np.indices(shape).reshape(len(shape), n_cells)
+    for (name, values), indices in zip(axes, cell_indices):
+        if name == 'smoking_status':
+            for column in SMOKING_CATEGORIES.values():
+                if column:
+                    grid[:, FEATURE_ORDER.index(column)] = 0.0
+            for category_index, category in enumerate(values):
+                column = SMOKING_CATEGORIES[category]
+                if column:
+                    grid[indices == category_index, FEATURE_ORDER.index(column)] = 1.0
+        else:
+            grid[:, FEATURE_ORDER.index(name)] = np.asarray(values)[indices]
+    
+    # La fila del paciente sin cambios va al final para evaluarla en la misma llamada
+    probabilities, _ = score_matrix(np.vstack([grid, base_vector]), model)
+    return {
+        'success': True,
+        'base_probability': float(probabilities[-1]),
+        'base_risk_level': risk_level_from_probability(probabilities[-1]),
+        'axes': [{'feature': name, 'values': values} for name, values in axes],
+        'shape': list(shape),
+        'probabilities': np.round(probabilities[:-1], 4).reshape(shape).tolist(),
+    }
+
+def predict_whatif(payload, model=None):
+    """
+    Atiende una petición what-if: {"features": {...}} o {"patient": {...}}
+    (datos clínicos sin mapear) junto con "ranges" (ver sensitivity_grid).
+    """
+    if not isinstance(payload, dict):
+        return {'success': False, 'error': 'Se esperaba un objeto JSON'}
+    try:
+        if 'patient' in payload:
+            patient = payload['patient']
+            if not isinstance(patient, dict):
+                raise ValueError("El campo 'patient' debe ser un objeto JSON")
+            validation = validate_stroke_data(patient)
+            if not validation['valid']:
+                return {
+                    'success': False,
+                    'error': f"Faltan campos requeridos: {', '.join(validation['missingFields'])}",
+                    'missingFields': validation['missingFields']
+                }
+            matrix = stroke_feature_matrix(records_to_columns([patient]), FEATURE_ORDER, n_rows=1)
+            base_features = dict(zip(FEATURE_ORDER, matrix[0].tolist()))
+        else:
+            base_features = payload.get('features')
+            if not isinstance(base_features, dict):
+                raise ValueError("Se requiere 'features' o 'patient' con los datos base")
+        result = sensitivity_grid(base_features, payload.get('ranges'), model=model)
+        result['features'] = base_features
+        return result
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+
+def iter_batch_records(path, input_format=None):
+    """
+    Lee registros de un archivo NDJSON o CSV ('-' = stdin). Si no se indica
+    input_format, se deduce de la extensión: .csv se lee como CSV con
+    encabezados, cualquier otra como NDJSON (un objeto JSON por línea).
+    """
+    import csv
+    
+    if path == '-':
+        stream = sys.stdin
+    else:
+        stream = open(path, 'r', encoding='utf-8', newline='')
+    try:
+        if input_format is None:
+            input_format = 'csv' if str(path).lower().endswith('.csv') else 'ndjson'
+        if input_format == 'csv':
+            for row in csv.DictReader(stream):
+                yield row
+        else:
+            for line_number, line in enumerate(stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {'__error__': f'Línea {line_number}: error parseando JSON: {str(e)}'}
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def open_scoring_pool(model, workers):
+    """
+    Crea un pool multiproceso que comparte `model` por copy-on-write
+    (ver stroke_pool.py). workers=0 usa un proceso por núcleo.
+    
+    Returns:
+        ForkedScoringPool, o None si workers == 1 o la plataforma no tiene fork
+    """
+    from stroke_pool import ForkedScoringPool, fork_available
+    if workers == 1:
+        return None
+    if not fork_available():
+        sys.stderr.write("Modo multiproceso no disponible sin fork; se usa un solo proceso\n")
+        return None
+    return ForkedScoringPool(model, workers=workers or None)
+
+def run_batch(input_path, output_path='-', chunk_size=10000, raw=False, input_format=None, workers=1):
+    """
+    Puntúa un archivo completo por bloques de chunk_size filas y escribe una
+    línea NDJSON por registro (conservando su 'id' si lo trae). Con raw=True
+    cada registro son datos clínicos sin mapear (ver predict_patients_batch).
+    Con workers distinto de 1 cada bloque se reparte entre procesos hijos
+    creados después de cargar el modelo (0 = uno por núcleo).
+    
+    Returns:
+        dict con el resumen de la ejecución
+    """
+    model = get_model()
+    pool = open_scoring_pool(model, workers)
+    scoring_model = pool if pool is not None else model
+    if pool is not None:
+        chunk_size = pool.effective_chunk_size(chunk_size)
+        sys.stderr.write(f"Puntuando con {pool.workers} procesos, bloques de {chunk_size} filas\n")
+    out = sys.stdout if output_path == '-' else open(output_path, 'w', encoding='utf-8')
+    started = time.perf_counter()
+    total = 0
+    failed = 0
+    
+    def flush(records):
+        nonlocal total, failed
+        parsed = [r for r in records if '__error__' not in r]
+        scorer = predict_patients_batch if raw else predict_stroke_batch
+        # Cada fila de un archivo se puntúa una vez: el caché solo añadiría costo
+        scored = iter(scorer(parsed, model=scoring_model, use_cache=False, with_population=False))
+        for record in records:
+            if '__error__' in record:
+                result = {'success': False, 'error': record['__error__']}
+            else:
+                result = next(scored)
+                if record.get('id') not in (None, ''):
+                    result['id'] = record['id']
+            if not result['success']:
+                failed += 1
+            total += 1
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+    
+    try:
+        chunk = []
+        for record in iter_batch_records(input_path, input_format):
+            if not isinstance(record, dict):
+                record = {'__error__': 'Se esperaba un objeto JSON con features'}
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+        out.flush()
+        pool_report = pool.report() if pool is not None else None
+    finally:
+        if pool is not None:
+            pool.close()
+        if out is not sys.stdout:
+            out.close()
+    
+    elapsed = time.perf_counter() - started
+    summary = {
+        'success': True,
+        'total': total,
+        'failed': failed,
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(total / elapsed, 1) if elapsed else 0.0,
+    }
+    if pool_report is not None:
+        summary['pool'] = dict(pool_report, chunk_size=chunk_size)
+    return summary
+
+def handle_worker_request(line):
+    """
+    Procesa una línea NDJSON recibida en modo worker.
+    
+    La línea puede ser directamente el dict de features, o un sobre
+    {"id": ..., "features": {...}}. El "id" se devuelve en la respuesta para
+    que el cliente pueda emparejar peticiones concurrentes.
+    Un sobre {"cmd": "ping"} permite comprobar que el worker sigue vivo,
+    {"cmd": "stats"} retorna los contadores del caché de predicciones y
+    {"batch": [{...}, ...]} puntúa varios pacientes en una sola llamada al modelo.
+    Con {"patient": {...}} o {"patients": [...]} se envían datos clínicos sin
+    mapear y el worker calcula las features.
+    {"whatif": {"features"|"patient": {...}, "ranges": {...}}} retorna la
+    grilla de sensibilidad (ver sensitivity_grid).
+    
+    Returns:
+        dict con la respuesta a serializar
+    """
+    try:
+        payload = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {'success': False, 'error': f'Error parseando JSON: {str(e)}'}
+    
+    if not isinstance(payload, dict):
+        return {'success': False, 'error': 'Se esperaba un objeto JSON'}
+    
+    request_id = payload.get('id')
+    if payload.get('cmd') == 'ping':
+        response = {'success': True, 'pong': True}
+    elif payload.get('cmd') == 'stats':
+        cache = get_prediction_cache()
+        response = {'success': True, 'cache': cache.stats() if cache else None}
+    elif 'whatif' in payload:
+        try:
+            response = predict_whatif(payload['whatif'])
+        except Exception as e:
+            response = {'success': False, 'error': str(e)}
+    elif 'patient' in payload or 'patients' in payload:
+        patients = payload['patients'] if 'patients' in payload else [payload['patient']]
+        if not isinstance(patients, list):
+            response = {'success': False, 'error': "El campo 'patients' debe ser una lista"}
+        else:
+            try:
+                results = predict_patients_batch(patients)
+                response = results[0] if 'patient' in payload else {'success': True, 'results': results}
+            except Exception as e:
+                response = {'success': False, 'error': str(e)}
+    elif 'batch' in payload:
+        if not isinstance(payload['batch'], list):
+            response = {'success': False, 'error': "El campo 'batch' debe ser una lista"}
+        else:
+            try:
+                response = {'success': True, 'results': predict_stroke_batch(payload['batch'])}
+            except Exception as e:
+                response = {'success': False, 'error': str(e)}
+    else:
+        features = payload.get('features', payload)
+        if not isinstance(features, dict):
+            response = {'success': False, 'error': "El campo 'features' debe ser un objeto JSON"}
+        else:
+            response = predict_stroke(features)
+    
+    if request_id is not None:
+        response['id'] = request_id
+    return response
+
+def _ready_message():
+    """Carga el modelo y construye el mensaje inicial del worker."""
+    try:
+        model = get_model()
+        engine = 'numpy' if type(model).__name__ == 'TreeEnsemble' else 'sklearn'
+        return {'success': True, 'ready': True, 'model_path': str(MODEL_PATH), 'engine': engine}
+    except Exception as e:
+        return {'success': False, 'ready': False, 'error': str(e)}
+
+def serve_stdio():
+    """
+    Modo worker sobre stdin/stdout: carga el modelo una vez, anuncia
+    {"ready": true} y responde una línea JSON por cada línea recibida.
+    """
+    ready = _ready_message()
+    sys.stdout.write(json.dumps(ready, ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+    if not ready['success']:
+        return 1
+    
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        response = handle_worker_request(line)
+        sys.stdout.write(json.dumps(response, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+    return 0
+
+def serve_unix_socket(socket_path):
+    """
+    Modo worker sobre un socket Unix local. Cada conexión puede enviar
+    varias líneas NDJSON; cada una recibe su respuesta en una línea.
+    """
+    import socketserver
+    
+    ready = _ready_message()
+    if not ready['success']:
+        sys.stderr.write(json.dumps(ready, ensure_ascii=False) + '\n')
+        return 1
+    
+    class WorkerHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw_line in self.rfile:
+                line = raw_line.decode('utf-8').strip()
+                if not line:
+                    continue
+                response = handle_worker_request(line)
+                self.wfile.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+                self.wfile.flush()
+    
+    # Eliminar un socket huérfano de una ejecución anterior
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    
+    server = socketserver.ThreadingUnixStreamServer(socket_path, WorkerHandler)
+    server.daemon_threads = True
+    sys.stderr.write(json.dumps(dict(ready, socket=socket_path), ensure_ascii=False) + '\n')
+    sys.stderr.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+    return 0
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Predicción de riesgo de stroke")
+    parser.add_argument("--worker", action="store_true",
+                        help="Mantener el modelo cargado y atender peticiones NDJSON por stdin/stdout")
+    parser.add_argument("--socket", metavar="RUTA",
+                        help="En modo worker, escuchar en un socket Unix local en lugar de stdin/stdout")
+    parser.add_argument("--cache-db", metavar="RUTA",
+                        help="Base SQLite para conservar el caché de predicciones entre reinicios")
+    parser.add_argument("--batch", metavar="ARCHIVO",
+                        help="Puntuar un archivo NDJSON o CSV completo ('-' para stdin)")
+    parser.add_argument("--output", metavar="ARCHIVO", default="-",
+                        help="Archivo NDJSON de salida para --batch (por defecto stdout)")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="Filas por llamada al modelo en --batch (por defecto 10000)")
+    parser.add_argument("--format", choices=["ndjson", "csv"], dest="input_format",
+                        help="Formato de --batch (por defecto se deduce de la extensión)")
+    parser.add_argument("--raw", action="store_true",
+                        help="La entrada son datos clínicos sin mapear (formato de dataMapper.js)")
+    parser.add_argument("--whatif", action="store_true",
+                        help="Grilla de sensibilidad: stdin trae features (o patient) y ranges")
+    parser.add_argument("--workers", type=int, nargs="?", const=0, default=1,
+                        help="Procesos para --batch; sin valor, uno por núcleo (por defecto 1)")
+    return parser.parse_args(argv)
+
 if __name__ == '__main__':
     try:
         # Configurar encoding UTF-8 para stdout en Windows
@@ -173,12 +865,33 @@ if __name__ == '__main__':
         import warnings
         warnings.filterwarnings('ignore')  # Suprimir todos los warnings
         
+        args = parse_args()
+        if args.cache_db:
+            CACHE_DB_PATH = args.cache_db
+        if args.worker:
+            if args.socket:
+                sys.exit(serve_unix_socket(args.socket))
+            sys.exit(serve_stdio())
+        
+        if args.batch:
+            summary = run_batch(args.batch, args.output, args.chunk_size,
+                                raw=args.raw, input_format=args.input_format,
+                                workers=args.workers)
+            # El resumen va a stderr para no mezclarse con las filas NDJSON
+            sys.stderr.write(json.dumps(summary, ensure_ascii=False) + '\n')
+            sys.exit(0)
+        
         # Leer JSON de stdin
         stdin_data = sys.stdin.read()
         input_data = json.loads(stdin_data)
         
         # Realizar predicción
-        result = predict_stroke(input_data)
+        if args.whatif:
+            result = predict_whatif(input_data)
+        elif args.raw:
+            result = predict_patients_batch([input_data])[0]
+        else:
+            result = predict_stroke(input_data)
         
         # Escribir SOLO JSON a stdout, nada más
         output = json.dumps(result, ensure_ascii=False)
@@ -203,4 +916,3 @@ if __name__ == '__main__':
         sys.stdout.write(output)
         sys.stdout.flush()
         sys.exit(1)
-
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Cálculo masivo e incremental del riesgo de stroke sobre la base de datos SQLite.
+
+Lee las atenciones de medicina general (HC_Medicina_General) junto con los
+datos del paciente, su familia y su última caracterización, construye las
+features con las mismas reglas de dataMapper.js (ver stroke_features.py,
+aplicado por columnas sobre cada bloque), las puntúa por lotes vectorizados y guarda el resultado en la tabla
+Riesgo_Stroke (una fila por atencion_id).
+
+Es incremental sin tocar las tablas de la app: server.js crea la HC junto con
+la atención y completa signos vitales y antecedentes después con UPDATE, así
+que no basta con puntuar los atencion_id nuevos. Cada fila de Riesgo_Stroke
+guarda el hash de los datos de origen con que se calculó (hash_datos); cada
+ejecución recorre las atenciones por atencion_id y solo puntúa las nuevas y
+aquellas cuyo hash cambió. Riesgo_Stroke y Riesgo_Stroke_Estado son las únicas
+tablas que escribe este job.
+
+La marca de agua de Riesgo_Stroke_Estado es el atencion_id hasta donde llegó
+el recorrido en curso; avanza en la misma transacción que cada bloque de
+resultados, así que una ejecución interrumpida retoma desde el último bloque
+confirmado, y vuelve a 0 al terminar el recorrido. Al terminar actualiza el
+índice de percentiles poblacionales (stroke_population.py).
+
+Uso:
+  python stroke_backfill.py run [--db RUTA] [--chunk-size 500] [--full]
+  python stroke_backfill.py ranking [--db RUTA] [--group-by territorio|municipio] [--limit 20]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+from datetime import date, datetime
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import predict_stroke
+import stroke_population
+
+JOB_NAME = 'stroke_backfill'
+
+# Rutas de la base de datos (misma prioridad que server.js: DB_PATH, /tmp, fuente)
+DB_SOURCE = SCRIPT_DIR.parent / 'database' / 'salud_digital_aps.db'
+DB_TMP = Path('/tmp/salud_digital_aps.db')
+
+CREATE_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS Riesgo_Stroke (
+    atencion_id INTEGER PRIMARY KEY,
+    paciente_id INTEGER NOT NULL,
+    fecha_atencion DATETIME,
+    territorio VARCHAR(150),
+    municipio VARCHAR(100),
+    zona VARCHAR(50),
+    probabilidad REAL NOT NULL,
+    nivel_riesgo VARCHAR(10) NOT NULL,
+    prediccion INTEGER NOT NULL,
+    features JSON,
+    modelo VARCHAR(20),
+    hash_datos VARCHAR(40),
+    fecha_calculo DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (atencion_id) REFERENCES Atenciones_Clinicas(atencion_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_riesgo_stroke_paciente ON Riesgo_Stroke(paciente_id);
+CREATE INDEX IF NOT EXISTS idx_riesgo_stroke_territorio ON Riesgo_Stroke(territorio, probabilidad);
+CREATE TABLE IF NOT EXISTS Riesgo_Stroke_Estado (
+    job VARCHAR(50) PRIMARY KEY,
+    marca_agua INTEGER NOT NULL DEFAULT 0,
+    fecha_actualizacion DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Columnas de la consulta de origen que determinan el puntaje de una atención;
+# su hash se guarda en Riesgo_Stroke.hash_datos
+SOURCE_COLUMNS = (
+    'paciente_id', 'fecha_atencion', 'fecha_nacimiento', 'genero', 'estado_civil',
+    'territorio', 'municipio', 'zona',
+    'tension_arterial_sistolica', 'tension_arterial_diastolica', 'peso', 'talla', 'imc', 'glucometria',
+    'antecedentes_personales', 'antecedentes_familiares', 'ocupacion',
+)
+
+def resolve_db_path(explicit=None):
+    """Determina qué base de datos usar."""
+    candidates = [explicit, os.environ.get('DB_PATH'), DB_TMP, DB_SOURCE]
+    for candidate in candidates:
+        if candidate and Path(candidate).exists():
+            return Path(candidate)
+    raise FileNotFoundError(f"No se encontró la base de datos en {DB_SOURCE} ni en {DB_TMP}")
+
+def ensure_tables(conn):
+    conn.executescript(CREATE_TABLES_SQL)
+    # Riesgo_Stroke creada antes de hash_datos: sus filas se recalculan una vez
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(Riesgo_Stroke)")}
+    if 'hash_datos' not in columns:
+        with conn:
+            conn.execute("ALTER TABLE Riesgo_Stroke ADD COLUMN hash_datos VARCHAR(40)")
+
+def source_hash(row):
+    """Hash de los datos de origen de una atención (SOURCE_COLUMNS)."""
+    payload = json.dumps([row[column] for column in SOURCE_COLUMNS], ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def get_watermark(conn):
+    row = conn.execute(
+        "SELECT marca_agua FROM Riesgo_Stroke_Estado WHERE job = ?", (JOB_NAME,)
+    ).fetchone()
+    return row[0] if row else 0
+
+def set_watermark(conn, value):
+    conn.execute(
+        """INSERT INTO Riesgo_Stroke_Estado (job, marca_agua, fecha_actualizacion)
+           VALUES (?, ?, CURRENT_TIMESTAMP)
+           ON CONFLICT(job) DO UPDATE SET marca_agua = excluded.marca_agua,
+                                          fecha_actualizacion = excluded.fecha_actualizacion""",
+        (JOB_NAME, value)
+    )
+
+def _has_table(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+def _source_query(conn):
+    """
+    Consulta paginada por atencion_id, con el hash guardado del último cálculo.
+    Caracterizacion_Paciente no existe en todas las copias de la base de datos;
+    si falta, la ocupación queda vacía.
+    """
+    if _has_table(conn, 'Caracterizacion_Paciente'):
+        ocupacion_sql = """(SELECT c.ocupacion FROM Caracterizacion_Paciente c
+                             WHERE c.paciente_id = p.paciente_id
+                             ORDER BY c.fecha_caracterizacion DESC, c.caracterizacion_paciente_id DESC
+                             LIMIT 1)"""
+    else:
+        ocupacion_sql = "NULL"
+
+    return f"""
+        SELECT a.atencion_id, a.paciente_id, a.fecha_atencion, r.hash_datos AS hash_guardado,
+               p.fecha_nacimiento, p.genero, p.estado_civil,
+               f.territorio, f.municipio, f.zona,
+               h.tension_arterial_sistolica, h.tension_arterial_diastolica,
+               h.peso, h.talla, h.imc, h.glucometria,
+               h.antecedentes_personales, h.antecedentes_familiares,
+               {ocupacion_sql} AS ocupacion
+        FROM Atenciones_Clinicas a
+        JOIN HC_Medicina_General h ON h.atencion_id = a.atencion_id
+        JOIN Pacientes p ON p.paciente_id = a.paciente_id
+        LEFT JOIN Familias f ON f.familia_id = p.familia_id
+        LEFT JOIN Riesgo_Stroke r ON r.atencion_id = a.atencion_id
+        WHERE a.atencion_id > ?
+        ORDER BY a.atencion_id
+        LIMIT ?
+    """
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)[:10]).date()
+    except ValueError:
+        return None
+
+def age_at(birth_date, reference_date):
+    """Edad en años cumplidos a la fecha de referencia."""
+    if birth_date is None:
+        return None
+    reference_date = reference_date or date.today()
+    years = reference_date.year - birth_date.year
+    if (reference_date.month, reference_date.day) < (birth_date.month, birth_date.day):
+        years -= 1
+    return years
+
+def _antecedentes(value):
+    """antecedentes_personales se guarda como JSON ({"patologicos": ...}) o texto."""
+    if not value:
+        return None
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return value
+    return parsed if isinstance(parsed, (dict, str)) else value
+
+def row_to_patient_data(row):
+    """Convierte una fila de la consulta al payload que recibe mapToStrokeFeatures."""
+    fecha_atencion = _parse_date(row['fecha_atencion'])
+    territorio = ' '.join(part for part in (row['zona'], row['territorio']) if part)
+    return {
+        'age': age_at(_parse_date(row['fecha_nacimiento']), fecha_atencion),
+        'gender': row['genero'],
+        'estadoCivil': row['estado_civil'],
+        'tensionSistolica': row['tension_arterial_sistolica'],
+        'tensionDiastolica': row['tension_arterial_diastolica'],
+        'peso': row['peso'],
+        'talla': row['talla'],
+        'imc': row['imc'],
+        'glucometria': row['glucometria'],
+        'antecedentesPersonales': _antecedentes(row['antecedentes_personales']),
+        'antecedentesFamiliares': row['antecedentes_familiares'],
+        'territorio': territorio,
+        'ocupacion': row['ocupacion'],
+    }
+
+def run_backfill(db_path, chunk_size=500, full=False, log=None, workers=1):
+    """
+    Puntúa las atenciones nuevas o con datos de origen cambiados, por bloques.
+
+    Args:
+        db_path: ruta de la base SQLite
+        chunk_size: atenciones por bloque (una llamada al modelo y un commit por bloque);
+            con varios workers se sube a lo que el pool necesita para repartir
+        full: recorrer desde el inicio y recalcular todo aunque el hash no cambie
+        workers: procesos para puntuar cada bloque (0 = uno por núcleo, ver stroke_pool.py)
+
+    Returns:
+        dict con el resumen de la ejecución
+    """
+    log = log or (lambda message: None)
+    model = predict_stroke.get_model()
+    engine = 'numpy' if type(model).__name__ == 'TreeEnsemble' else 'sklearn'
+    pool = predict_stroke.open_scoring_pool(model, workers)
+    scoring_model = pool if pool is not None else model
+    if pool is not None:
+        effective = pool.effective_chunk_size(chunk_size)
+        if effective != chunk_size:
+            log(f"Bloques de {chunk_size} atenciones no se reparten entre {pool.workers} procesos; "
+                f"se usan bloques de {effective}")
+        chunk_size = effective
+        log(f"Puntuando con {pool.workers} procesos, bloques de {chunk_size} atenciones")
+
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    started = time.perf_counter()
+    scanned = 0
+    scored = 0
+    skipped = 0
+    try:
+        ensure_tables(conn)
+        if full:
+            with conn:
+                set_watermark(conn, 0)
+        start_watermark = get_watermark(conn)
+        if start_watermark:
+            log(f"Retomando el recorrido interrumpido desde atencion_id > {start_watermark}")
+
+        def score_and_save(rows, watermark):
+            """Puntúa un bloque y lo guarda junto con la marca de agua (checkpoint)."""
+            nonlocal scored, skipped
+            if rows:
+                patients = [row_to_patient_data(row) for row, _ in rows]
+                results = predict_stroke.predict_patients_batch(
+                    patients, model=scoring_model, use_cache=False, with_population=False)
+            else:
+                results = []
+            with conn:
+                conn.executemany(
+                    """INSERT OR REPLACE INTO Riesgo_Stroke
+                       (atencion_id, paciente_id, fecha_atencion, territorio, municipio, zona,
+                        probabilidad, nivel_riesgo, prediccion, features, modelo, hash_datos, fecha_calculo)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
+                    [
+                        (row['atencion_id'], row['paciente_id'], row['fecha_atencion'],
+                         row['territorio'], row['municipio'], row['zona'],
+                         result['probability'], result['risk_level'], result['prediction'],
+                         json.dumps(result['features']), engine, data_hash)
+                        for (row, data_hash), result in zip(rows, results)
+                        if result['success']
+                    ]
+                )
+                set_watermark(conn, watermark)
+            chunk_skipped = sum(1 for result in results if not result['success'])
+            scored += len(rows) - chunk_skipped
+            skipped += chunk_skipped
+            if rows:
+                log(f"Bloque confirmado: {len(rows)} atenciones, marca de agua {watermark}")
+
+        query = _source_query(conn)
+        position = start_watermark
+        pending = []
+        while True:
+            page = conn.execute(query, (position, chunk_size)).fetchall()
+            if not page:
+                break
+            scanned += len(page)
+            position = page[-1]['atencion_id']
+            for row in page:
+                data_hash = source_hash(row)
+                if full or data_hash != row['hash_guardado']:
+                    pending.append((row, data_hash))
+            # Las atenciones sin cambios hasta `position` no requieren puntaje
+            while len(pending) >= chunk_size:
+                block, pending = pending[:chunk_size], pending[chunk_size:]
+                score_and_save(block, position if not pending else block[-1][0]['atencion_id'])
+            if not pending:
+                with conn:
+                    set_watermark(conn, position)
+        # Recorrido completo: la próxima ejecución empieza de nuevo para ver las ediciones
+        score_and_save(pending, 0)
+        pool_report = pool.report() if pool is not None else None
+    finally:
+        if pool is not None:
+            pool.close()
+        conn.close()
+
+    summary = {
+        'success': True,
+        'db_path': str(db_path),
+        'engine': engine,
+        'scanned': scanned,
+        'scored': scored,
+        # Atenciones sin edad calculable (sin fecha de nacimiento), igual que en la app
+        'skipped': skipped,
+        'unchanged': scanned - scored - skipped,
+        'resumed_from': start_watermark,
+        'elapsed_seconds': round(time.perf_counter() - started, 3),
+    }
+    if pool_report is not None:
+        summary['pool'] = dict(pool_report, chunk_size=chunk_size)
+
+    # Intercalar las probabilidades nuevas en el índice de percentiles
+    try:
+        summary['population_index'] = stroke_population.build_index(db_path)
+    except Exception as e:
+        log(f"No se pudo actualizar el índice poblacional: {e}")
+    return summary
+
+def high_risk_ranking(db_path, group_by='territorio', limit=20, min_level=None):
+    """
+    Ranking por territorio (o municipio) de los pacientes con mayor riesgo,
+    usando la atención más reciente puntuada de cada paciente.
+
+    Returns:
+        dict {grupo: [ {paciente_id, atencion_id, probabilidad, nivel_riesgo}, ... ]}
+    """
+    if group_by not in ('territorio', 'municipio'):
+        raise ValueError("group_by debe ser 'territorio' o 'municipio'")
+
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    try:
+        level_filter = ''
+        if min_level == 'high':
+            level_filter = "AND r.nivel_riesgo = 'high'"
+        elif min_level == 'medium':
+            level_filter = "AND r.nivel_riesgo IN ('medium', 'high')"
+
+        rows = conn.execute(f"""
+            SELECT grupo, paciente_id, atencion_id, probabilidad, nivel_riesgo, fecha_atencion
+            FROM (
+                SELECT COALESCE(NULLIF(r.{group_by}, ''), 'Sin {group_by}') AS grupo,
+                       r.paciente_id, r.atencion_id, r.probabilidad, r.nivel_riesgo, r.fecha_atencion,
+                       ROW_NUMBER() OVER (PARTITION BY r.paciente_id
+                                          ORDER BY r.fecha_atencion DESC, r.atencion_id DESC) AS reciente
+                FROM Riesgo_Stroke r
+                WHERE 1 = 1 {level_filter}
+            )
+            WHERE reciente = 1
+            ORDER BY grupo, probabilidad DESC
+        """).fetchall()
+    finally:
+        conn.close()
+
+    ranking = {}
+    for row in rows:
+        group = ranking.setdefault(row['grupo'], [])
+        if len(group) < limit:
+            group.append({
+                'paciente_id': row['paciente_id'],
+                'atencion_id': row['atencion_id'],
+                'fecha_atencion': row['fecha_atencion'],
+                'probabilidad': row['probabilidad'],
+                'nivel_riesgo': row['nivel_riesgo'],
+            })
+    return ranking
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Cálculo masivo de riesgo de stroke")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Puntuar atenciones nuevas")
+    run_parser.add_argument("--db", help="Ruta de la base SQLite")
+    run_parser.add_argument("--chunk-size", type=int, default=500, help="Atenciones por bloque")
+    run_parser.add_argument("--full", action="store_true", help="Recalcular todas las atenciones aunque sus datos no cambien")
+    run_parser.add_argument("--workers", type=int, nargs="?", const=0, default=1,
+                            help="Procesos para puntuar; sin valor, uno por núcleo (por defecto 1)")
+
+    ranking_parser = subparsers.add_parser("ranking", help="Listado de mayor riesgo por territorio")
+    ranking_parser.add_argument("--db", help="Ruta de la base SQLite")
+    ranking_parser.add_argument("--group-by", choices=["territorio", "municipio"], default="territorio")
+    ranking_parser.add_argument("--limit", type=int, default=20, help="Pacientes por grupo")
+    ranking_parser.add_argument("--min-level", choices=["medium", "high"], help="Nivel de riesgo mínimo")
+
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(f"[StrokeBackfill] {message}", file=sys.stderr, flush=True)
+
+    try:
+        db_path = resolve_db_path(args.db)
+        if args.command == "run":
+            result = run_backfill(db_path, chunk_size=args.chunk_size, full=args.full, log=log,
+                                  workers=args.workers)
+        else:
+            result = {
+                'success': True,
+                'ranking': high_risk_ranking(db_path, args.group_by, args.limit, args.min_level),
+            }
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result['success'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
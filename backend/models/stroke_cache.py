@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Caché de predicciones de stroke direccionada por contenido.
+
+La clave es el SHA-256 del vector de features ordenado (float64) junto con el
+SHA-256 del archivo del modelo, así que un cambio de modelo invalida el caché
+automáticamente. Hay dos niveles:
+
+- LRU en memoria con tamaño máximo.
+- (Opcional) tabla SQLite que sobrevive a reinicios del proceso.
+
+Los contadores de aciertos y fallos se consultan con stats().
+"""
+
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+class PredictionCache:
+    """
+    Caché LRU de (probabilidad, predicción) por vector de features.
+
+    Args:
+        model_sha256: hash del modelo con el que se calcularon los resultados
+        max_entries: tamaño máximo del LRU en memoria (0 lo desactiva)
+        db_path: ruta de la base SQLite persistente (opcional)
+    """
+
+    def __init__(self, model_sha256, max_entries=4096, db_path=None):
+        self.model_sha256 = model_sha256
+        self.max_entries = max_entries
+        self.db_path = str(db_path) if db_path else None
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._prefix = model_sha256.encode('ascii')
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if self.db_path:
+            self._open_db()
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS Cache_Prediccion_Stroke (
+                    clave TEXT PRIMARY KEY,
+                    modelo_sha256 TEXT NOT NULL,
+                    probabilidad REAL NOT NULL,
+                    prediccion INTEGER NOT NULL,
+                    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Resultados de otro modelo ya no sirven
+            self._db.execute(
+                "DELETE FROM Cache_Prediccion_Stroke WHERE modelo_sha256 != ?",
+                (self.model_sha256,)
+            )
+
+    def key_for(self, vector):
+        """Clave de un vector de features (array float64 en el orden del modelo)."""
+        return hashlib.sha256(self._prefix + vector.tobytes()).hexdigest()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """
+        Busca varias claves.
+
+        Returns:
+            dict {clave: (probabilidad, predicción)} solo con las encontradas
+        """
+        found = {}
+        pending = []
+        with self._lock:
+            for key in keys:
+                value = self._memory.get(key)
+                if value is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = value
+                    self.memory_hits += 1
+                else:
+                    pending.append(key)
+
+            if pending and self._db is not None:
+                unique_pending = list(dict.fromkeys(pending))
+                # Consultar en bloques para no exceder el límite de parámetros de SQLite
+                for start in range(0, len(unique_pending), 500):
+                    block = unique_pending[start:start + 500]
+                    placeholders = ','.join('?' * len(block))
+                    rows = self._db.execute(
+                        f"SELECT clave, probabilidad, prediccion FROM Cache_Prediccion_Stroke "
+                        f"WHERE clave IN ({placeholders})",
+                        block
+                    ).fetchall()
+                    for key, probability, prediction in rows:
+                        value = (probability, prediction)
+                        found[key] = value
+                        if self.max_entries > 0:
+                            self._remember(key, value)
+                disk_found = sum(1 for key in pending if key in found)
+                self.disk_hits += disk_found
+                self.misses += len(pending) - disk_found
+            else:
+                self.misses += len(pending)
+        return found
+
+    def put_many(self, items):
+        """Guarda [(clave, probabilidad, predicción), ...] en ambos niveles."""
+        with self._lock:
+            if self.max_entries > 0:
+                for key, probability, prediction in items:
+                    self._remember(key, (probability, prediction))
+            if self._db is not None and items:
+                with self._db:
+                    self._db.executemany(
+                        """INSERT OR REPLACE INTO Cache_Prediccion_Stroke
+                           (clave, modelo_sha256, probabilidad, prediccion)
+                           VALUES (?, ?, ?, ?)""",
+                        [(key, self.model_sha256, probability, prediction)
+                         for key, probability, prediction in items]
+                    )
+
+    def stats(self):
+        """Contadores de uso del caché."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'max_entries': self.max_entries,
+                'persistent': self.db_path,
+                'model_sha256': self.model_sha256,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
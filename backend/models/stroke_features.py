@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Mapeo de datos clínicos de la app a las 16 features del modelo de stroke.
+
+Port en Python de backend/services/dataMapper.js (mapToStrokeFeatures y
+validateStrokeData). Las reglas deben mantenerse idénticas a las de la
+versión en JavaScript; stroke_features_fixtures.json contiene casos con la
+salida esperada de dataMapper.js y se verifica desde ambos lados:
+
+  python stroke_features.py verificar
+  node verificar_stroke_features.js   (desde backend/)
+
+Además de la versión por paciente (map_to_stroke_features), el módulo
+ofrece una versión por columnas (map_columns_to_stroke_features) que aplica
+las mismas reglas sobre arrays completos con NumPy.
+"""
+
+import re
+import sys
+import json
+from pathlib import Path
+
+import numpy as np
+
+# Reconoce el prefijo numérico que aceptaría parseFloat() de JavaScript
+_FLOAT_PREFIX = re.compile(r'^[+-]?(?:\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)')
+
+HEART_DISEASE_TERMS = (
+    'cardiac', 'corazón', 'corazon', 'cardiovascular', 'infarto',
+    'arritmia', 'cardiopatía', 'cardiopatia'
+)
+
+HYPERTENSION_TERMS = ('hipertens', 'hta', 'presión alta')
+
+MARRIED_TERMS = ('casado', 'casada', 'married')
+
+CHILDREN_TERMS = ('estudiante', 'niño', 'menor', 'escolar', 'infante')
+
+NEVER_WORKED_TERMS = ('nunca', 'desempleado', 'sin trabajo', 'no trabaja')
+
+GOVERNMENT_TERMS = (
+    'gobierno', 'gubernamental', 'público', 'publico', 'estatal', 'funcionario',
+    'servidor público', 'militar', 'policía', 'policia', 'docente público',
+    'profesor público', 'maestro público', 'salud pública', 'ministerio',
+    'alcaldía', 'alcaldia'
+)
+
+SELF_EMPLOYED_TERMS = (
+    'independiente', 'freelance', 'por cuenta propia', 'autónomo', 'autonomo',
+    'comerciante', 'empresario', 'taxista', 'vendedor ambulante'
+)
+
+RURAL_TERMS = ('rural', 'vereda', 'corregimiento', 'zona rural', 'campo')
+
+FORMERLY_SMOKED_TERMS = ('formerly', 'ex-fumador', 'dejó')
+
+SMOKES_TERMS = ('smokes', 'fuma', 'actual')
+
+FIXTURES_PATH = Path(__file__).parent / 'stroke_features_fixtures.json'
+
+def _truthy(value):
+    """Equivalente a la evaluación booleana de JavaScript para valores del payload."""
+    if value is None or value is False:
+        return False
+    if isinstance(value, (int, float)):
+        return value == value and value != 0  # NaN y 0 son falsy
+    if isinstance(value, str):
+        return value != ''
+    return True
+
+def parse_float(value):
+    """
+    Equivalente a parseFloat() de JavaScript: toma el prefijo numérico de un
+    texto. Retorna None donde JavaScript retornaría NaN.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value == value else None
+    if not isinstance(value, str):
+        return None
+    match = _FLOAT_PREFIX.match(value.strip())
+    return float(match.group(0)) if match else None
+
+def _contains_any(text, terms):
+    return any(term in text for term in terms)
+
+def _bmi(peso, talla, imc):
+    """IMC informado si es válido; si no, calculado desde peso y talla (m o cm)."""
+    if _truthy(imc) and imc not in ('0', '0.00'):
+        imc_num = parse_float(imc)
+        if imc_num is not None and imc_num > 0:
+            return imc_num
+
+    if _truthy(peso) and _truthy(talla):
+        peso_num = parse_float(peso)
+        talla_num = parse_float(talla)
+        # Talla puede estar en metros (1.70) o cm (170)
+        if talla_num is not None and talla_num > 3:
+            talla_num = talla_num / 100
+        if peso_num is not None and talla_num is not None and peso_num > 0 and talla_num > 0:
+            return peso_num / (talla_num * talla_num)
+    return None
+
+def _work_type(ocupacion):
+    """One-hot de tipo de trabajo (Government Job es la categoría base: todo en 0)."""
+    work = {
+        'work_type_Never_worked': 0,
+        'work_type_Private': 0,
+        'work_type_Self_employed': 0,
+        'work_type_children': 0,
+    }
+    if not _truthy(ocupacion):
+        work['work_type_Private'] = 1
+        return work
+
+    ocupacion_lower = str(ocupacion).lower()
+    if _contains_any(ocupacion_lower, CHILDREN_TERMS):
+        work['work_type_children'] = 1
+    elif (_contains_any(ocupacion_lower, NEVER_WORKED_TERMS) or
+          ('jubilado' in ocupacion_lower and 'trabaj' not in ocupacion_lower)):
+        work['work_type_Never_worked'] = 1
+    elif _contains_any(ocupacion_lower, GOVERNMENT_TERMS):
+        pass
+    elif _contains_any(ocupacion_lower, SELF_EMPLOYED_TERMS):
+        work['work_type_Self_employed'] = 1
+    else:
+        work['work_type_Private'] = 1
+    return work
+
+def map_to_stroke_features(patient_data):
+    """
+    Mapea datos del paciente de la app a features del modelo de stroke.
+
+    Args:
+        patient_data: dict con el mismo formato que recibe mapToStrokeFeatures
+            (age, gender, estadoCivil, tensionSistolica, peso, talla, imc,
+            glucometria, antecedentesPersonales, territorio, ocupacion,
+            smokingStatus, ...)
+
+    Returns:
+        dict con las 16 features del modelo
+    """
+    age = patient_data.get('age')
+    gender = patient_data.get('gender')
+    estado_civil = patient_data.get('estadoCivil')
+    tension_sistolica = patient_data.get('tensionSistolica')
+    tension_diastolica = patient_data.get('tensionDiastolica')
+    glucometria = patient_data.get('glucometria')
+    antecedentes_personales = patient_data.get('antecedentesPersonales')
+    territorio = patient_data.get('territorio') or ''
+    ocupacion = patient_data.get('ocupacion') or ''
+    smoking_status = patient_data.get('smokingStatus')
+
+    calculated_bmi = _bmi(patient_data.get('peso'), patient_data.get('talla'), patient_data.get('imc'))
+
+    # Mapear género
+    gender_male = 0
+    gender_other = 0
+    if _truthy(gender):
+        gender_lower = str(gender).lower()
+        if 'masculino' in gender_lower or 'male' in gender_lower or gender_lower == 'm':
+            gender_male = 1
+        elif 'otro' in gender_lower or 'other' in gender_lower:
+            gender_other = 1
+
+    # Antecedentes personales: texto libre o dict con 'patologicos'
+    if isinstance(antecedentes_personales, str):
+        antecedentes_text = antecedentes_personales
+    elif isinstance(antecedentes_personales, dict):
+        antecedentes_text = antecedentes_personales.get('patologicos') or ''
+    else:
+        antecedentes_text = ''
+    antecedentes_lower = str(antecedentes_text).lower()
+
+    # Hipertensión desde antecedentes o signos vitales (TA > 140/90)
+    hypertension = 0
+    if _contains_any(antecedentes_lower, HYPERTENSION_TERMS):
+        hypertension = 1
+    elif _truthy(tension_sistolica) and _truthy(tension_diastolica):
+        ta_sist = parse_float(tension_sistolica)
+        ta_diast = parse_float(tension_diastolica)
+        if (ta_sist is not None and ta_sist > 140) or (ta_diast is not None and ta_diast > 90):
+            hypertension = 1
+
+    heart_disease = 1 if _contains_any(antecedentes_lower, HEART_DISEASE_TERMS) else 0
+
+    ever_married_yes = 1 if (_truthy(estado_civil) and
+                             _contains_any(str(estado_civil).lower(), MARRIED_TERMS)) else 0
+
+    # Residencia: urbana salvo que el territorio indique zona rural
+    residence_urban = 1
+    if _truthy(territorio) and _contains_any(str(territorio).lower(), RURAL_TERMS):
+        residence_urban = 0
+
+    # Estado de tabaquismo
+    smoking_lower = str(smoking_status or 'never smoked').lower()
+    smoking = {
+        'smoking_status_formerly_smoked': 0,
+        'smoking_status_never_smoked': 0,
+        'smoking_status_smokes': 0,
+    }
+    if _contains_any(smoking_lower, FORMERLY_SMOKED_TERMS):
+        smoking['smoking_status_formerly_smoked'] = 1
+    elif _contains_any(smoking_lower, SMOKES_TERMS):
+        smoking['smoking_status_smokes'] = 1
+    else:
+        smoking['smoking_status_never_smoked'] = 1
+
+    # Valores numéricos con defaults clínicos
+    age_num = parse_float(age) if _truthy(age) else None
+    glucose_num = parse_float(glucometria) if _truthy(glucometria) else None
+
+    features = {
+        'age': age_num if age_num is not None and 0 < age_num < 150 else 50,
+        'hypertension': hypertension,
+        'heart_disease': heart_disease,
+        'avg_glucose_level': glucose_num if glucose_num is not None and 0 < glucose_num < 1000 else 100,
+        'bmi': calculated_bmi if calculated_bmi and 10 < calculated_bmi < 100 else 25,
+        'gender_Male': gender_male,
+        'gender_Other': gender_other,
+        'ever_married_Yes': ever_married_yes,
+    }
+    features.update(_work_type(ocupacion))
+    features['Residence_type_Urban'] = residence_urban
+    features.update(smoking)
+    return features
+
+def validate_stroke_data(patient_data):
+    """
+    Valida que los datos mínimos estén presentes para hacer una predicción.
+
+    Returns:
+        dict {'valid': bool, 'missingFields': [str]}
+    """
+    def is_zero(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and value == 0
+
+    missing = [field for field in ('age',)
+               if not _truthy(patient_data.get(field)) and not is_zero(patient_data.get(field))]
+    return {'valid': len(missing) == 0, 'missingFields': missing}
+
+# ---------------------------------------------------------------------------
+# Versión por columnas
+# ---------------------------------------------------------------------------
+
+_parse_float_elementwise = np.frompyfunc(lambda v: np.nan if (r := parse_float(v)) is None else r, 1, 1)
+_truthy_elementwise = np.frompyfunc(_truthy, 1, 1)
+
+def _antecedentes_text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return value.get('patologicos') or ''
+    return ''
+
+_antecedentes_elementwise = np.frompyfunc(_antecedentes_text, 1, 1)
+
+def _as_column(values, n_rows):
+    """Convierte una columna (lista, array o None) en un array de longitud n_rows."""
+    if values is None:
+        return np.full(n_rows, None, dtype=object)
+    if isinstance(values, np.ndarray):
+        column = values
+    else:
+        # Array de objetos para no convertir listas mixtas (0 y '95') a texto
+        column = np.empty(len(values), dtype=object)
+        column[:] = list(values)
+    if column.ndim != 1 or column.shape[0] != n_rows:
+        raise ValueError(f"Todas las columnas deben tener {n_rows} filas")
+    return column
+
+def _numeric_column(column):
+    """Columna a float64; lo que parseFloat() no reconoce queda como NaN."""
+    if column.dtype.kind in 'iuf':
+        return column.astype(np.float64)
+    if column.dtype.kind == 'b':
+        return np.full(column.shape, np.nan)
+    return _parse_float_elementwise(column.astype(object)).astype(np.float64)
+
+def _truthy_column(column):
+    """Máscara booleana con la evaluación de verdad de JavaScript."""
+    if column.dtype.kind in 'iuf':
+        values = column.astype(np.float64)
+        return ~np.isnan(values) & (values != 0)
+    if column.dtype.kind == 'U':
+        return column != ''
+    return _truthy_elementwise(column.astype(object)).astype(bool)
+
+def _text_column(column):
+    """Columna a texto en minúsculas; valores falsy quedan como ''."""
+    if column.dtype.kind != 'U':
+        truthy = _truthy_column(column)
+        column = np.where(truthy, column.astype(object), '').astype(str)
+    return np.char.lower(column)
+
+def _contains_any_column(text, terms):
+    found = np.zeros(text.shape, dtype=bool)
+    for term in terms:
+        found |= np.char.find(text, term) >= 0
+    return found
+
+def map_columns_to_stroke_features(columns, n_rows=None):
+    """
+    Versión vectorizada de map_to_stroke_features sobre columnas completas.
+
+    Args:
+        columns: dict {campo del payload: lista/array con un valor por paciente},
+            con los mismos nombres que map_to_stroke_features (age, gender,
+            peso, talla, imc, antecedentesPersonales, ...). Los campos
+            ausentes se tratan como vacíos.
+        n_rows: número de filas (se deduce de las columnas si no se indica)
+
+    Returns:
+        dict {feature: np.ndarray float64} con las 16 features del modelo
+    """
+    if n_rows is None:
+        lengths = {len(values) for values in columns.values() if values is not None}
+        if len(lengths) > 1:
+            raise ValueError("Todas las columnas deben tener la misma longitud")
+        n_rows = lengths.pop() if lengths else 0
+
+    def column(name):
+        return _as_column(columns.get(name), n_rows)
+
+    # IMC informado si es > 0; si no, calculado desde peso y talla (m o cm)
+    imc = _numeric_column(column('imc'))
+    peso = _numeric_column(column('peso'))
+    talla = _numeric_column(column('talla'))
+    talla = np.where(talla > 3, talla / 100, talla)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        computed_bmi = np.where((peso > 0) & (talla > 0), peso / (talla * talla), np.nan)
+    bmi = np.where(imc > 0, imc, computed_bmi)
+
+    gender = _text_column(column('gender'))
+    gender_male = (_contains_any_column(gender, ('masculino', 'male')) | (gender == 'm'))
+    gender_other = ~gender_male & _contains_any_column(gender, ('otro', 'other'))
+
+    antecedentes_raw = column('antecedentesPersonales')
+    if antecedentes_raw.dtype.kind != 'U':
+        antecedentes_raw = _antecedentes_elementwise(antecedentes_raw.astype(object)).astype(str)
+    antecedentes = np.char.lower(antecedentes_raw)
+
+    # Hipertensión desde antecedentes o signos vitales (TA > 140/90, ambos informados)
+    sistolica_raw = column('tensionSistolica')
+    diastolica_raw = column('tensionDiastolica')
+    sistolica = _numeric_column(sistolica_raw)
+    diastolica = _numeric_column(diastolica_raw)
+    vitals_present = _truthy_column(sistolica_raw) & _truthy_column(diastolica_raw)
+    hypertension = (_contains_any_column(antecedentes, HYPERTENSION_TERMS) |
+                    (vitals_present & ((sistolica > 140) | (diastolica > 90))))
+
+    heart_disease = _contains_any_column(antecedentes, HEART_DISEASE_TERMS)
+    ever_married = _contains_any_column(_text_column(column('estadoCivil')), MARRIED_TERMS)
+    residence_urban = ~_contains_any_column(_text_column(column('territorio')), RURAL_TERMS)
+
+    # Tipo de trabajo, con la misma precedencia que la versión por paciente
+    ocupacion = _text_column(column('ocupacion'))
+    has_ocupacion = ocupacion != ''
+    children = has_ocupacion & _contains_any_column(ocupacion, CHILDREN_TERMS)
+    never_worked = has_ocupacion & ~children & (
+        _contains_any_column(ocupacion, NEVER_WORKED_TERMS) |
+        (_contains_any_column(ocupacion, ('jubilado',)) & ~_contains_any_column(ocupacion, ('trabaj',)))
+    )
+    government = (has_ocupacion & ~children & ~never_worked &
+                  _contains_any_column(ocupacion, GOVERNMENT_TERMS))
+    self_employed = (has_ocupacion & ~children & ~never_worked & ~government &
+                     _contains_any_column(ocupacion, SELF_EMPLOYED_TERMS))
+    private = ~(children | never_worked | government | self_employed)
+
+    smoking = _text_column(column('smokingStatus'))
+    formerly_smoked = _contains_any_column(smoking, FORMERLY_SMOKED_TERMS)
+    smokes = ~formerly_smoked & _contains_any_column(smoking, SMOKES_TERMS)
+    never_smoked = ~(formerly_smoked | smokes)
+
+    age = _numeric_column(column('age'))
+    glucose = _numeric_column(column('glucometria'))
+
+    features = {
+        'age': np.where((age > 0) & (age < 150), age, 50.0),
+        'hypertension': hypertension,
+        'heart_disease': heart_disease,
+        'avg_glucose_level': np.where((glucose > 0) & (glucose < 1000), glucose, 100.0),
+        'bmi': np.where((bmi > 10) & (bmi < 100), bmi, 25.0),
+        'gender_Male': gender_male,
+        'gender_Other': gender_other,
+        'ever_married_Yes': ever_married,
+        'work_type_Never_worked': never_worked,
+        'work_type_Private': private,
+        'work_type_Self_employed': self_employed,
+        'work_type_children': children,
+        'Residence_type_Urban': residence_urban,
+        'smoking_status_formerly_smoked': formerly_smoked,
+        'smoking_status_never_smoked': never_smoked,
+        'smoking_status_smokes': smokes,
+    }
+    return {name: np.asarray(values, dtype=np.float64) for name, values in features.items()}
+
+def records_to_columns(records):
+    """Convierte una lista de payloads (dicts) en un dict de columnas."""
+    keys = set()
+    for record in records:
+        keys.update(record.keys())
+    return {key: [record.get(key) for record in records] for key in keys}
+
+def stroke_feature_matrix(columns, feature_order, n_rows=None):
+    """Matriz contigua (n, len(feature_order)) lista para el modelo."""
+    features = map_columns_to_stroke_features(columns, n_rows)
+    if not features['age'].shape[0]:
+        return np.empty((0, len(feature_order)))
+    return np.ascontiguousarray(np.column_stack([features[name] for name in feature_order]))
+
+def verify_fixtures(path=FIXTURES_PATH):
+    """
+    Compara ambas versiones (por paciente y por columnas) contra la salida
+    esperada de dataMapper.js guardada en el archivo de fixtures.
+
+    Returns:
+        dict con el total de casos y la lista de diferencias
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        cases = json.load(f)['cases']
+
+    mismatches = []
+    columns = map_columns_to_stroke_features(records_to_columns([case['input'] for case in cases]),
+                                             n_rows=len(cases))
+    for i, case in enumerate(cases):
+        expected = case['expected']
+        row_result = map_to_stroke_features(case['input'])
+        for name, value in expected.items():
+            for version, actual in (('paciente', row_result[name]), ('columnas', columns[name][i])):
+                if abs(float(actual) - float(value)) > 1e-9:
+                    mismatches.append({
+                        'caso': case.get('name', i), 'version': version,
+                        'feature': name, 'esperado': value, 'obtenido': float(actual)
+                    })
+    return {'success': not mismatches, 'cases': len(cases), 'mismatches': mismatches}
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'verificar':
+        result = verify_fixtures(sys.argv[2] if len(sys.argv) > 2 else FIXTURES_PATH)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(0 if result['success'] else 1)
+    print("Uso: python stroke_features.py verificar [fixtures.json]", file=sys.stderr)
+    sys.exit(1)
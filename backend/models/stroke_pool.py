@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Puntuación en varios procesos con el modelo compartido por copy-on-write.
+
+El modelo se carga una sola vez en el proceso padre y los workers se crean
+después con fork, así que heredan sus arrays de árboles sin volver a leer ni
+deserializar el .pkl: las páginas se comparten hasta que alguien las escribe.
+Antes del fork se congela el recolector de basura (gc.freeze) para que los
+workers no toquen los encabezados de los objetos heredados y fuercen copias.
+
+ForkedScoringPool expone predict_proba/predict/classes_, de modo que
+predict_stroke.py lo usa en lugar del modelo: cada llamada se divide en
+bloques de filas que se evalúan en paralelo y se unen en el orden original.
+
+Solo disponible donde existe fork (Linux, macOS); en Windows run_batch y el
+backfill siguen en un solo proceso.
+"""
+
+import gc
+import os
+import time
+import multiprocessing
+
+import numpy as np
+
+# Modelo heredado por los workers (se asigna en el padre antes del fork)
+_worker_model = None
+
+# Campos de /proc/<pid>/smaps_rollup incluidos en el reporte de memoria
+_MEMORY_FIELDS = {
+    'Rss': 'rss_mb',
+    'Pss': 'pss_mb',
+    'Shared_Clean': 'shared_clean_mb',
+    'Shared_Dirty': 'shared_dirty_mb',
+    'Private_Clean': 'private_clean_mb',
+    'Private_Dirty': 'private_dirty_mb',
+}
+
+def fork_available():
+    """True si la plataforma permite crear procesos con fork."""
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+def process_memory(pid):
+    """
+    Memoria de un proceso en MB según /proc/<pid>/smaps_rollup (Linux).
+    Private_Dirty es lo que el proceso ya no comparte con el padre.
+
+    Returns:
+        dict con los campos de _MEMORY_FIELDS, o None si no está disponible
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    memory = {}
+    for line in lines:
+        name, _, rest = line.partition(':')
+        if name in _MEMORY_FIELDS:
+            memory[_MEMORY_FIELDS[name]] = round(int(rest.split()[0]) / 1024.0, 2)
+    return memory
+
+def _score_chunk(chunk):
+    return np.asarray(_worker_model.predict_proba(chunk))
+
+class ForkedScoringPool:
+    """
+    Pool de procesos que evalúa el modelo por bloques.
+
+    Args:
+        model: modelo ya cargado en el padre (scikit-learn o TreeEnsemble)
+        workers: número de procesos (por defecto, uno por núcleo)
+        min_chunk_rows: por debajo de este tamaño no se reparte el trabajo
+            y se evalúa en el padre (el envío entre procesos costaría más)
+
+    Raises:
+        RuntimeError: si la plataforma no soporta fork
+    """
+
+    def __init__(self, model, workers=None, min_chunk_rows=1024):
+        global _worker_model
+        if not fork_available():
+            raise RuntimeError("El modo multiproceso requiere fork (no disponible en esta plataforma)")
+        self.model = model
+        self.workers = workers or os.cpu_count() or 1
+        self.min_chunk_rows = min_chunk_rows
+        if hasattr(model, 'classes_'):
+            self.classes_ = model.classes_
+        self.rows = 0
+        self.parallel_rows = 0
+        self.seconds = 0.0
+
+        _worker_model = model
+        gc.collect()
+        gc.freeze()
+        self._pool = multiprocessing.get_context('fork').Pool(self.workers)
+
+    @property
+    def min_parallel_rows(self):
+        """Filas mínimas de una llamada para repartirla entre los workers."""
+        return 2 * self.min_chunk_rows
+
+    def effective_chunk_size(self, chunk_size):
+        """
+        Tamaño de bloque para quien llama por bloques (run_batch, backfill):
+        con bloques menores a workers * min_chunk_rows todo se evaluaría en el
+        padre, o en menos workers de los pedidos.
+        """
+        if self.workers == 1:
+            return chunk_size
+        return max(chunk_size, self.workers * self.min_chunk_rows)
+
+    def _chunks(self, X):
+        """Divide X en bloques contiguos, varios por worker para repartir la carga."""
+        n_rows = X.shape[0]
+        n_chunks = max(1, min(self.workers * 4, n_rows // self.min_chunk_rows))
+        bounds = np.linspace(0, n_rows, n_chunks + 1).astype(int)
+        return [X[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+    def predict_proba(self, X):
+        """Probabilidades por clase; las filas salen en el mismo orden que X."""
+        X = np.ascontiguousarray(X)
+        started = time.perf_counter()
+        if self.workers == 1 or X.shape[0] < 2 * self.min_chunk_rows:
+            proba = np.asarray(self.model.predict_proba(X))
+        else:
+            # imap conserva el orden de los bloques
+            proba = np.vstack(list(self._pool.imap(_score_chunk, self._chunks(X))))
+            self.parallel_rows += X.shape[0]
+        self.seconds += time.perf_counter() - started
+        self.rows += X.shape[0]
+        return proba
+
+    def predict(self, X):
+        """Clase predicha por fila (argmax de predict_proba)."""
+        return np.asarray(self.classes_)[self.predict_proba(X).argmax(axis=1)]
+
+    def report(self):
+        """Throughput acumulado y memoria del padre y de cada worker."""
+        workers = [
+            dict(process_memory(child.pid) or {}, pid=child.pid)
+            for child in multiprocessing.active_children()
+        ]
+        return {
+            'workers': self.workers,
+            'rows': self.rows,
+            # Filas evaluadas en los workers (el resto, en el padre)
+            'parallel_rows': self.parallel_rows,
+            'scoring_seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows / self.seconds, 1) if self.seconds else 0.0,
+            'memory': {
+                'parent': process_memory(os.getpid()),
+                'workers': workers,
+            },
+        }
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+        gc.unfreeze()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Índice poblacional de riesgo de stroke para reportar percentiles.
+
+A partir de las probabilidades ya guardadas en Riesgo_Stroke (ver
+stroke_backfill.py) construye arrays de NumPy ordenados: uno para toda la
+población, uno por franja de edad y uno por municipio. La población son
+pacientes, no atenciones: cada paciente cuenta una vez, con el puntaje de su
+atención más reciente (el mismo criterio que high_risk_ranking), para que
+quien tiene muchas consultas no pese más en el percentil. Ubicar una
+probabilidad nueva es una búsqueda binaria (np.searchsorted), O(log n) por
+petición, sin volver a leer la base.
+
+El índice se guarda en un .npz junto con la tabla de último puntaje por
+paciente y se actualiza de forma incremental: solo se leen las filas con
+atencion_id mayor que la marca del índice, reemplazan el puntaje de su
+paciente si son más recientes y se vuelven a ordenar los arrays. Si las filas
+ya indexadas cambiaron (por ejemplo tras `stroke_backfill.py run --full`) se
+reconstruye completo.
+
+Uso:
+  python stroke_population.py build [--db RUTA] [--index RUTA] [--full]
+  python stroke_population.py rank --probability 0.12 [--age 67] [--municipio NOMBRE]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import numpy as np
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+# Ruta del índice (se puede sobrescribir con STROKE_POPULATION_INDEX)
+INDEX_PATH = Path(os.environ.get('STROKE_POPULATION_INDEX') or SCRIPT_DIR / 'stroke_population_index.npz')
+
+# Versión del formato del .npz
+INDEX_FORMAT_VERSION = 2
+
+# Límites inferiores de las franjas de edad (años cumplidos)
+AGE_BAND_EDGES = (18, 40, 60, 75)
+AGE_BAND_LABELS = ('0-17', '18-39', '40-59', '60-74', '75+')
+
+# Grupos con menos pacientes no reportan percentil (no sería representativo)
+MIN_GROUP_SIZE = 20
+
+GROUP_KINDS = ('age_band', 'municipio')
+
+def age_bands(ages):
+    """Etiqueta de franja de edad para cada edad (vectorizado)."""
+    ages = np.asarray(ages, dtype=np.float64)
+    return np.asarray(AGE_BAND_LABELS)[np.digitize(ages, AGE_BAND_EDGES)]
+
+def normalize_municipio(value):
+    """Clave de municipio sin diferencias de mayúsculas ni espacios ('' si no hay)."""
+    if value is None:
+        return ''
+    return ' '.join(str(value).split()).lower()
+
+def _sorted_groups(probabilities, keys):
+    """{clave: array ordenado} agrupando con un solo lexsort (se omite la clave '')."""
+    if probabilities.size == 0:
+        return {}
+    unique_keys, inverse = np.unique(keys.astype(str), return_inverse=True)
+    order = np.lexsort((probabilities, inverse))
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(inverse, minlength=unique_keys.size))])
+    sorted_values = probabilities[order]
+    return {
+        key: sorted_values[bounds[i]:bounds[i + 1]]
+        for i, key in enumerate(unique_keys.tolist())
+        if key
+    }
+
+class PopulationIndex:
+    """
+    Distribución poblacional de probabilidades de stroke (un valor por paciente).
+
+    Attributes:
+        overall: array ordenado con la probabilidad de cada paciente
+        groups: {'age_band'|'municipio': {clave: array ordenado}}
+        patients: {paciente_id: (atencion_id, fecha_atencion, probabilidad, edad, municipio)}
+            con la atención más reciente de cada paciente
+        metadata: marca de agua (atencion_id), conteo y suma de control
+    """
+
+    def __init__(self, overall=None, groups=None, metadata=None, patients=None):
+        self.overall = np.asarray(overall if overall is not None else [], dtype=np.float64)
+        self.groups = groups or {kind: {} for kind in GROUP_KINDS}
+        self.patients = patients or {}
+        self.metadata = metadata or {
+            'format_version': INDEX_FORMAT_VERSION,
+            'watermark': 0,
+            'count': 0,
+            'checksum': 0.0,
+        }
+
+    def __len__(self):
+        return int(self.overall.size)
+
+    def update(self, rows):
+        """
+        Aplica puntajes nuevos: cada fila (paciente_id, atencion_id,
+        fecha_atencion, probabilidad, edad, municipio) reemplaza el puntaje de
+        su paciente si es de una atención más reciente. Luego reordena los arrays.
+
+        Returns:
+            cantidad de pacientes agregados o actualizados
+        """
+        changed = 0
+        for paciente_id, atencion_id, fecha, probability, age, municipio in rows:
+            current = self.patients.get(paciente_id)
+            if current is not None and (current[1] or '', current[0]) >= (fecha or '', atencion_id):
+                continue
+            self.patients[paciente_id] = (atencion_id, fecha, float(probability), float(age),
+                                          normalize_municipio(municipio))
+            changed += 1
+        if changed:
+            self._rebuild()
+        return changed
+
+    def _rebuild(self):
+        """Arrays ordenados (general y por grupo) desde la tabla de pacientes."""
+        entries = list(self.patients.values())
+        probabilities = np.asarray([entry[2] for entry in entries], dtype=np.float64)
+        ages = np.asarray([entry[3] for entry in entries], dtype=np.float64)
+        self.overall = np.sort(probabilities)
+        keys_by_kind = {
+            # Edad desconocida (negativa o NaN): solo cuenta en la distribución general
+            'age_band': np.where(ages >= 0, age_bands(np.nan_to_num(ages, nan=-1.0)), ''),
+            'municipio': np.asarray([entry[4] for entry in entries], dtype=object),
+        }
+        self.groups = {kind: _sorted_groups(probabilities, keys) for kind, keys in keys_by_kind.items()}
+
+    @staticmethod
+    def _percentiles(sorted_values, probabilities):
+        """Porcentaje de la población con probabilidad menor o igual (búsqueda binaria)."""
+        positions = np.searchsorted(sorted_values, probabilities, side='right')
+        return np.round(100.0 * positions / sorted_values.size, 1)
+
+    def rank(self, probabilities, ages=None, municipios=None):
+        """
+        Ubica cada probabilidad en la distribución poblacional.
+
+        Returns:
+            list con un dict por probabilidad: 'overall' y, si el grupo tiene al
+            menos MIN_GROUP_SIZE pacientes, 'age_band' y 'municipio'
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        n_rows = probabilities.size
+        rankings = [{} for _ in range(n_rows)]
+        if len(self) == 0:
+            return rankings
+
+        for ranking, percentile in zip(rankings, self._percentiles(self.overall, probabilities).tolist()):
+            ranking['overall'] = {'percentile': percentile, 'n': len(self)}
+
+        group_keys = {}
+        if ages is not None:
+            ages = np.asarray([np.nan if age is None else age for age in ages], dtype=np.float64)
+            bands = age_bands(np.nan_to_num(ages, nan=-1.0))
+            group_keys['age_band'] = [None if np.isnan(age) else band for age, band in zip(ages, bands.tolist())]
+        if municipios is not None:
+            group_keys['municipio'] = [normalize_municipio(m) or None for m in municipios]
+
+        for kind, keys in group_keys.items():
+            groups = self.groups.get(kind, {})
+            rows_by_key = {}
+            for row, key in enumerate(keys):
+                if key is not None and groups.get(key) is not None and groups[key].size >= MIN_GROUP_SIZE:
+                    rows_by_key.setdefault(key, []).append(row)
+            for key, rows in rows_by_key.items():
+                values = groups[key]
+                percentiles = self._percentiles(values, probabilities[rows])
+                for row, percentile in zip(rows, percentiles.tolist()):
+                    rankings[row][kind] = {'group': key, 'percentile': percentile, 'n': int(values.size)}
+        return rankings
+
+    def save(self, path):
+        """Guarda el índice en un .npz (escritura atómica)."""
+        arrays = {'overall': self.overall}
+        patient_ids = sorted(self.patients)
+        entries = [self.patients[paciente_id] for paciente_id in patient_ids]
+        arrays['patient_ids'] = np.asarray(patient_ids, dtype=np.int64)
+        arrays['patient_atencion_ids'] = np.asarray([entry[0] for entry in entries], dtype=np.int64)
+        arrays['patient_fechas'] = np.asarray([entry[1] or '' for entry in entries], dtype=str)
+        arrays['patient_probabilities'] = np.asarray([entry[2] for entry in entries], dtype=np.float64)
+        arrays['patient_ages'] = np.asarray([entry[3] for entry in entries], dtype=np.float64)
+        arrays['patient_municipios'] = np.asarray([entry[4] for entry in entries], dtype=str)
+        for kind in GROUP_KINDS:
+            groups = self.groups.get(kind, {})
+            keys = sorted(groups)
+            sizes = [groups[key].size for key in keys]
+            arrays[f'{kind}_keys'] = np.asarray(keys, dtype=str)
+            arrays[f'{kind}_offsets'] = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+            arrays[f'{kind}_values'] = (np.concatenate([groups[key] for key in keys])
+                                        if keys else np.empty(0, dtype=np.float64))
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, metadata=np.array(json.dumps(self.metadata)), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Carga un índice guardado con save()."""
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata.get('format_version') != INDEX_FORMAT_VERSION:
+                raise ValueError(f"Formato de índice no soportado: {metadata.get('format_version')}")
+            groups = {}
+            for kind in GROUP_KINDS:
+                keys = data[f'{kind}_keys'].tolist()
+                offsets = data[f'{kind}_offsets']
+                values = data[f'{kind}_values']
+                groups[kind] = {key: values[offsets[i]:offsets[i + 1]] for i, key in enumerate(keys)}
+            patients = {
+                paciente_id: (atencion_id, fecha or None, probability, age, municipio)
+                for paciente_id, atencion_id, fecha, probability, age, municipio in zip(
+                    data['patient_ids'].tolist(), data['patient_atencion_ids'].tolist(),
+                    data['patient_fechas'].tolist(), data['patient_probabilities'].tolist(),
+                    data['patient_ages'].tolist(), data['patient_municipios'].tolist())
+            }
+            return cls(data['overall'], groups, metadata, patients)
+
+def _read_scores(conn, after_atencion_id):
+    """
+    Atención más reciente de cada paciente entre las filas de Riesgo_Stroke
+    con atencion_id mayor que after_atencion_id.
+
+    Returns:
+        tuple (filas (paciente_id, atencion_id, fecha_atencion, probabilidad,
+        edad, municipio), filas leídas, mayor atencion_id leído)
+    """
+    read, last_atencion_id = conn.execute(
+        "SELECT COUNT(*), MAX(atencion_id) FROM Riesgo_Stroke WHERE atencion_id > ?",
+        (after_atencion_id,)
+    ).fetchone()
+    latest = conn.execute(
+        """SELECT paciente_id, atencion_id, fecha_atencion, probabilidad, municipio, features
+           FROM (
+               SELECT r.*, ROW_NUMBER() OVER (PARTITION BY r.paciente_id
+                                              ORDER BY r.fecha_atencion DESC, r.atencion_id DESC) AS reciente
+               FROM Riesgo_Stroke r
+               WHERE r.atencion_id > ?
+           )
+           WHERE reciente = 1""",
+        (after_atencion_id,)
+    ).fetchall()
+    rows = []
+    for paciente_id, atencion_id, fecha, probability, municipio, features in latest:
+        try:
+            age = float(json.loads(features or '{}').get('age'))
+        except (TypeError, ValueError):
+            age = -1.0
+        rows.append((paciente_id, atencion_id, fecha, probability, age, municipio))
+    return rows, int(read), last_atencion_id
+
+def _checksum(conn, up_to_atencion_id):
+    """Conteo y suma de probabilidades ya indexadas, para detectar cambios."""
+    count, total = conn.execute(
+        "SELECT COUNT(*), TOTAL(probabilidad) FROM Riesgo_Stroke WHERE atencion_id <= ?",
+        (up_to_atencion_id,)
+    ).fetchone()
+    return int(count), round(float(total), 6)
+
+def build_index(db_path, index_path=None, full=False):
+    """
+    Construye o actualiza el índice desde Riesgo_Stroke.
+
+    Returns:
+        dict con el resumen ('mode' es 'incremental' o 'full')
+    """
+    index_path = Path(index_path or INDEX_PATH)
+    started = time.perf_counter()
+    conn = sqlite3.connect(str(db_path))
+    try:
+        index = None
+        if not full and index_path.exists():
+            try:
+                index = PopulationIndex.load(index_path)
+            except Exception as e:
+                sys.stderr.write(f"Índice poblacional ilegible ({e}); se reconstruye\n")
+            if index is not None:
+                count, checksum = _checksum(conn, index.metadata['watermark'])
+                if count != index.metadata['count'] or checksum != index.metadata['checksum']:
+                    # Se recalcularon o borraron atenciones ya indexadas
+                    index = None
+        mode = 'incremental' if index is not None else 'full'
+        if index is None:
+            index = PopulationIndex()
+
+        rows, read, last_atencion_id = _read_scores(conn, index.metadata['watermark'])
+        changed = 0
+        if read:
+            changed = index.update(rows)
+            index.metadata['watermark'] = last_atencion_id
+            count, checksum = _checksum(conn, index.metadata['watermark'])
+            index.metadata['count'] = count
+            index.metadata['checksum'] = checksum
+        if read or mode == 'full':
+            index.metadata['built_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            index.save(index_path)
+    finally:
+        conn.close()
+
+    return {
+        'success': True,
+        'index_path': str(index_path),
+        'mode': mode,
+        'added': read,
+        'patients_updated': changed,
+        'size': len(index),
+        'groups': {kind: len(index.groups.get(kind, {})) for kind in GROUP_KINDS},
+        'watermark': index.metadata['watermark'],
+        'elapsed_seconds': round(time.perf_counter() - started, 3),
+    }
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Índice poblacional de riesgo de stroke")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Construir o actualizar el índice")
+    build_parser.add_argument("--db", help="Ruta de la base SQLite")
+    build_parser.add_argument("--index", help="Ruta del .npz del índice")
+    build_parser.add_argument("--full", action="store_true", help="Reconstruir desde cero")
+
+    rank_parser = subparsers.add_parser("rank", help="Percentil de una probabilidad")
+    rank_parser.add_argument("--index", help="Ruta del .npz del índice")
+    rank_parser.add_argument("--probability", type=float, required=True)
+    rank_parser.add_argument("--age", type=float)
+    rank_parser.add_argument("--municipio")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "build":
+            sys.path.insert(0, str(SCRIPT_DIR))
+            from stroke_backfill import resolve_db_path
+            result = build_index(resolve_db_path(args.db), args.index, full=args.full)
+        else:
+            index = PopulationIndex.load(args.index or INDEX_PATH)
+            ranking = index.rank(
+                [args.probability],
+                ages=[args.age] if args.age is not None else None,
+                municipios=[args.municipio] if args.municipio else None,
+            )[0]
+            result = {'success': True, 'population': ranking}
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result['success'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Servidor local de predicción de stroke con micro-lotes (asyncio, solo stdlib).
+
+Mantiene el modelo cargado y agrupa las peticiones que llegan dentro de una
+ventana corta (--max-wait-ms) en una sola llamada a predict_proba, hasta
+--max-batch filas por lote. Si la cola de espera (--max-queue, en filas) no
+tiene espacio para todas las filas de una petición, la petición completa se
+rechaza de inmediato (HTTP 503) en lugar de acumular latencia; un lote nunca
+se admite a medias.
+
+Interfaces:
+  HTTP (por defecto en 127.0.0.1:8765)
+    POST /predict   cuerpo igual al del modo worker de predict_stroke.py:
+                    {"features": {...}}, {"patient": {...}}, {"batch": [...]},
+                    {"patients": [...]}, {"whatif": {...}} o directamente el
+                    dict de features
+    GET  /health    estado del servidor
+    GET  /stats     métricas de lotes y del caché
+  Socket Unix (--socket RUTA)
+    Una petición JSON por línea; las respuestas salen en el mismo orden.
+
+Uso:
+  python stroke_server.py [--host 127.0.0.1] [--port 8765] [--socket RUTA]
+                          [--max-batch 64] [--max-wait-ms 5] [--max-queue 1024]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import predict_stroke
+
+# Tamaño máximo del cuerpo de una petición HTTP
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+HTTP_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    503: 'Service Unavailable',
+}
+
+class ServerBusy(Exception):
+    """La cola de peticiones está llena."""
+
+class MicroBatcher:
+    """
+    Cola de peticiones que se evalúan en lotes.
+
+    Cada petición entra como una unidad con todas sus filas (un {"batch": [...]}
+    no se reparte entre lotes ni se admite a medias) y la cola se mide en filas.
+
+    Args:
+        max_batch_size: filas máximas por llamada al modelo (una petición más
+            grande se evalúa sola, en una llamada)
+        max_wait_ms: tiempo máximo que la primera petición de un lote espera a otras
+        max_queue: filas en espera antes de empezar a rechazar
+    """
+
+    def __init__(self, max_batch_size=64, max_wait_ms=5.0, max_queue=1024):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.pending = deque()
+        self.pending_rows = 0
+        self._ready = asyncio.Event()
+        # Un solo hilo: el modelo se evalúa fuera del loop, sin lotes concurrentes
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stroke-batch')
+        self.batches = 0
+        self.rows = 0
+        self.rejected = 0
+        self.largest_batch = 0
+        self.scoring_seconds = 0.0
+
+    async def submit(self, kind, payload):
+        """
+        Encola una fila ('features' o 'patient') y espera su resultado.
+
+        Raises:
+            ServerBusy: si la cola está llena
+        """
+        return (await self.submit_many(kind, [payload]))[0]
+
+    async def submit_many(self, kind, payloads):
+        """
+        Encola todas las filas de una petición como una unidad: entran todas o
+        ninguna.
+
+        Returns:
+            list con un resultado por fila
+
+        Raises:
+            ServerBusy: si no hay espacio en la cola para todas las filas
+        """
+        payloads = list(payloads)
+        if not payloads:
+            return []
+        if self.pending_rows + len(payloads) > self.max_queue:
+            self.rejected += len(payloads)
+            raise ServerBusy()
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((kind, payloads, future))
+        self.pending_rows += len(payloads)
+        self._ready.set()
+        return await future
+
+    def _take(self):
+        entry = self.pending.popleft()
+        self.pending_rows -= len(entry[1])
+        return entry
+
+    async def run(self):
+        """Bucle principal: arma lotes y los evalúa."""
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self.pending:
+                self._ready.clear()
+                await self._ready.wait()
+            batch = [self._take()]
+            rows = len(batch[0][1])
+            deadline = loop.time() + self.max_wait
+            while rows < self.max_batch_size:
+                # Tomar lo que ya está en cola sin esperar, si cabe completo en el lote
+                if self.pending:
+                    if rows + len(self.pending[0][1]) > self.max_batch_size:
+                        break
+                    batch.append(self._take())
+                    rows += len(batch[-1][1])
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._ready.clear()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            started = time.perf_counter()
+            results = await loop.run_in_executor(self.executor, self._score, batch)
+            self.scoring_seconds += time.perf_counter() - started
+            self.batches += 1
+            self.rows += rows
+            self.largest_batch = max(self.largest_batch, rows)
+
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    @staticmethod
+    def _score(batch):
+        """
+        Evalúa un lote con una llamada por tipo de entrada (features o datos
+        clínicos) y reparte los resultados por petición.
+        """
+        results = [[None] * len(payloads) for _, payloads, _ in batch]
+        for kind, scorer in (('features', predict_stroke.predict_stroke_batch),
+                             ('patient', predict_stroke.predict_patients_batch)):
+            positions = [(i, j) for i, (item_kind, payloads, _) in enumerate(batch) if item_kind == kind
+                         for j in range(len(payloads))]
+            if not positions:
+                continue
+            try:
+                scored = scorer([batch[i][1][j] for i, j in positions])
+            except Exception as e:
+                scored = [{'success': False, 'error': str(e)}] * len(positions)
+            for (i, j), result in zip(positions, scored):
+                results[i][j] = result
+        return results
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'avg_batch_size': round(self.rows / self.batches, 2) if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'rejected': self.rejected,
+            'queue_depth': self.pending_rows,
+            'max_queue': self.max_queue,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'avg_scoring_ms': round(self.scoring_seconds * 1000.0 / self.batches, 3) if self.batches else 0.0,
+        }
+
+class StrokeServer:
+    """Traduce peticiones HTTP o NDJSON en envíos al MicroBatcher."""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self.started_at = time.time()
+
+    def stats(self):
+        cache = predict_stroke.get_prediction_cache()
+        return {
+            'success': True,
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'batcher': self.batcher.stats(),
+            'cache': cache.stats() if cache else None,
+        }
+
+    async def dispatch(self, payload):
+        """
+        Atiende una petición ya parseada.
+
+        Returns:
+            tuple (código HTTP, dict de respuesta)
+        """
+        if not isinstance(payload, dict):
+            return 400, {'success': False, 'error': 'Se esperaba un objeto JSON'}
+
+        request_id = payload.get('id')
+        status = 200
+        try:
+            if payload.get('cmd') == 'ping':
+                response = {'success': True, 'pong': True}
+            elif payload.get('cmd') == 'stats':
+                response = self.stats()
+            elif 'batch' in payload or 'patients' in payload:
+                kind, key = ('patient', 'patients') if 'patients' in payload else ('features', 'batch')
+                if not isinstance(payload[key], list):
+                    status, response = 400, {'success': False, 'error': f"El campo '{key}' debe ser una lista"}
+                elif len(payload[key]) > self.batcher.max_queue:
+                    # No cabría nunca: reintentar no sirve
+                    status, response = 413, {
+                        'success': False,
+                        'error': f"El lote tiene {len(payload[key])} filas; el máximo es {self.batcher.max_queue}",
+                    }
+                else:
+                    response = {'success': True, 'results': await self.batcher.submit_many(kind, payload[key])}
+            elif 'whatif' in payload:
+                # La grilla ya es un lote: se evalúa directo en el hilo del modelo
+                response = await asyncio.get_running_loop().run_in_executor(
+                    self.batcher.executor, predict_stroke.predict_whatif, payload['whatif'])
+            elif 'patient' in payload:
+                response = await self.batcher.submit('patient', payload['patient'])
+            else:
+                response = await self.batcher.submit('features', payload.get('features', payload))
+        except ServerBusy:
+            status, response = 503, {'success': False, 'error': 'Servidor ocupado, intente de nuevo'}
+
+        response = dict(response)
+        if request_id is not None:
+            response['id'] = request_id
+        return status, response
+
+    # --- HTTP ---------------------------------------------------------------
+
+    async def handle_http(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._write_http(writer, 400, {'success': False, 'error': 'Petición HTTP inválida'}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close') or \
+                             headers.get('connection', '').lower() == 'keep-alive'
+
+                try:
+                    length = int(headers.get('content-length') or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._write_http(writer, 400, {'success': False, 'error': 'Content-Length inválido'}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._write_http(writer, 413, {'success': False, 'error': 'Cuerpo demasiado grande'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, response = await self._route(method, target.split('?')[0], body)
+                await self._write_http(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        if path == '/health':
+            return 200, {'success': True, 'ready': True, 'model_path': str(predict_stroke.MODEL_PATH)}
+        if path == '/stats':
+            return 200, self.stats()
+        if path != '/predict':
+            return 404, {'success': False, 'error': f'Ruta no encontrada: {path}'}
+        if method != 'POST':
+            return 405, {'success': False, 'error': 'Use POST'}
+        try:
+            payload = json.loads(body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            return 400, {'success': False, 'error': f'Error parseando JSON: {str(e)}'}
+        return await self.dispatch(payload)
+
+    @staticmethod
+    async def _write_http(writer, status, response, keep_alive):
+        body = json.dumps(response, ensure_ascii=False).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode('latin-1')
+        writer.write(head + body)
+        await writer.drain()
+
+    # --- Socket Unix (NDJSON) -----------------------------------------------
+
+    @staticmethod
+    async def _reject(message):
+        return 400, {'success': False, 'error': message}
+
+    async def handle_ndjson(self, reader, writer):
+        # Cada línea se atiende en su propia tarea para que varias líneas de la
+        # misma conexión puedan caer en el mismo lote; se responden en orden.
+        pending = asyncio.Queue()
+
+        async def respond_in_order():
+            while True:
+                task = await pending.get()
+                if task is None:
+                    break
+                _, response = await task
+                writer.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+                await writer.drain()
+
+        writer_task = asyncio.create_task(respond_in_order())
+        try:
+            async for raw_line in reader:
+                line = raw_line.decode('utf-8').strip()
+                if not line:
+                    continue
+                try:
+                    request = self.dispatch(json.loads(line))
+                except json.JSONDecodeError as e:
+                    request = self._reject(f'Error parseando JSON: {str(e)}')
+                await pending.put(asyncio.create_task(request))
+        except ConnectionError:
+            pass
+        finally:
+            await pending.put(None)
+            try:
+                await writer_task
+            except ConnectionError:
+                pass
+            writer.close()
+
+async def serve(args):
+    predict_stroke.get_model()
+    predict_stroke.get_prediction_cache()
+    batcher = MicroBatcher(args.max_batch, args.max_wait_ms, args.max_queue)
+    server = StrokeServer(batcher)
+    batch_task = asyncio.create_task(batcher.run())
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        listener = await asyncio.start_unix_server(server.handle_ndjson, path=args.socket)
+        address = args.socket
+    else:
+        listener = await asyncio.start_server(server.handle_http, host=args.host, port=args.port)
+        address = f"http://{args.host}:{args.port}"
+
+    sys.stderr.write(json.dumps({
+        'success': True, 'ready': True, 'address': address,
+        'max_batch': args.max_batch, 'max_wait_ms': args.max_wait_ms, 'max_queue': args.max_queue,
+    }, ensure_ascii=False) + '\n')
+    sys.stderr.flush()
+
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        batch_task.cancel()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Servidor local de predicción de stroke con micro-lotes")
+    parser.add_argument("--host", default="127.0.0.1", help="Interfaz HTTP (por defecto 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Puerto HTTP (por defecto 8765)")
+    parser.add_argument("--socket", metavar="RUTA", help="Escuchar NDJSON en un socket Unix en lugar de HTTP")
+    parser.add_argument("--max-batch", type=int, default=64, help="Filas máximas por lote")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="Espera máxima para completar un lote, en milisegundos")
+    parser.add_argument("--max-queue", type=int, default=1024,
+                        help="Filas en cola antes de responder 503")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    import warnings
+    warnings.filterwarnings('ignore')
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        sys.stderr.write(json.dumps({'success': False, 'ready': False, 'error': str(e)}, ensure_ascii=False) + '\n')
+        sys.exit(1)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Motor de inferencia en NumPy puro para el modelo de stroke.
+
+Convierte una única vez `stroke_model.pkl` (árboles de scikit-learn) en un
+archivo `.npz` independiente de la versión de scikit-learn, con los arrays de
+nodos de todos los árboles (feature, threshold, hijos y valores de hoja), y lo
+evalúa vectorizado sobre un lote completo sin importar sklearn.
+
+Modelos soportados: DecisionTreeClassifier, RandomForestClassifier,
+ExtraTreesClassifier y GradientBoostingClassifier binario.
+
+Uso:
+  python stroke_tree_engine.py export [--model stroke_model.pkl] [--output stroke_model.npz]
+  python stroke_tree_engine.py verify [--model stroke_model.pkl] [--engine stroke_model.npz]
+"""
+
+import sys
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+
+MODELS_DIR = Path(__file__).parent
+
+# Versión del formato del artefacto .npz
+ENGINE_FORMAT_VERSION = 1
+
+# Filas por bloque al recorrer los árboles (limita la memoria de (árboles, filas))
+EVAL_CHUNK_ROWS = 8192
+
+def file_sha256(path):
+    """Calcula el SHA-256 de un archivo."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class TreeEnsemble:
+    """
+    Conjunto de árboles empaquetados en arrays planos.
+
+    Expone `predict_proba`, `predict` y `classes_` con la misma semántica que
+    el estimador de scikit-learn original, de modo que puede usarse en su lugar
+    en predict_stroke.py.
+    """
+
+    def __init__(self, arrays, metadata):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children_left = arrays['children_left']
+        self.children_right = arrays['children_right']
+        self.missing_go_to_left = arrays['missing_go_to_left']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.classes_ = arrays['classes']
+        self.metadata = metadata
+        self.kind = metadata['kind']
+        self.max_depth = int(metadata['max_depth'])
+        self.n_features_in_ = int(metadata['n_features'])
+        self.learning_rate = float(metadata.get('learning_rate', 1.0))
+        self.init_raw = float(metadata.get('init_raw', 0.0))
+
+    @classmethod
+    def load(cls, path):
+        """Carga un artefacto exportado con export_model()."""
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata.get('format_version') != ENGINE_FORMAT_VERSION:
+                raise ValueError(
+                    f"Formato de artefacto no soportado: {metadata.get('format_version')} "
+                    f"(se esperaba {ENGINE_FORMAT_VERSION})"
+                )
+            arrays = {name: data[name] for name in data.files if name != 'metadata'}
+        return cls(arrays, metadata)
+
+    def _leaf_indices(self, X):
+        """Recorre todos los árboles a la vez y retorna el nodo hoja (árboles, filas)."""
+        n_rows = X.shape[0]
+        rows = np.arange(n_rows)[None, :]
+        node = np.repeat(self.roots[:, None], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            left_child = self.children_left[node]
+            is_leaf = left_child == -1
+            if is_leaf.all():
+                break
+            x = X[rows, self.feature[node]]
+            go_left = x <= self.threshold[node]
+            nan_mask = np.isnan(x)
+            if nan_mask.any():
+                go_left = np.where(nan_mask, self.missing_go_to_left[node], go_left)
+            next_node = np.where(go_left, left_child, self.children_right[node])
+            node = np.where(is_leaf, node, next_node)
+        return node
+
+    def _predict_proba_chunk(self, X):
+        leaves = self._leaf_indices(X)
+        if self.kind == 'gradient_boosting':
+            raw = self.init_raw + self.learning_rate * self.value[leaves, 0].sum(axis=0)
+            positive = 1.0 / (1.0 + np.exp(-raw))
+            return np.column_stack([1.0 - positive, positive])
+        return self.value[leaves].mean(axis=0)
+
+    def predict_proba(self, X):
+        """Probabilidades por clase, forma (filas, clases)."""
+        # scikit-learn compara los umbrales contra X en float32
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Se esperaban {self.n_features_in_} features por fila, se recibió forma {X.shape}"
+            )
+        if X.shape[0] <= EVAL_CHUNK_ROWS:
+            return self._predict_proba_chunk(X)
+        return np.vstack([
+            self._predict_proba_chunk(X[start:start + EVAL_CHUNK_ROWS])
+            for start in range(0, X.shape[0], EVAL_CHUNK_ROWS)
+        ])
+
+    def predict(self, X):
+        """Clase predicha por fila (argmax de predict_proba)."""
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+def _unwrap_trees(model):
+    """
+    Identifica el tipo de modelo y retorna (kind, árboles, parámetros extra).
+    Solo usa atributos públicos de scikit-learn.
+    """
+    name = type(model).__name__
+    if name in ('DecisionTreeClassifier', 'ExtraTreeClassifier'):
+        return 'forest', [model], {}
+    if name in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+        return 'forest', list(model.estimators_), {}
+    if name == 'GradientBoostingClassifier':
+        if model.estimators_.shape[1] != 1:
+            raise ValueError("Solo se soporta GradientBoostingClassifier binario")
+        return 'gradient_boosting', list(model.estimators_[:, 0]), {
+            'learning_rate': float(model.learning_rate)
+        }
+    raise ValueError(f"Tipo de modelo no soportado por el motor NumPy: {name}")
+
+def export_model(model, output_path, source_path=None):
+    """
+    Exporta los árboles de un modelo scikit-learn a un archivo .npz.
+
+    Args:
+        model: estimador scikit-learn ya cargado
+        output_path: ruta del .npz a crear
+        source_path: ruta del .pkl original (se guarda su SHA-256 para detectar cambios)
+
+    Returns:
+        dict con la metadata guardada
+    """
+    kind, trees, extra = _unwrap_trees(model)
+
+    features, thresholds, lefts, rights, missing_left, values, roots = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in trees:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        is_leaf = left == -1
+
+        # Las hojas usan feature 0 para que el indexado vectorizado sea válido
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, left + offset))
+        rights.append(np.where(is_leaf, -1, right + offset))
+        mgl = getattr(tree, 'missing_go_to_left', None)
+        missing_left.append(
+            np.zeros(n_nodes, dtype=bool) if mgl is None else np.asarray(mgl, dtype=bool)
+        )
+
+        node_values = np.asarray(tree.value)[:, 0, :].astype(np.float64)
+        if kind == 'forest':
+            # Normalizar conteos a probabilidades (igual que predict_proba del árbol)
+            totals = node_values.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            node_values = node_values / totals
+        values.append(node_values)
+
+        roots.append(offset)
+        offset += n_nodes
+        max_depth = max(max_depth, int(tree.max_depth))
+
+    arrays = {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'children_left': np.concatenate(lefts),
+        'children_right': np.concatenate(rights),
+        'missing_go_to_left': np.concatenate(missing_left),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int64),
+        'classes': np.asarray(model.classes_),
+    }
+
+    metadata = {
+        'format_version': ENGINE_FORMAT_VERSION,
+        'kind': kind,
+        'estimator': type(model).__name__,
+        'n_trees': len(trees),
+        'n_nodes': int(offset),
+        'max_depth': max_depth,
+        'n_features': int(model.n_features_in_),
+        'source_sha256': file_sha256(source_path) if source_path else None,
+    }
+    metadata.update(extra)
+
+    if kind == 'gradient_boosting':
+        # El valor inicial (prior) se obtiene como la diferencia entre la
+        # función de decisión del modelo y la suma de los árboles exportados
+        probe = np.zeros((1, metadata['n_features']))
+        partial = TreeEnsemble(arrays, dict(metadata, init_raw=0.0))
+        trees_raw = partial.learning_rate * partial.value[partial._leaf_indices(probe.astype(np.float32)), 0].sum()
+        metadata['init_raw'] = float(np.ravel(model.decision_function(probe))[0] - trees_raw)
+
+    np.savez_compressed(output_path, metadata=np.array(json.dumps(metadata)), **arrays)
+    return metadata
+
+def synthetic_features(n_rows, seed=0):
+    """
+    Genera filas sintéticas dentro de los rangos documentados de las features
+    (edad 0-100, glucosa 50-300, BMI 10-60 y variables binarias 0/1).
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 2, size=(n_rows, 16)).astype(np.float64)
+    X[:, 0] = rng.uniform(0.08, 100, n_rows)
+    X[:, 3] = rng.uniform(50, 300, n_rows)
+    X[:, 4] = rng.uniform(10, 60, n_rows)
+    return X
+
+def verify_parity(model, engine, n_rows=5000, seed=0):
+    """
+    Compara las probabilidades del motor NumPy con las del modelo original.
+
+    Returns:
+        dict con la diferencia máxima absoluta y las filas con distinta predicción
+    """
+    X = synthetic_features(n_rows, seed)
+    expected = np.asarray(model.predict_proba(X))
+    actual = engine.predict_proba(X)
+    return {
+        'rows': n_rows,
+        'max_abs_diff': float(np.max(np.abs(expected - actual))),
+        'prediction_mismatches': int(np.sum(model.predict(X) != engine.predict(X))),
+    }
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Exportador y motor NumPy del modelo de stroke")
+    parser.add_argument("command", choices=["export", "verify"])
+    parser.add_argument("--model", default=None, help="Ruta del .pkl (por defecto la de predict_stroke.py)")
+    parser.add_argument("--output", "--engine", dest="engine", default=None,
+                        help="Ruta del .npz (por defecto junto al .pkl)")
+    parser.add_argument("--rows", type=int, default=5000, help="Filas sintéticas para la verificación")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="Diferencia máxima aceptada")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(MODELS_DIR))
+    import predict_stroke
+
+    model_path = Path(args.model) if args.model else predict_stroke.MODEL_PATH
+    engine_path = Path(args.engine) if args.engine else model_path.with_suffix('.npz')
+
+    try:
+        predict_stroke.MODEL_PATH = model_path
+        model = predict_stroke.load_model()
+
+        result = {'success': True, 'engine_path': str(engine_path)}
+        if args.command == 'export':
+            result['metadata'] = export_model(model, engine_path, source_path=model_path)
+
+        parity = verify_parity(model, TreeEnsemble.load(engine_path), n_rows=args.rows)
+        result['parity'] = parity
+        if parity['max_abs_diff'] > args.tolerance or parity['prediction_mismatches']:
+            result['success'] = False
+            result['error'] = 'Las probabilidades del motor NumPy no coinciden con el modelo original'
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result['success'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
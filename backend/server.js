@@ -50,6 +50,8 @@ app.use(express.json());
 // Servir archivos estáticos desde /public para poder exponer el mp3 si se desea
 app.use(express.static(path.join(__dirname, 'public')));
 const upload = multer({ dest: path.join(__dirname, 'uploads') });
+// Audio de STT en memoria: se reenvía al proveedor sin pasar por disco
+const audioUpload = multer({ storage: multer.memoryStorage(), limits: { fileSize: 50 * 1024 * 1024 } });
 
 // Conectar a SQLite (usa la ruta correcta de tu BD)
 // En Render, intentamos usar un volumen persistente si está disponible
@@ -3093,7 +3095,7 @@ app.post('/api/tts', async (req, res) => {
 
 // ==================== ENDPOINT STT ====================
 // Recibe un archivo de audio (multipart/form-data campo "audio") y devuelve la transcripción
-app.post('/api/stt', upload.single('audio'), async (req, res) => {
+app.post('/api/stt', audioUpload.single('audio'), async (req, res) => {
   try {
     const provider =
       (req.query.provider || req.body?.provider || process.env.STT_DEFAULT_PROVIDER || sttProviders.DEFAULT_PROVIDER).toLowerCase();
@@ -3110,21 +3112,15 @@ app.post('/api/stt', upload.single('audio'), async (req, res) => {
       return res.status(400).json({ error: 'Falta archivo de audio' });
     }
 
-    const inputFilePath = req.file.path;
-    const audioBuffer = fs.readFileSync(inputFilePath);
+    const audioBuffer = req.file.buffer;
     const contentType = (req.file.mimetype || 'audio/webm').split(';')[0];
 
-    let text = '';
-    try {
-      text = await sttProviders.transcribe({
-        provider,
-        audioBuffer,
-        contentType,
-        filename: req.file.originalname
-      });
-    } finally {
-    fs.unlink(inputFilePath, () => {});
-    }
+    const text = await sttProviders.transcribe({
+      provider,
+      audioBuffer,
+      contentType,
+      filename: req.file.originalname
+    });
 
     console.log('[STT] Transcripción exitosa con proveedor', provider);
     return res.json({ text, provider });
@@ -4073,10 +4069,10 @@ app.get('/api/fhir/metadata', async (req, res) => {
 
 // ==================== ENDPOINTS SCRAPER ADRES (manual) ====================
 
-// POST: Iniciar consulta vía scraper (modo interactivo: requiere captcha en consola)
-app.post('/api/adres-scraper/consultar', (req, res) => {
+// POST: Encolar consulta vía scraper (modo interactivo: requiere captcha en consola)
+app.post('/api/adres-scraper/consultar', async (req, res) => {
   try {
-    const { numero_documento, tipo_documento } = req.body || {};
+    const { numero_documento, tipo_documento, refrescar } = req.body || {};
     if (!numero_documento) {
       return res.status(400).json({
         success: false,
@@ -4085,14 +4081,19 @@ app.post('/api/adres-scraper/consultar', (req, res) => {
       });
     }
     const docType = (tipo_documento || 'CC');
-    const started = adresScraper.startInteractiveConsulta(docType, String(numero_documento), { headless: false });
+    // Cada consulta es un trabajo con su propio id: consultas simultáneas no se sobrescriben
+    const job = await adresScraper.submitJob(docType, String(numero_documento), {
+      headless: false,
+      // refrescar: true ignora el resultado en caché y abre el navegador
+      maxAgeSeconds: refrescar === true ? 0 : undefined
+    });
 
     return res.status(202).json({
       success: true,
       mode: 'manual',
-      message: 'Scraper iniciado. Ingrese el captcha en la consola del servidor. Luego consulte el resultado.',
-      pid: started.pid,
-      resultPath: started.resultPath
+      message: 'Consulta encolada. Ingrese el captcha en la consola del servidor. Luego consulte el resultado.',
+      job_id: job.jobId,
+      status_url: `/api/adres-scraper/trabajos/${job.jobId}`
     });
   } catch (error) {
     console.error('❌ [ADRES SCRAPER] Error iniciando scraper:', error);
@@ -4104,10 +4105,43 @@ app.post('/api/adres-scraper/consultar', (req, res) => {
   }
 });
 
-// GET: Obtener último resultado del scraper
-app.get('/api/adres-scraper/resultado', (req, res) => {
+// GET: Estado, duraciones por fase y resultado de un trabajo del scraper
+app.get('/api/adres-scraper/trabajos/:jobId', async (req, res) => {
+  try {
+    const job = await adresScraper.getJob(req.params.jobId);
+    if (!job) {
+      return res.status(404).json({ success: false, message: 'Trabajo no encontrado' });
+    }
+    return res.json({ success: true, job });
+  } catch (error) {
+    console.error('❌ [ADRES SCRAPER] Error consultando trabajo:', error);
+    return res.status(500).json({
+      success: false,
+      error: 'Error consultando trabajo',
+      message: error.message || 'Error desconocido'
+    });
+  }
+});
+
+// GET: Resultado de un trabajo (?job_id=) o el último resultado del scraper
+app.get('/api/adres-scraper/resultado', async (req, res) => {
   try {
-    const result = adresScraper.readLastResult();
+    const jobId = req.query.job_id;
+    if (jobId) {
+      const job = await adresScraper.getJob(jobId);
+      if (!job) {
+        return res.status(404).json({ success: false, message: 'Trabajo no encontrado' });
+      }
+      if (job.state === 'queued' || job.state === 'running') {
+        return res.status(202).json({ success: true, pending: true, state: job.state, position: job.position });
+      }
+      const result = job.result || { status: 'error', message: 'Error en el proceso', error: job.error };
+      return res.json({ success: true, result, job });
+    }
+
+    // Sin job_id: último trabajo terminado o, si no hay, el archivo del CLI
+    const latest = await adresScraper.getLatestJob().catch(() => null);
+    const result = (latest && latest.result) || adresScraper.readLastResult();
     if (!result) {
       return res.status(404).json({
         success: false,
@@ -3,7 +3,21 @@
 
 const path = require('path');
 const fs = require('fs');
-const { spawn } = require('child_process');
+const { spawn, execFile } = require('child_process');
+const sqlite3 = require('sqlite3');
+
+// Consultas simultáneas del worker de trabajos (cada una abre un navegador)
+const JOBS_CONCURRENCY = parseInt(process.env.ADRES_JOBS_CONCURRENCY || '1', 10);
+const JOBS_COMMAND_TIMEOUT = 15000;
+
+let jobWorker = null;
+let jobsDbPromise = null;
+
+// Al cerrar el backend se detiene el worker; sus trabajos en ejecución vuelven
+// a la cola cuando se lanza de nuevo
+process.on('exit', () => {
+  if (jobWorker) jobWorker.kill('SIGTERM');
+});
 
 function resolvePythonExecutable() {
   // Permite configurar explícitamente el ejecutable de Python
@@ -37,6 +51,10 @@ function startInteractiveConsulta(docType, docNumber, options = {}) {
   if (options.headless === true) {
     args.push('--headless');
   }
+  // Edad máxima aceptada del resultado en caché (0 = consultar ADRES de nuevo)
+  if (options.maxAgeSeconds !== undefined && options.maxAgeSeconds !== null) {
+    args.push('--max-age', String(options.maxAgeSeconds));
+  }
 
   console.log('[ADRES SCRAPER] Iniciando proceso:', pythonExe, args.join(' '));
   console.log('[ADRES SCRAPER] Directorio:', scraperDir);
@@ -66,6 +84,163 @@ function startInteractiveConsulta(docType, docNumber, options = {}) {
   };
 }
 
+function getJobsDbPath() {
+  // Igual que adres_jobs.py (que corre con cwd en la carpeta del scraper)
+  return path.resolve(getScraperDir(), process.env.ADRES_JOBS_DB || 'adres_jobs.db');
+}
+
+/**
+ * Conexión a la base de trabajos que escribe adres_jobs.py, para consultar el
+ * estado sin lanzar Python en cada sondeo. null si aún no hay trabajos.
+ * @returns {Promise<sqlite3.Database|null>}
+ */
+function openJobsDb() {
+  if (jobsDbPromise) return jobsDbPromise;
+  const dbPath = getJobsDbPath();
+  if (!fs.existsSync(dbPath)) return Promise.resolve(null);
+  jobsDbPromise = new Promise((resolve, reject) => {
+    const jobsDb = new sqlite3.Database(dbPath, sqlite3.OPEN_READWRITE, (err) => {
+      if (err) {
+        jobsDbPromise = null;
+        return reject(err);
+      }
+      jobsDb.configure('busyTimeout', 5000);
+      resolve(jobsDb);
+    });
+  });
+  return jobsDbPromise;
+}
+
+function queryJobsDb(sql, params) {
+  return openJobsDb().then((jobsDb) => {
+    if (!jobsDb) return null;
+    return new Promise((resolve, reject) => {
+      jobsDb.get(sql, params, (err, row) => (err ? reject(err) : resolve(row || null)));
+    });
+  });
+}
+
+function parseJson(text) {
+  return text ? JSON.parse(text) : null;
+}
+
+// Mismo formato que JobStore._to_dict de adres_jobs.py
+function jobFromRow(row) {
+  return {
+    id: row.id,
+    doc_type: row.tipo_documento,
+    doc_number: row.numero_documento,
+    options: parseJson(row.opciones) || {},
+    state: row.estado,
+    created_at: row.fecha_creacion,
+    started_at: row.fecha_inicio,
+    finished_at: row.fecha_fin,
+    durations: parseJson(row.duraciones),
+    result: parseJson(row.resultado),
+    error: row.error
+  };
+}
+
+/**
+ * Ejecuta un comando corto de adres_jobs.py (submit) y retorna su JSON
+ * @param {string[]} commandArgs - Argumentos después del script
+ * @returns {Promise<Object>}
+ */
+function runJobsCommand(commandArgs) {
+  const pythonExe = resolvePythonExecutable();
+  const jobsPath = path.join(getScraperDir(), 'adres_jobs.py');
+  return new Promise((resolve, reject) => {
+    execFile(
+      pythonExe,
+      [jobsPath, ...commandArgs],
+      { cwd: getScraperDir(), timeout: JOBS_COMMAND_TIMEOUT, encoding: 'utf8',
+        env: { ...process.env, PYTHONIOENCODING: 'utf-8' } },
+      (error, stdout, stderr) => {
+        try {
+          resolve(JSON.parse((stdout || '').trim()));
+        } catch (parseError) {
+          reject(new Error(`adres_jobs.py ${commandArgs[0]} falló: ${((error && error.message) || stderr || 'sin salida').substring(0, 300)}`));
+        }
+      }
+    );
+  });
+}
+
+/**
+ * Inicia el worker de trabajos si no está corriendo. Hereda la consola para
+ * que el captcha se pueda escribir en la terminal del servidor.
+ */
+function ensureJobWorker() {
+  if (jobWorker && jobWorker.exitCode === null && !jobWorker.killed) {
+    return jobWorker;
+  }
+  const pythonExe = resolvePythonExecutable();
+  const args = [path.join(getScraperDir(), 'adres_jobs.py'), 'worker', '--concurrency', String(JOBS_CONCURRENCY)];
+  console.log('[ADRES SCRAPER] Iniciando worker de trabajos:', pythonExe, args.join(' '));
+  jobWorker = spawn(pythonExe, args, {
+    cwd: getScraperDir(),
+    stdio: 'inherit',
+    windowsHide: false
+  });
+  jobWorker.on('error', (err) => {
+    console.error('[ADRES SCRAPER] Error al lanzar el worker de trabajos:', err);
+  });
+  const worker = jobWorker;
+  worker.on('exit', (code) => {
+    console.log(`[ADRES SCRAPER] Worker de trabajos finalizado con código ${code}`);
+    if (jobWorker === worker) jobWorker = null;
+  });
+  return jobWorker;
+}
+
+/**
+ * Encola una consulta como trabajo y asegura que el worker esté corriendo.
+ * @returns {Promise<{jobId: string, counts: Object}>}
+ */
+async function submitJob(docType, docNumber, options = {}) {
+  const args = ['submit', '--doc-type', String(docType), '--doc-number', String(docNumber)];
+  if (options.headless === true) {
+    args.push('--headless');
+  }
+  if (options.maxAgeSeconds !== undefined && options.maxAgeSeconds !== null) {
+    args.push('--max-age', String(options.maxAgeSeconds));
+  }
+  const response = await runJobsCommand(args);
+  if (!response.success) {
+    throw new Error(response.error || 'No se pudo encolar la consulta');
+  }
+  ensureJobWorker();
+  return { jobId: response.job_id, counts: response.counts };
+}
+
+/**
+ * Estado, duraciones y resultado de un trabajo (null si no existe)
+ */
+async function getJob(jobId) {
+  const row = await queryJobsDb('SELECT * FROM Trabajos_ADRES WHERE id = ?', [String(jobId)]);
+  if (!row) return null;
+  const job = jobFromRow(row);
+  if (job.state === 'queued') {
+    // Trabajos en cola antes que este (0 = es el siguiente)
+    const ahead = await queryJobsDb(
+      "SELECT COUNT(*) AS n FROM Trabajos_ADRES WHERE estado = 'queued' AND fecha_creacion < ?",
+      [row.fecha_creacion]
+    );
+    job.position = ahead.n;
+  }
+  return job;
+}
+
+/**
+ * Último trabajo terminado (null si no hay)
+ */
+async function getLatestJob() {
+  const row = await queryJobsDb(
+    "SELECT * FROM Trabajos_ADRES WHERE estado = 'done' ORDER BY fecha_fin DESC LIMIT 1", []
+  );
+  return row ? jobFromRow(row) : null;
+}
+
 /**
  * Lee el último resultado guardado en demo_resultado.json
  */
@@ -85,7 +260,10 @@ function readLastResult() {
 
 module.exports = {
   startInteractiveConsulta,
-  readLastResult
+  readLastResult,
+  submitJob,
+  getJob,
+  getLatestJob
 };
 
 
@@ -5,127 +5,170 @@
 
 const { PythonShell } = require('python-shell');
 const path = require('path');
-const fs = require('fs');
-const { execSync } = require('child_process');
 const { mapToStrokeFeatures, validateStrokeData } = require('./dataMapper');
+const { findPythonManifest } = require('./pythonHealthcheck');
 
 const MODELS_DIR = path.join(__dirname, '../models');
-const MODEL_PATH = path.join(MODELS_DIR, 'stroke_model.pkl');
-const PYTHON_SCRIPT_PATH = path.join(MODELS_DIR, 'predict_stroke.py');
 
-/**
- * Valida que el entorno Python esté configurado correctamente
- * @returns {Object} { valid: boolean, errors: string[], pythonPath: string }
- */
-async function validatePythonEnvironment() {
-  const errors = [];
-  let pythonPath = null;
+// Worker persistente: el modelo se carga una sola vez y se reutiliza entre peticiones.
+// Se puede desactivar con STROKE_WORKER=false para volver al modo de un proceso por petición.
+const STROKE_WORKER_ENABLED = process.env.STROKE_WORKER !== 'false';
+const STROKE_WORKER_TIMEOUT = 30000;
 
-  console.log('🔍 [AI] Iniciando validación de entorno Python...');
+let strokeWorker = null;
+let strokeWorkerReady = null;
+let strokeWorkerSeq = 0;
+const pendingWorkerRequests = new Map();
 
-  // 1. Verificar que Python esté instalado
-  console.log('🔍 [AI] Verificando instalación de Python...');
-  const pythonCommands = ['python', 'python3', 'py'];
-  for (const cmd of pythonCommands) {
+/**
+ * Rechaza todas las peticiones pendientes y descarta el worker actual
+ * @param {string} reason - Motivo del fallo
+ */
+function resetStrokeWorker(reason) {
+  for (const [, pending] of pendingWorkerRequests) {
+    clearTimeout(pending.timeout);
+    pending.reject(new Error(reason));
+  }
+  pendingWorkerRequests.clear();
+  if (strokeWorker) {
     try {
-      console.log(`🔍 [AI] Intentando comando: ${cmd}`);
-      const version = execSync(`${cmd} --version`, { encoding: 'utf8', timeout: 5000 });
-      pythonPath = cmd;
-      console.log(`✅ [AI] Python encontrado: ${cmd} - ${version.trim()}`);
-      break;
+      strokeWorker.kill();
     } catch (error) {
-      console.log(`⚠️ [AI] Comando ${cmd} no disponible: ${error.message}`);
-      // Comando no disponible, continuar con el siguiente
+      // El proceso ya terminó
     }
   }
+  strokeWorker = null;
+  strokeWorkerReady = null;
+}
 
-  if (!pythonPath) {
-    const errorMsg = 'Python no está instalado o no está en el PATH. Comandos probados: ' + pythonCommands.join(', ');
-    console.error(`❌ [AI] ${errorMsg}`);
-    errors.push(errorMsg);
-    return { valid: false, errors, pythonPath: null };
+/**
+ * Obtiene (o inicia) el worker de predicción de stroke
+ * @param {string} pythonPath - Ejecutable de Python validado
+ * @returns {Promise<PythonShell>} Worker listo para recibir peticiones
+ */
+function getStrokeWorker(pythonPath) {
+  if (strokeWorkerReady) {
+    return strokeWorkerReady;
   }
 
-  // 2. Verificar dependencias de Python
-  console.log('🔍 [AI] Verificando dependencias de Python...');
-  const requiredModules = ['sklearn', 'numpy', 'pickle', 'json', 'sys'];
-  const missingModules = [];
-  
-  for (const module of requiredModules) {
-    try {
-      // Usar stdio: 'pipe' para capturar errores correctamente
-      // Importante: usar pythonPath que detectamos, no 'python' hardcodeado
-      const command = `${pythonPath} -c "import ${module}; print('OK')"`;
-      const result = execSync(command, {
-        encoding: 'utf8',
-        timeout: 10000, // Aumentar timeout a 10 segundos
-        stdio: ['pipe', 'pipe', 'pipe'], // stdin, stdout, stderr
-        shell: true // Usar shell en Windows para mejor compatibilidad
-      });
-      console.log(`✅ [AI] Módulo ${module} disponible`);
-    } catch (error) {
-      // Capturar stderr para más información
-      const errorOutput = error.stderr ? error.stderr.toString() : (error.stdout ? error.stdout.toString() : error.message);
-      console.error(`❌ [AI] Módulo ${module} NO disponible`);
-      console.error(`   Comando usado: ${pythonPath} -c "import ${module}"`);
-      console.error(`   Error output: ${errorOutput.substring(0, 300)}`);
-      console.error(`   Exit code: ${error.status || error.code}`);
-      console.error(`   Error completo: ${error.toString().substring(0, 300)}`);
-      missingModules.push(module);
+  console.log('🐍 [AI] Iniciando worker persistente de predicción...');
+  const worker = new PythonShell('predict_stroke.py', {
+    mode: 'text',
+    pythonPath,
+    pythonOptions: ['-u', '-X', 'utf8'],
+    scriptPath: MODELS_DIR,
+    args: ['--worker'],
+    env: {
+      ...process.env,
+      PYTHONIOENCODING: 'utf-8'
     }
-  }
+  });
+  strokeWorker = worker;
+
+  strokeWorkerReady = new Promise((resolve, reject) => {
+    worker.on('message', (message) => {
+      let data;
+      try {
+        data = JSON.parse(message);
+      } catch (parseError) {
+        console.error('⚠️ [AI] Línea no JSON del worker:', message.substring(0, 200));
+        return;
+      }
+
+      if (data.ready !== undefined) {
+        if (data.ready) {
+          console.log('✅ [AI] Worker de predicción listo');
+          resolve(worker);
+        } else {
+          reject(new Error(data.error || 'El worker no pudo cargar el modelo'));
+        }
+        return;
+      }
+
+      const pending = pendingWorkerRequests.get(data.id);
+      if (!pending) {
+        return;
+      }
+      pendingWorkerRequests.delete(data.id);
+      clearTimeout(pending.timeout);
+      delete data.id;
+      pending.resolve(data);
+    });
 
-  if (missingModules.length > 0) {
-    // Mapear nombres de módulos a nombres de paquetes pip
-    const moduleToPackage = {
-      'sklearn': 'scikit-learn',
-      'numpy': 'numpy',
-      'pickle': '', // pickle es parte de la stdlib
-      'json': '', // json es parte de la stdlib
-      'sys': '' // sys es parte de la stdlib
-    };
-    
-    const packagesToInstall = missingModules
-      .map(m => moduleToPackage[m])
-      .filter(p => p !== '');
-    
-    let installCommand = '';
-    if (packagesToInstall.length > 0) {
-      installCommand = `Instalar con: pip install ${packagesToInstall.join(' ')}`;
+    worker.on('stderr', (stderr) => {
+      console.error('⚠️ [AI] Worker stderr:', stderr);
+    });
+
+    worker.on('error', (error) => {
+      console.error('❌ [AI] Error en worker de predicción:', error.message);
+    });
+
+    worker.on('close', () => {
+      console.warn('⚠️ [AI] Worker de predicción finalizado');
+      reject(new Error('El worker terminó antes de estar listo'));
+      if (strokeWorker === worker) {
+        resetStrokeWorker('El worker de predicción terminó inesperadamente');
+      }
+    });
+  });
+
+  strokeWorkerReady.catch(() => {
+    if (strokeWorker === worker) {
+      resetStrokeWorker('El worker de predicción no pudo iniciar');
     }
-    
-    const errorMsg = `Dependencias Python faltantes: ${missingModules.join(', ')}. ${installCommand}`;
-    console.error(`❌ [AI] ${errorMsg}`);
-    errors.push(errorMsg);
-    return { valid: false, errors, pythonPath };
-  }
-  console.log('✅ [AI] Todas las dependencias Python verificadas');
+  });
 
-  // 3. Verificar que el script Python existe
-  console.log(`🔍 [AI] Verificando script Python: ${PYTHON_SCRIPT_PATH}`);
-  if (!fs.existsSync(PYTHON_SCRIPT_PATH)) {
-    const errorMsg = `Script Python no encontrado: ${PYTHON_SCRIPT_PATH}`;
+  return strokeWorkerReady;
+}
+
+/**
+ * Envía features al worker persistente y espera la respuesta
+ * @param {Object} features - Features mapeadas para el modelo
+ * @param {string} pythonPath - Ejecutable de Python validado
+ * @returns {Promise<Object>} Resultado del script Python
+ */
+async function predictWithWorker(features, pythonPath) {
+  const worker = await getStrokeWorker(pythonPath);
+  const id = ++strokeWorkerSeq;
+
+  return new Promise((resolve, reject) => {
+    const timeout = setTimeout(() => {
+      pendingWorkerRequests.delete(id);
+      // Un worker que no responde se reinicia en la siguiente petición
+      resetStrokeWorker('Timeout esperando respuesta del worker');
+      reject(new Error(`Timeout: el worker no respondió en ${STROKE_WORKER_TIMEOUT / 1000} segundos`));
+    }, STROKE_WORKER_TIMEOUT);
+
+    pendingWorkerRequests.set(id, { resolve, reject, timeout });
+    worker.send(JSON.stringify({ id, features }));
+  });
+}
+
+/**
+ * Valida que el entorno Python esté configurado correctamente.
+ * Usa el manifiesto de models/healthcheck.py: Python solo se ejecuta cuando el
+ * entorno o el modelo cambiaron desde la última verificación.
+ * @returns {Object} { valid: boolean, errors: string[], pythonPath: string }
+ */
+async function validatePythonEnvironment() {
+  const pythonCommands = ['python', 'python3', 'py'];
+  const found = await findPythonManifest(pythonCommands);
+
+  if (!found) {
+    const errorMsg = 'Python no está instalado o no está en el PATH. Comandos probados: ' + pythonCommands.join(', ');
     console.error(`❌ [AI] ${errorMsg}`);
-    errors.push(errorMsg);
-    return { valid: false, errors, pythonPath };
+    return { valid: false, errors: [errorMsg], pythonPath: null };
   }
-  console.log(`✅ [AI] Script Python encontrado: ${PYTHON_SCRIPT_PATH}`);
 
-  // 4. Verificar que el modelo existe
-  console.log(`🔍 [AI] Verificando modelo: ${MODEL_PATH}`);
-  if (!fs.existsSync(MODEL_PATH)) {
-    const errorMsg = `Modelo no encontrado: ${MODEL_PATH}`;
-    console.error(`❌ [AI] ${errorMsg}`);
-    errors.push(errorMsg);
-    return { valid: false, errors, pythonPath };
+  const { pythonCmd, manifest } = found;
+  const stroke = manifest.capabilities.stroke;
+  if (!stroke.ok) {
+    stroke.errors.forEach((err) => console.error(`❌ [AI] ${err}`));
+    return { valid: false, errors: stroke.errors, pythonPath: pythonCmd };
   }
-  
-  const modelStats = fs.statSync(MODEL_PATH);
-  const modelSizeMB = (modelStats.size / (1024 * 1024)).toFixed(2);
-  console.log(`✅ [AI] Modelo encontrado: ${MODEL_PATH} (${modelSizeMB} MB)`);
 
-  console.log('✅ [AI] Validación de entorno Python completada exitosamente');
-  return { valid: true, errors: [], pythonPath };
+  console.log(`✅ [AI] Entorno Python válido: ${pythonCmd} ${manifest.interpreter.version} (manifiesto ${manifest.created_at})`);
+  return { valid: true, errors: [], pythonPath: pythonCmd };
 }
 
 /**
@@ -172,6 +215,34 @@ async function predictStrokeRisk(patientData) {
     const features = mapToStrokeFeatures(patientData);
     console.log('✅ [AI] Features mapeadas:', JSON.stringify(features, null, 2));
 
+    // El municipio no es feature del modelo; Python lo usa para el percentil poblacional
+    const modelInput = patientData.municipio
+      ? { ...features, municipio: patientData.municipio }
+      : features;
+
+    if (STROKE_WORKER_ENABLED) {
+      try {
+        const result = await predictWithWorker(modelInput, envValidation.pythonPath);
+        if (result.success) {
+          console.log('✅ [AI] Predicción exitosa (worker):', {
+            riskLevel: result.risk_level,
+            probability: result.probability
+          });
+          result.recommendations = generateStrokeRecommendations(
+            result.risk_level,
+            result.probability,
+            patientData
+          );
+        } else {
+          console.error('❌ [AI] Predicción falló (worker):', result.error);
+        }
+        return result;
+      } catch (workerError) {
+        // Si el worker no está disponible, usar un proceso por petición
+        console.warn('⚠️ [AI] Worker no disponible, usando proceso único:', workerError.message);
+      }
+    }
+
     // Ejecutar script Python para predicción
     console.log('🐍 [AI] Ejecutando script Python...');
     
@@ -227,7 +298,7 @@ async function predictStrokeRisk(patientData) {
 
       // Enviar features al script y cerrar
       console.log('📤 [AI] Enviando features a Python...');
-      pyshell.send(JSON.stringify(features));
+      pyshell.send(JSON.stringify(modelInput));
       pyshell.end((err, code, signal) => {
         clearTimeout(timeout);
         
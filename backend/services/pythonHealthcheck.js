@@ -0,0 +1,159 @@
+/**
+ * Manifiesto del entorno Python compartido por aiService.js y whisperStt.js
+ *
+ * models/healthcheck.py revisa en una sola ejecución el intérprete, las
+ * dependencias, ffmpeg y el modelo, y guarda el resultado en un JSON con una
+ * huella (tamaño y mtime del intérprete, site-packages y modelo). Aquí solo se
+ * compara esa huella con fs.statSync; Python se vuelve a ejecutar únicamente
+ * si algo cambió (paquetes instalados, modelo reemplazado) o no hay manifiesto.
+ */
+
+const { execFile } = require('child_process');
+const fs = require('fs');
+const path = require('path');
+
+const HEALTHCHECK_SCRIPT = path.join(__dirname, '../models/healthcheck.py');
+const MANIFEST_DIR = process.env.PYTHON_MANIFEST_DIR || path.join(__dirname, '../models');
+const MANIFEST_VERSION = 1;
+// Importar torch/whisper la primera vez puede tardar
+const HEALTHCHECK_TIMEOUT = 120000;
+// Intervalo mínimo entre comparaciones de la huella en disco
+const RECHECK_INTERVAL = 30000;
+
+const manifests = new Map();
+const runningChecks = new Map();
+
+/**
+ * Ruta del manifiesto para un comando de Python (uno por comando)
+ * @param {string} pythonCmd
+ * @returns {string}
+ */
+function manifestPathFor(pythonCmd) {
+  const safeName = pythonCmd.replace(/[^a-zA-Z0-9._-]/g, '_');
+  return path.join(MANIFEST_DIR, `healthcheck_${safeName}.json`);
+}
+
+/**
+ * Compara la huella guardada con el estado actual de los archivos
+ * @param {Object} manifest
+ * @returns {boolean}
+ */
+function fingerprintMatches(manifest) {
+  const files = manifest && manifest.fingerprint && manifest.fingerprint.files;
+  if (!Array.isArray(files)) return false;
+  return files.every((entry) => {
+    try {
+      const stats = fs.statSync(entry.path, { bigint: true });
+      return entry.size !== null &&
+        stats.size.toString() === String(entry.size) &&
+        stats.mtimeNs.toString() === entry.mtime_ns;
+    } catch (error) {
+      return entry.size === null;
+    }
+  });
+}
+
+/**
+ * Lee el manifiesto guardado si sigue vigente
+ * @param {string} pythonCmd
+ * @returns {Object|null}
+ */
+function readManifest(pythonCmd) {
+  try {
+    const manifest = JSON.parse(fs.readFileSync(manifestPathFor(pythonCmd), 'utf8'));
+    if (manifest.manifest_version === MANIFEST_VERSION && fingerprintMatches(manifest)) {
+      return manifest;
+    }
+  } catch (error) {
+    // Sin manifiesto o ilegible: se regenera
+  }
+  return null;
+}
+
+/**
+ * Ejecuta healthcheck.py y retorna el manifiesto nuevo
+ * @param {string} pythonCmd
+ * @returns {Promise<Object>}
+ */
+function runHealthcheck(pythonCmd) {
+  return new Promise((resolve, reject) => {
+    console.log(`🔍 [Python] Generando manifiesto del entorno con ${pythonCmd}...`);
+    execFile(
+      pythonCmd,
+      [HEALTHCHECK_SCRIPT, '--manifest', manifestPathFor(pythonCmd), '--force'],
+      { timeout: HEALTHCHECK_TIMEOUT, encoding: 'utf8', env: { ...process.env, PYTHONIOENCODING: 'utf-8' } },
+      (error, stdout, stderr) => {
+        let manifest = null;
+        try {
+          manifest = JSON.parse((stdout || '').trim());
+        } catch (parseError) {
+          // Python 2 u otro intérprete que no ejecuta el script
+        }
+        if (manifest && manifest.success) {
+          resolve(manifest);
+          return;
+        }
+        const reason = (manifest && manifest.error) || (error && error.message) || (stderr || '').trim() || 'sin salida';
+        const failure = new Error(`healthcheck.py falló con ${pythonCmd}: ${reason.substring(0, 300)}`);
+        failure.code = error && error.code;
+        reject(failure);
+      }
+    );
+  });
+}
+
+/**
+ * Manifiesto vigente para un comando de Python
+ * @param {string} pythonCmd - Comando o ruta del intérprete
+ * @param {Object} options - { force: boolean } para regenerarlo
+ * @returns {Promise<Object>} Manifiesto (interpreter, modules, model, capabilities...)
+ */
+async function getPythonManifest(pythonCmd, { force = false } = {}) {
+  const cached = manifests.get(pythonCmd);
+  if (!force && cached && Date.now() - cached.checkedAt < RECHECK_INTERVAL) {
+    return cached.manifest;
+  }
+
+  if (!force) {
+    const stored = cached && fingerprintMatches(cached.manifest) ? cached.manifest : readManifest(pythonCmd);
+    if (stored) {
+      manifests.set(pythonCmd, { manifest: stored, checkedAt: Date.now() });
+      return stored;
+    }
+  }
+
+  // Peticiones simultáneas comparten una sola ejecución de healthcheck.py
+  if (!runningChecks.has(pythonCmd)) {
+    const check = runHealthcheck(pythonCmd)
+      .then((manifest) => {
+        manifests.set(pythonCmd, { manifest, checkedAt: Date.now() });
+        return manifest;
+      })
+      .finally(() => runningChecks.delete(pythonCmd));
+    runningChecks.set(pythonCmd, check);
+  }
+  return runningChecks.get(pythonCmd);
+}
+
+/**
+ * Primer comando de Python de la lista que logra generar un manifiesto
+ * @param {string[]} pythonCommands
+ * @returns {Promise<{pythonCmd: string, manifest: Object}|null>}
+ */
+async function findPythonManifest(pythonCommands) {
+  for (const pythonCmd of pythonCommands) {
+    try {
+      const manifest = await getPythonManifest(pythonCmd);
+      return { pythonCmd, manifest };
+    } catch (error) {
+      console.log(`⚠️ [Python] ${error.message}`);
+    }
+  }
+  return null;
+}
+
+module.exports = {
+  getPythonManifest,
+  findPythonManifest,
+  manifestPathFor
+};
@@ -1,7 +1,9 @@
 const fetch = require('node-fetch');
 const FormData = require('form-data');
-// Whisper deshabilitado temporalmente - causaba reinicios del servidor
-// const { transcribeWithWhisper } = require('./whisperStt');
+// Whisper local solo con WHISPER_LOCAL_ENABLED=true: corre en un daemon aparte
+// (whisper_daemon.py) con timeout por trabajo, así un cuelgue no reinicia el servidor
+const WHISPER_LOCAL_ENABLED = process.env.WHISPER_LOCAL_ENABLED === 'true';
+const whisperStt = WHISPER_LOCAL_ENABLED ? require('./whisperStt') : null;
 
 // Modelo predeterminado: Whisper-small es más ligero y generalmente disponible en el router gratuito
 // Alternativas: openai/whisper-base, openai/whisper-medium
@@ -126,9 +128,12 @@ async function transcribeWithElevenLabs({ audioBuffer, contentType, filename })
   return data?.text || '';
 }
 
-// Whisper deshabilitado - retorna error controlado sin ejecutar nada
+// Whisper deshabilitado salvo WHISPER_LOCAL_ENABLED=true - retorna error controlado sin ejecutar nada
 async function transcribeWithWhisper({ audioBuffer, contentType, filename }) {
-  throw new Error('Whisper local está deshabilitado temporalmente. Por favor, usa ElevenLabs o Hugging Face como proveedor STT.');
+  if (!whisperStt) {
+    throw new Error('Whisper local está deshabilitado. Define WHISPER_LOCAL_ENABLED=true o usa ElevenLabs o Hugging Face como proveedor STT.');
+  }
+  return whisperStt.transcribeWithWhisper({ audioBuffer, contentType, filename });
 }
 
 const PROVIDERS = {
@@ -1,19 +1,34 @@
 const { spawn } = require('child_process');
-const fs = require('fs');
+const net = require('net');
+const os = require('os');
 const path = require('path');
+const { getPythonManifest } = require('./pythonHealthcheck');
 
 const WHISPER_MODEL = process.env.WHISPER_MODEL || 'base';
 const PYTHON_CMD = process.env.PYTHON_CMD || 'python3';
-const WHISPER_TIMEOUT = 120000; // 2 minutos (más agresivo para evitar cuelgues)
+// Medirlo con integrations/whisper_stt/benchmark_whisper.py (recommendation.env)
+const WHISPER_TIMEOUT = parseInt(process.env.WHISPER_TIMEOUT_MS || '120000', 10);
+const SCRIPT_PATH = path.join(__dirname, '../integrations/whisper_stt/transcribe.py');
+
+// Daemon con el modelo residente (whisper_daemon.py); WHISPER_DAEMON=false usa un proceso por petición
+const WHISPER_DAEMON_ENABLED = process.env.WHISPER_DAEMON !== 'false';
+// Socket de un daemon ya iniciado externamente; si no se define, se lanza uno propio
+const WHISPER_DAEMON_SOCKET = process.env.WHISPER_DAEMON_SOCKET || null;
+// La primera carga del modelo puede incluir su descarga
+const WHISPER_DAEMON_STARTUP_TIMEOUT = 600000;
+
+let daemonStartup = null;
+let daemonRequestId = 0;
 
 /**
  * Ejecuta un proceso con spawn y timeout, matando el proceso si excede el tiempo
  * @param {string} command - Comando a ejecutar
  * @param {string[]} args - Argumentos del comando
  * @param {number} timeoutMs - Timeout en milisegundos
+ * @param {Buffer} [input] - Datos a escribir en stdin del proceso
  * @returns {Promise<{stdout: string, stderr: string}>}
  */
-function spawnWithTimeout(command, args, timeoutMs) {
+function spawnWithTimeout(command, args, timeoutMs, input = null) {
   return new Promise((resolve, reject) => {
     let stdout = '';
     let stderr = '';
@@ -23,13 +38,21 @@ function spawnWithTimeout(command, args, timeoutMs) {
     console.log(`[Whisper] Ejecutando: ${command} ${args.join(' ')}`);
     
     const childProcess = spawn(command, args, {
-      stdio: ['ignore', 'pipe', 'pipe'],
+      stdio: [input ? 'pipe' : 'ignore', 'pipe', 'pipe'],
       shell: false
     });
 
-    // Capturar stdout en tiempo real
+    if (input) {
+      // Si el proceso termina antes de leer todo (EPIPE), el error se reporta en 'close'
+      childProcess.stdin.on('error', () => {});
+      childProcess.stdin.end(input);
+    }
+
+    // Capturar stdout en tiempo real (decodificado como flujo: un carácter
+    // multibyte puede quedar partido entre dos fragmentos)
+    childProcess.stdout.setEncoding('utf8');
     childProcess.stdout.on('data', (data) => {
-      stdout += data.toString();
+      stdout += data;
     });
 
     // Capturar stderr en tiempo real y mostrar logs de progreso
@@ -105,34 +128,153 @@ function spawnWithTimeout(command, args, timeoutMs) {
 }
 
 /**
- * Verifica que Python esté disponible
- * @returns {Promise<boolean>}
+ * Lanza whisper_daemon.py una sola vez y espera su línea de "ready"
+ * @returns {Promise<string>} Ruta del socket Unix del daemon
  */
-async function verifyPython() {
-  return new Promise((resolve) => {
-    const checkProcess = spawn(PYTHON_CMD, ['--version'], {
-      stdio: 'ignore',
-      shell: false
+function startDaemon() {
+  if (WHISPER_DAEMON_SOCKET) {
+    return Promise.resolve(WHISPER_DAEMON_SOCKET);
+  }
+  if (daemonStartup) {
+    return daemonStartup;
+  }
+
+  const socketPath = path.join(os.tmpdir(), `whisper_stt_${process.pid}.sock`);
+  daemonStartup = new Promise((resolve, reject) => {
+    console.log(`[Whisper] Iniciando daemon con modelo ${WHISPER_MODEL}...`);
+    const daemon = spawn(
+      PYTHON_CMD,
+      [SCRIPT_PATH, '--daemon', '--socket', socketPath, '--models', WHISPER_MODEL,
+        '--job-timeout', String(WHISPER_TIMEOUT / 1000)],
+      { stdio: ['ignore', 'pipe', 'pipe'], shell: false }
+    );
+    let stdoutBuffer = '';
+    let settled = false;
+
+    const fail = (error) => {
+      daemonStartup = null;
+      if (!settled) {
+        settled = true;
+        clearTimeout(startupTimer);
+        reject(error);
+      }
+    };
+
+    const startupTimer = setTimeout(() => {
+      daemon.kill('SIGKILL');
+      fail(new Error(`Whisper: el daemon no quedó listo en ${WHISPER_DAEMON_STARTUP_TIMEOUT / 1000} segundos`));
+    }, WHISPER_DAEMON_STARTUP_TIMEOUT);
+
+    daemon.stdout.on('data', (data) => {
+      stdoutBuffer += data.toString();
+      const newline = stdoutBuffer.indexOf('\n');
+      if (settled || newline === -1) return;
+      let ready = null;
+      try {
+        ready = JSON.parse(stdoutBuffer.substring(0, newline));
+      } catch (parseError) {
+        // Línea inesperada: se reporta como error abajo
+      }
+      if (ready && ready.ready) {
+        settled = true;
+        clearTimeout(startupTimer);
+        console.log(`[Whisper] Daemon listo en ${socketPath} (modelos: ${ready.models.join(', ')})`);
+        resolve(socketPath);
+      } else {
+        daemon.kill('SIGTERM');
+        fail(new Error(`Whisper: el daemon no pudo iniciar. ${(ready && ready.error) || stdoutBuffer.substring(0, 200)}`));
+      }
     });
 
-    checkProcess.on('close', (code) => {
-      resolve(code === 0);
+    daemon.stderr.on('data', (data) => {
+      data.toString().split('\n').filter(line => line.trim()).forEach(line => {
+        if (line.includes('[Whisper-Python]') || line.includes('[Whisper-Daemon]')) {
+          console.log(line.trim());
+        }
+      });
     });
 
-    checkProcess.on('error', () => {
-      resolve(false);
+    daemon.on('error', (error) => fail(new Error(`Whisper: no se pudo lanzar el daemon: ${error.message}`)));
+    daemon.on('close', (code, signal) => {
+      console.warn(`[Whisper] Daemon terminado (código ${code}${signal ? `, señal ${signal}` : ''})`);
+      fail(new Error(`Whisper: el daemon terminó al iniciar (código ${code})`));
     });
 
-    // Timeout de 5 segundos para la verificación
-    setTimeout(() => {
-      if (!checkProcess.killed) {
-        checkProcess.kill();
-        resolve(false);
+    // No mantener vivo el proceso de Node por el daemon; se detiene al salir
+    daemon.unref();
+    process.once('exit', () => daemon.kill('SIGTERM'));
+  });
+  return daemonStartup;
+}
+
+/**
+ * Envía una petición NDJSON al daemon y espera su respuesta
+ * @param {string} socketPath - Socket Unix del daemon
+ * @param {Object} payload - Petición (model, language, timeout)
+ * @param {number} timeoutMs - Tiempo máximo de espera (incluye cola)
+ * @param {Buffer} audioBuffer - Audio que se envía tras la línea JSON ("audio_bytes")
+ * @returns {Promise<Object>} Respuesta JSON del daemon
+ */
+function requestDaemon(socketPath, payload, timeoutMs, audioBuffer) {
+  return new Promise((resolve, reject) => {
+    const id = ++daemonRequestId;
+    const socket = net.createConnection(socketPath);
+    let buffer = '';
+
+    // Decodificar como flujo: ñ y tildes pueden quedar partidas entre fragmentos del socket
+    socket.setEncoding('utf8');
+    socket.setTimeout(timeoutMs, () => {
+      socket.destroy();
+      const error = new Error(`Whisper: Timeout esperando al daemon después de ${timeoutMs / 1000} segundos`);
+      error.fromDaemon = true;
+      reject(error);
+    });
+    socket.on('connect', () => {
+      socket.write(JSON.stringify({ id, ...payload, audio_bytes: audioBuffer.length }) + '\n');
+      socket.write(audioBuffer);
+    });
+    socket.on('data', (data) => {
+      buffer += data;
+      const newline = buffer.indexOf('\n');
+      if (newline === -1) return;
+      socket.end();
+      try {
+        resolve(JSON.parse(buffer.substring(0, newline)));
+      } catch (parseError) {
+        reject(new Error(`Whisper: respuesta inválida del daemon: ${buffer.substring(0, 200)}`));
       }
-    }, 5000);
+    });
+    socket.on('error', (error) => reject(new Error(`Whisper: no se pudo conectar al daemon: ${error.message}`)));
   });
 }
 
+/**
+ * Transcribe con el daemon (modelo ya cargado en memoria)
+ * @param {Buffer} audioBuffer - Audio original; el daemon lo decodifica en memoria
+ * @returns {Promise<Object>} Resultado con text y timings
+ */
+async function transcribeWithDaemon(audioBuffer) {
+  const socketPath = await startDaemon();
+  // Margen sobre el timeout de inferencia para el tiempo en cola
+  const result = await requestDaemon(
+    socketPath,
+    { model: WHISPER_MODEL, language: 'es', timeout: WHISPER_TIMEOUT / 1000 },
+    WHISPER_TIMEOUT * 2,
+    audioBuffer
+  );
+  if (!result.success && result.unavailable) {
+    // El daemon no tiene workers en servicio: se usa un proceso por petición
+    throw new Error(`Whisper: daemon sin workers disponibles (${result.error})`);
+  }
+  if (!result.success) {
+    // Errores de transcripción, cola llena o timeout: no tiene sentido reintentar con otro proceso
+    const error = new Error(result.busy ? `Whisper: ${result.error}` : `Whisper error: ${result.error}`);
+    error.fromDaemon = true;
+    throw error;
+  }
+  return result;
+}
+
 /**
  * Transcribe audio usando Whisper local
  * @param {Buffer} audioBuffer - Buffer del audio
@@ -141,30 +283,44 @@ async function verifyPython() {
  * @returns {Promise<string>} Texto transcrito
  */
 async function transcribeWithWhisper({ audioBuffer, contentType, filename }) {
-  const scriptPath = path.join(__dirname, '../integrations/whisper_stt/transcribe.py');
-  const tempDir = path.join(__dirname, '../../temp');
-  const tempFilePath = path.join(tempDir, `audio_${Date.now()}_${Math.random().toString(36).substring(7)}.webm`);
-
-  // Crear directorio temporal si no existe
-  if (!fs.existsSync(tempDir)) {
-    fs.mkdirSync(tempDir, { recursive: true });
-  }
+  const scriptPath = SCRIPT_PATH;
 
   try {
-    // Verificar que Python esté disponible
-    console.log(`[Whisper] Verificando Python...`);
-    const pythonAvailable = await verifyPython();
-    if (!pythonAvailable) {
+    // Verificar Python, whisper, torch y ffmpeg con el manifiesto del entorno
+    // (solo se ejecuta Python si el entorno cambió desde la última verificación)
+    let manifest;
+    try {
+      manifest = await getPythonManifest(PYTHON_CMD);
+    } catch (manifestError) {
+      console.error(`[Whisper] ${manifestError.message}`);
       throw new Error(`Python no está disponible. Verifica que ${PYTHON_CMD} esté instalado y en el PATH.`);
     }
-    console.log(`[Whisper] Python verificado: ${PYTHON_CMD}`);
+    if (!manifest.capabilities.whisper.ok) {
+      throw new Error(manifest.capabilities.whisper.errors.join('; '));
+    }
+    console.log(`[Whisper] Python verificado: ${PYTHON_CMD} ${manifest.interpreter.version}`);
 
-    // Guardar el buffer de audio en un archivo temporal
-    fs.writeFileSync(tempFilePath, audioBuffer);
-    console.log(`[Whisper] Archivo temporal creado: ${tempFilePath}`);
+    // El audio viaja en memoria (socket del daemon o stdin), sin archivos temporales
+    console.log(`[Whisper] Audio recibido: ${audioBuffer.length} bytes (${contentType || 'audio/webm'})`);
 
-    let audioFile = tempFilePath;
-    let needsCleanup = false;
+    if (WHISPER_DAEMON_ENABLED) {
+      try {
+        const daemonResult = await transcribeWithDaemon(audioBuffer);
+        const { timings = {} } = daemonResult;
+        console.log(`[Whisper] Daemon: cola ${timings.queue_wait_seconds}s, decodificación ${timings.decode_seconds}s, inferencia ${timings.inference_seconds}s`);
+        if (!daemonResult.text) {
+          throw new Error('Whisper: No se obtuvo texto transcrito (resultado vacío)');
+        }
+        console.log(`[Whisper] Transcripción exitosa: ${daemonResult.text.substring(0, 50)}...`);
+        return daemonResult.text;
+      } catch (daemonError) {
+        if (daemonError.fromDaemon || daemonError.message.includes('resultado vacío')) {
+          throw daemonError;
+        }
+        // Daemon no disponible: se usa un proceso por petición
+        console.warn(`[Whisper] ${daemonError.message}. Usando proceso individual.`);
+      }
+    }
 
     // Ejecutar script de Whisper usando spawn con timeout
     console.log(`[Whisper] Modelo: ${WHISPER_MODEL}, Idioma: es, Timeout: ${WHISPER_TIMEOUT / 1000} segundos`);
@@ -176,8 +332,9 @@ async function transcribeWithWhisper({ audioBuffer, contentType, filename }) {
     try {
       const result = await spawnWithTimeout(
         PYTHON_CMD,
-        [scriptPath, audioFile, WHISPER_MODEL, 'es'],
-        WHISPER_TIMEOUT
+        [scriptPath, '-', WHISPER_MODEL, 'es'],
+        WHISPER_TIMEOUT,
+        audioBuffer
       );
       stdout = result.stdout || '';
       stderr = result.stderr || '';
@@ -299,19 +456,6 @@ async function transcribeWithWhisper({ audioBuffer, contentType, filename }) {
     // Error genérico - asegurar que siempre retornamos un error manejable
     const errorMessage = error.message || 'Error desconocido';
     throw new Error(`Whisper: ${errorMessage}`);
-  } finally {
-    // Limpiar archivo temporal
-    try {
-      if (fs.existsSync(tempFilePath)) {
-        fs.unlinkSync(tempFilePath);
-        console.log(`[Whisper] Archivo temporal eliminado: ${tempFilePath}`);
-      }
-      if (needsCleanup && fs.existsSync(audioFile) && audioFile !== tempFilePath) {
-        fs.unlinkSync(audioFile);
-      }
-    } catch (cleanupError) {
-      console.warn(`[Whisper] Error limpiando archivos temporales:`, cleanupError.message);
-    }
   }
 }
 
@@ -0,0 +1,35 @@
+// backend/verificar_stroke_features.js
+// Verifica que services/dataMapper.js siga produciendo las features esperadas en
+// models/stroke_features_fixtures.json (los mismos casos que verifica models/stroke_features.py)
+const path = require('path');
+const { mapToStrokeFeatures } = require('./services/dataMapper');
+
+const FIXTURES_PATH = path.join(__dirname, 'models', 'stroke_features_fixtures.json');
+const { cases } = require(FIXTURES_PATH);
+
+// Silenciar los logs del mapper para que solo se vea el resultado de la verificación
+const originalLog = console.log;
+const originalWarn = console.warn;
+console.log = () => {};
+console.warn = () => {};
+
+const mismatches = [];
+for (const testCase of cases) {
+  const actual = mapToStrokeFeatures(testCase.input);
+  for (const [feature, expected] of Object.entries(testCase.expected)) {
+    if (Math.abs(actual[feature] - expected) > 1e-9) {
+      mismatches.push({ caso: testCase.name, feature, esperado: expected, obtenido: actual[feature] });
+    }
+  }
+}
+
+console.log = originalLog;
+console.warn = originalWarn;
+
+if (mismatches.length > 0) {
+  console.error(`❌ ${mismatches.length} diferencias en ${cases.length} casos:`);
+  mismatches.forEach((m) => console.error(`   - ${m.caso} → ${m.feature}: esperado ${m.esperado}, obtenido ${m.obtenido}`));
+  process.exit(1);
+}
+
+console.log(`✅ dataMapper.js coincide con ${cases.length} casos de ${path.basename(FIXTURES_PATH)}`);
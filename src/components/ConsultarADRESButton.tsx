@@ -54,7 +54,8 @@ export const ConsultarADRESButton: React.FC<ConsultarADRESButtonProps> = ({
           );
           if (usarManual) {
             try {
-              await AuthService.iniciarScraperADRES(numeroDocumento.trim(), tipoDocumento);
+              const inicio = await AuthService.iniciarScraperADRES(numeroDocumento.trim(), tipoDocumento);
+              const jobId: string | undefined = inicio?.job_id;
               alert('Scraper iniciado. Ve a la consola del backend, escribe el captcha cuando lo pida y vuelve aquí. Intentaré obtener el resultado automáticamente.');
               
               // Polling del resultado por hasta 4 minutos
@@ -65,7 +66,7 @@ export const ConsultarADRESButton: React.FC<ConsultarADRESButtonProps> = ({
 
               while (Date.now() - start < timeoutMs) {
                 await new Promise(r => setTimeout(r, delayMs));
-                const r: any = await AuthService.obtenerResultadoScraperADRES();
+                const r: any = await AuthService.obtenerResultadoScraperADRES(jobId);
                 // Soportar ambas formas: { success:true, result:{...} } o directamente { status:'success', ... }
                 const result: any = (r && (r as any).result) ? (r as any).result : r;
                 if (result && (result.status === 'success' || (result.nombre || result.eps || result.regimen))) {
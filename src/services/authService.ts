@@ -799,9 +799,12 @@ export class AuthService {
     }
   }
 
-  static async obtenerResultadoScraperADRES(): Promise<any> {
+  static async obtenerResultadoScraperADRES(jobId?: string): Promise<any> {
     try {
-      const response = await fetch(`${API_URL}/adres-scraper/resultado`);
+      const query = jobId ? `?job_id=${encodeURIComponent(jobId)}` : '';
+      const response = await fetch(`${API_URL}/adres-scraper/resultado${query}`);
+      // 202: el trabajo sigue en cola o en ejecución
+      if (response.status === 202) return null;
       if (!response.ok) {
         if (response.status === 404) return null;
         const err = await response.text();